@@ -0,0 +1,311 @@
+import numpy as np
+
+# number of bins along the split axis evaluated by the surface area heuristic (SAH)
+BINS = 16
+# bins of all nodes of a level are limited to this
+LEVEL_BINS = 1 << 18
+# nodes with at most this many primitives may become leaves
+MAX_LEAF_SIZE = 4
+# cost of traversing a node relative to intersecting a primitive
+TRAVERSAL_COST = .5
+# batched traversal handles nodes with at most this many primitives like leaves
+# (intersecting a few more primitives is cheaper than splitting the rays again)
+BATCH_LEAF_SIZE = 32
+
+
+def surface_area(bounds_min, bounds_max):
+    # returns surface areas of (N, 3) arrays of boxes (empty boxes have area 0)
+    d = np.maximum(bounds_max - bounds_min, 0)
+    return 2 * (d[..., 0] * d[..., 1] + d[..., 1] * d[..., 2] + d[..., 2] * d[..., 0])
+
+
+class BVH:
+    # bounding volume hierarchy over primitives given by their bounding boxes, flattened into arrays:
+    # node i covers the box [node_min[i], node_max[i]] and primitives indices[start[i]:start[i] + count[i]],
+    # inner nodes have children child[i] and child[i] + 1, leaves have child[i] = -1
+    def __init__(self, bounds_min, bounds_max, max_leaf_size=MAX_LEAF_SIZE, bins=BINS):
+        bounds_min = np.asarray(bounds_min, dtype=float).reshape(-1, 3)
+        bounds_max = np.asarray(bounds_max, dtype=float).reshape(-1, 3)
+        self.size = len(bounds_min)
+        self.indices = np.arange(self.size)
+
+        levels = []
+        if self.size > 0:
+            # nodes of a level are built at once, each node is a segment of the indices array
+            seg_start = np.array([0])
+            seg_count = np.array([self.size])
+            next_node = 1
+            # bounds are kept in the order of indices, so nodes read contiguous parts of them
+            bounds_min, bounds_max = bounds_min.copy(), bounds_max.copy()
+            while len(seg_start) > 0:
+                level, seg_start, seg_count, next_node = self._build_level(
+                    bounds_min, bounds_max, seg_start, seg_count, next_node, max_leaf_size, bins)
+                levels.append(level)
+
+        self.node_min = np.concatenate([level[0] for level in levels]) if levels else np.empty((0, 3))
+        self.node_max = np.concatenate([level[1] for level in levels]) if levels else np.empty((0, 3))
+        self.child = np.concatenate([level[2] for level in levels]) if levels else np.empty(0, dtype=int)
+        self.start = np.concatenate([level[3] for level in levels]) if levels else np.empty(0, dtype=int)
+        self.count = np.concatenate([level[4] for level in levels]) if levels else np.empty(0, dtype=int)
+        # number of levels (traversals keep at most this many nodes pending)
+        self.depth = len(levels)
+
+        # plain lists are much faster than NumPy arrays for traversing single rays
+        self._lists = None
+
+    def _build_level(self, bounds_min, bounds_max, seg_start, seg_count, next_node, max_leaf_size, bins):
+        # bounds_min and bounds_max are sorted like indices and are reordered with them
+        k = len(seg_start)
+        # more bins than primitives of the largest node only add empty bins (deep levels have small nodes),
+        # levels of very many nodes get fewer bins (their nodes are small, binning them finely costs most of the
+        # build of large meshes)
+        bins = int(min(bins, max(seg_count.max(), 2), max(LEVEL_BINS // k, 4)))
+        offsets = np.cumsum(seg_count) - seg_count
+        seg_id = np.repeat(np.arange(k), seg_count)
+        positions = np.repeat(seg_start - offsets, seg_count) + np.arange(len(seg_id))
+        prims = self.indices[positions]
+
+        # bounds of nodes and of primitive centroids within each node
+        prim_min, prim_max = bounds_min[positions], bounds_max[positions]
+        centroids = (prim_min + prim_max) / 2
+        node_min = np.minimum.reduceat(prim_min, offsets)
+        node_max = np.maximum.reduceat(prim_max, offsets)
+        centroid_min = np.minimum.reduceat(centroids, offsets)
+        extent = np.maximum.reduceat(centroids, offsets) - centroid_min
+
+        # bin primitives along the axis of largest centroid extent
+        axis = np.argmax(extent, axis=1)
+        axis_extent = extent[np.arange(k), axis]
+        scale = np.divide(bins, axis_extent, out=np.zeros(k), where=axis_extent > 0)
+        c = centroids[np.arange(len(prims)), axis[seg_id]] - centroid_min[seg_id, axis[seg_id]]
+        prim_bin = np.minimum((c * scale[seg_id]).astype(int), bins - 1)
+
+        # sorting by node and bin groups primitives of each bin (and already partitions nodes for splitting)
+        key = seg_id * bins + prim_bin
+        order = np.argsort(key, kind="stable")
+        prims, key, prim_min, prim_max = prims[order], key[order], prim_min[order], prim_max[order]
+        groups = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        group_key = key[groups]
+
+        bin_min = np.full((k * bins, 3), np.inf)
+        bin_max = np.full((k * bins, 3), -np.inf)
+        bin_count = np.zeros(k * bins, dtype=int)
+        bin_min[group_key] = np.minimum.reduceat(prim_min, groups)
+        bin_max[group_key] = np.maximum.reduceat(prim_max, groups)
+        bin_count[group_key] = np.diff(np.r_[groups, len(prims)])
+        bin_min, bin_max = bin_min.reshape(k, bins, 3), bin_max.reshape(k, bins, 3)
+        bin_count = bin_count.reshape(k, bins)
+
+        # SAH cost of splitting after each bin from sweeps from left and right
+        left_count = np.cumsum(bin_count, axis=1)[:, :-1]
+        left_area = surface_area(np.minimum.accumulate(bin_min, axis=1), np.maximum.accumulate(bin_max, axis=1))[:, :-1]
+        right_count = np.cumsum(bin_count[:, ::-1], axis=1)[:, ::-1][:, 1:]
+        right_area = surface_area(np.minimum.accumulate(bin_min[:, ::-1], axis=1),
+                                  np.maximum.accumulate(bin_max[:, ::-1], axis=1))[:, ::-1][:, 1:]
+        cost = np.where((left_count > 0) & (right_count > 0),
+                        left_count * left_area + right_count * right_area, np.inf)
+        best = np.argmin(cost, axis=1)
+        best_cost = cost[np.arange(k), best]
+
+        node_area = surface_area(node_min, node_max)
+        split_cost = TRAVERSAL_COST + np.divide(best_cost, node_area, out=best_cost.copy(), where=node_area > 0)
+        split = np.isfinite(best_cost) & ((seg_count > max_leaf_size) | (split_cost < seg_count))
+
+        self.indices[positions] = prims
+        bounds_min[positions], bounds_max[positions] = prim_min, prim_max
+
+        child = np.full(k, -1)
+        child[split] = next_node + 2 * np.arange(np.count_nonzero(split))
+        next_node += 2 * np.count_nonzero(split)
+        # children segments of split nodes in order of their node ids
+        n_left = left_count[np.arange(k), best][split]
+        starts = seg_start[split]
+        new_start = np.stack([starts, starts + n_left], axis=1).ravel()
+        new_count = np.stack([n_left, seg_count[split] - n_left], axis=1).ravel()
+        return (node_min, node_max, child, seg_start, seg_count), new_start, new_count, next_node
+
+    def _as_lists(self):
+        if self._lists is None:
+            # boxes as flat lists [x_min, y_min, z_min, x_max, y_max, z_max]
+            boxes = np.concatenate([self.node_min, self.node_max], axis=1)
+            self._lists = (boxes.tolist(), self.child.tolist(), self.start.tolist(), self.count.tolist(),
+                           self.indices.tolist())
+        return self._lists
+
+    def closest_hit(self, ray, t_min, t_max, hit_prim):
+        # returns closest result of hit_prim(primitive index, ray, t_min, t_max) (result[0] is ray parameter t)
+        if self.size == 0:
+            return None
+        boxes, child, start, count, indices = self._as_lists()
+
+        ox, oy, oz = float(ray.origin.x), float(ray.origin.y), float(ray.origin.z)
+        d = ray.direction
+        ix = 1 / float(d.x) if d.x != 0 else float("inf")
+        iy = 1 / float(d.y) if d.y != 0 else float("inf")
+        iz = 1 / float(d.z) if d.z != 0 else float("inf")
+        # slab test: indices of box coordinates the ray enters and leaves through per axis
+        nx, ny, nz = (0 if ix >= 0 else 3), (1 if iy >= 0 else 4), (2 if iz >= 0 else 5)
+        fx, fy, fz = 3 - nx, 5 - ny, 7 - nz
+
+        result = None
+        # stack of (node, ray parameter entering its box), nearer children are visited first
+        stack = [(0, t_min)]
+        while stack:
+            node, t_enter = stack.pop()
+            if t_enter > t_max:
+                continue
+            box = boxes[node]
+            t_near = (box[nx] - ox) * ix
+            t = (box[ny] - oy) * iy
+            if t > t_near:
+                t_near = t
+            t = (box[nz] - oz) * iz
+            if t > t_near:
+                t_near = t
+            t_far = (box[fx] - ox) * ix
+            t = (box[fy] - oy) * iy
+            if t < t_far:
+                t_far = t
+            t = (box[fz] - oz) * iz
+            if t < t_far:
+                t_far = t
+            if t_near > t_far or t_far < t_min or t_near > t_max:
+                continue
+
+            if child[node] < 0:
+                for i in indices[start[node]:start[node] + count[node]]:
+                    result_prim = hit_prim(i, ray, t_min, t_max)
+                    if result_prim is not None and (result is None or result_prim[0] < result[0]):
+                        result = result_prim
+                        t_max = result[0]
+                continue
+
+            # visit child containing the box corner the ray enters first before the other child
+            left = child[node]
+            left_box, right_box = boxes[left], boxes[left + 1]
+            d_left = (left_box[nx] - ox) * ix + (left_box[ny] - oy) * iy + (left_box[nz] - oz) * iz
+            d_right = (right_box[nx] - ox) * ix + (right_box[ny] - oy) * iy + (right_box[nz] - oz) * iz
+            if d_left <= d_right:
+                stack.append((left + 1, t_near))
+                stack.append((left, t_near))
+            else:
+                stack.append((left, t_near))
+                stack.append((left + 1, t_near))
+        return result
+
+    def closest_hit_batch(self, origins, directions, t_min, t_max, hit_leaf):
+        # packet traversal for (N, 3) arrays of rays: returns ray parameter t (t_max for no hit) and index of the
+        # closest primitive (-1 for no hit) for each ray, hit_leaf(primitives, rays, t_best, index) has to store
+        # closer hits of the given rays (indices into origins) with the given primitives in t_best and index
+        n = len(origins)
+        t_best = np.full(n, t_max, dtype=float)
+        index = np.full(n, -1)
+        if self.size == 0:
+            return t_best, index
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_directions = 1 / directions
+            # stack of (node, rays possibly hitting primitives of the node)
+            stack = [(0, np.arange(n))]
+            while stack:
+                node, rays = stack.pop()
+                o, inv = origins[rays], inv_directions[rays]
+                t0 = (self.node_min[node] - o) * inv
+                t1 = (self.node_max[node] - o) * inv
+                t_near = np.max(np.fmin(t0, t1), axis=1)
+                t_far = np.min(np.fmax(t0, t1), axis=1)
+                rays = rays[(t_near <= t_far) & (t_far >= t_min) & (t_near <= t_best[rays])]
+                if len(rays) == 0:
+                    continue
+
+                if self.child[node] < 0 or self.count[node] <= BATCH_LEAF_SIZE:
+                    hit_leaf(self.indices[self.start[node]:self.start[node] + self.count[node]], rays, t_best, index)
+                else:
+                    stack.append((self.child[node] + 1, rays))
+                    stack.append((self.child[node], rays))
+        return t_best, index
+
+    def any_hit(self, ray, t_min, t_max, occludes_prim):
+        # returns if occludes_prim(primitive index, ray, t_min, t_max) is true for any primitive,
+        # stops at the first one (order of traversal doesn't matter)
+        if self.size == 0:
+            return False
+        boxes, child, start, count, indices = self._as_lists()
+
+        ox, oy, oz = float(ray.origin.x), float(ray.origin.y), float(ray.origin.z)
+        d = ray.direction
+        ix = 1 / float(d.x) if d.x != 0 else float("inf")
+        iy = 1 / float(d.y) if d.y != 0 else float("inf")
+        iz = 1 / float(d.z) if d.z != 0 else float("inf")
+        # slab test like in closest_hit
+        nx, ny, nz = (0 if ix >= 0 else 3), (1 if iy >= 0 else 4), (2 if iz >= 0 else 5)
+        fx, fy, fz = 3 - nx, 5 - ny, 7 - nz
+
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            box = boxes[node]
+            t_near = (box[nx] - ox) * ix
+            t = (box[ny] - oy) * iy
+            if t > t_near:
+                t_near = t
+            t = (box[nz] - oz) * iz
+            if t > t_near:
+                t_near = t
+            t_far = (box[fx] - ox) * ix
+            t = (box[fy] - oy) * iy
+            if t < t_far:
+                t_far = t
+            t = (box[fz] - oz) * iz
+            if t < t_far:
+                t_far = t
+            if t_near > t_far or t_far < t_min or t_near > t_max:
+                continue
+
+            if child[node] < 0:
+                for i in indices[start[node]:start[node] + count[node]]:
+                    if occludes_prim(i, ray, t_min, t_max):
+                        return True
+            else:
+                stack.append(child[node] + 1)
+                stack.append(child[node])
+        return False
+
+    def any_hit_batch(self, origins, directions, t_min, t_max, occluded_leaf):
+        # packet version of any_hit for (N, 3) arrays of rays (t_max may be an array per ray): returns boolean array,
+        # occluded_leaf(primitives, rays, t_max of rays, occluded) has to mark rays (indices into origins) hitting
+        # any of the given primitives in occluded, occluded rays are not traversed any further
+        n = len(origins)
+        t_max = np.broadcast_to(np.asarray(t_max, dtype=float), n)
+        occluded = np.zeros(n, dtype=bool)
+        if self.size == 0:
+            return occluded
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_directions = 1 / directions
+            stack = [(0, np.arange(n))]
+            # rays of the stack are only filtered once any ray is occluded
+            found = False
+            while stack:
+                node, rays = stack.pop()
+                if found:
+                    rays = rays[~occluded[rays]]
+                    if len(rays) == 0:
+                        continue
+                o, inv = origins[rays], inv_directions[rays]
+                t0 = (self.node_min[node] - o) * inv
+                t1 = (self.node_max[node] - o) * inv
+                t_near = np.max(np.fmin(t0, t1), axis=1)
+                t_far = np.min(np.fmax(t0, t1), axis=1)
+                rays = rays[(t_near <= t_far) & (t_far >= t_min) & (t_near <= t_max[rays])]
+                if len(rays) == 0:
+                    continue
+
+                if self.child[node] < 0 or self.count[node] <= BATCH_LEAF_SIZE:
+                    occluded_leaf(self.indices[self.start[node]:self.start[node] + self.count[node]], rays,
+                                  t_max[rays], occluded)
+                    found = found or bool(np.any(occluded[rays]))
+                else:
+                    stack.append((self.child[node] + 1, rays))
+                    stack.append((self.child[node], rays))
+        return occluded
@@ -0,0 +1,101 @@
+import numpy as np
+
+from base.rendering import Framebuffer
+
+# camera rays per pixel of the auxiliary buffers (antialiasing edges, lens samples blur them like the image)
+AUXILIARY_SAMPLES = 4
+# filter taps of the B3 spline kernel of the à-trous wavelet transform (5 x 5 taps, spread 2 ** i pixels apart
+# in iteration i)
+KERNEL = np.array([1 / 16, 1 / 4, 3 / 8, 1 / 4, 1 / 16])
+ITERATIONS = 5
+# edge stopping: weights fall off with the distance of colors (gamma corrected irradiance), normals, relative
+# inverse depths and albedos of the pixels compared with these widths
+SIGMA_COLOR = .4
+SIGMA_NORMAL = .3
+SIGMA_DEPTH = .1
+SIGMA_ALBEDO = .1
+# albedo channels below this aren't divided out of the colors (they hardly reflect any light to denoise)
+MIN_ALBEDO = .01
+
+
+class AuxiliaryBuffers:
+    # features of the first hits of camera rays (mean over a few rays per pixel, rows from the bottom like
+    # Framebuffer): albedo of the material (its emitted color for emissive materials and spheres without material,
+    # white for transmissive ones, the background for rays hitting nothing), normal facing the ray (zero if
+    # nothing was hit) and distance along the ray (mean of the rays hitting something, zero if none did)
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.albedo = np.zeros((height, width, 3), dtype=np.float32)
+        self.normal = np.zeros((height, width, 3), dtype=np.float32)
+        self.depth = np.zeros((height, width), dtype=np.float32)
+
+    def add(self, x_start, y_start, albedo, normal, depth):
+        # sets the features of a tile with lower left corner (x_start, y_start)
+        height, width = depth.shape
+        region = np.s_[y_start:y_start + height, x_start:x_start + width]
+        self.albedo[region], self.normal[region], self.depth[region] = albedo, normal, depth
+
+    def save(self, path):
+        # saves the buffers as portable float maps next to path: .albedo.pfm, .normal.pfm and .depth.pfm
+        # (e.g. as input of other denoisers)
+        base = path.rsplit(".", 1)[0]
+        for name, values in (("albedo", self.albedo), ("normal", self.normal),
+                             ("depth", np.repeat(self.depth[..., None], 3, axis=2))):
+            framebuffer = Framebuffer(self.width, self.height)
+            framebuffer.add(0, 0, values, np.ones((self.height, self.width), dtype=np.int32))
+            framebuffer.save_pfm(f"{base}.{name}.pfm")
+
+
+def denoise(framebuffer, auxiliary, iterations=ITERATIONS):
+    # returns framebuffer with the mean colors filtered by the edge avoiding à-trous wavelet transform
+    # (Dammertz et al. 2010) guided by the auxiliary buffers: the albedo is divided out, so only the noisy
+    # irradiance is blurred while texture and edges of objects stay sharp, samples stay the same
+    albedo = np.where(auxiliary.albedo > MIN_ALBEDO, auxiliary.albedo, 1)
+    irradiance = framebuffer.mean() / albedo
+    # inverse depth is 0 where nothing was hit and compares depths relative to their size
+    inverse_depth = np.where(auxiliary.depth > 0, 1 / np.maximum(auxiliary.depth, 1e-9), 0)[..., None]
+
+    sigma_color = SIGMA_COLOR
+    for i in range(iterations):
+        irradiance = atrous_step(irradiance, [(auxiliary.normal, SIGMA_NORMAL), (auxiliary.albedo, SIGMA_ALBEDO)],
+                                 inverse_depth, 2 ** i, sigma_color)
+        # finer details of the colors survive the coarser levels (the noise is mostly gone by then)
+        sigma_color /= 2
+
+    denoised = Framebuffer(framebuffer.width, framebuffer.height)
+    denoised.add(0, 0, irradiance * albedo * np.maximum(framebuffer.samples, 1)[..., None], framebuffer.samples)
+    return denoised
+
+
+def atrous_step(colors, guides, inverse_depth, step, sigma_color):
+    # one level of the à-trous transform: weighted mean of 5 x 5 pixels step pixels apart, weights of the
+    # kernel are multiplied by the similarity of colors, guides (features with their sigma) and depths
+    # (borders are extended)
+    height, width = colors.shape[:2]
+    pad = 2 * step
+
+    def padded(values):
+        return np.pad(values, ((pad, pad), (pad, pad), (0, 0)), mode="edge")
+
+    # color distances in gamma space, so bright and dark regions are treated alike
+    gamma = np.sqrt(np.maximum(colors, 0))
+    padded_colors, padded_gamma, padded_depth = padded(colors), padded(gamma), padded(inverse_depth)
+    padded_guides = [(padded(guide), guide, sigma) for guide, sigma in guides]
+    relative_depth = np.maximum(inverse_depth[..., 0], 1e-9)
+
+    total = np.zeros_like(colors)
+    weights = np.zeros((height, width))
+    for dy in range(5):
+        for dx in range(5):
+            region = np.s_[dy * step:dy * step + height, dx * step:dx * step + width]
+            weight = KERNEL[dy] * KERNEL[dx] * np.exp(
+                -np.sum((padded_gamma[region] - gamma) ** 2, axis=2) / sigma_color ** 2)
+            for padded_guide, guide, sigma in padded_guides:
+                weight *= np.exp(-np.sum((padded_guide[region] - guide) ** 2, axis=2) / sigma ** 2)
+            depth_difference = (padded_depth[region][..., 0] - inverse_depth[..., 0]) / relative_depth
+            weight *= np.exp(-np.minimum(depth_difference ** 2 / SIGMA_DEPTH ** 2, 50))
+            total += padded_colors[region] * weight[..., None]
+            weights += weight
+    # the center pixel always has weight, weights can't be 0
+    return total / weights[..., None]
@@ -0,0 +1,217 @@
+import argparse
+import importlib
+import multiprocessing
+import os
+import pickle
+import socket
+import struct
+import threading
+from collections import deque
+
+import numpy as np
+
+from base.rendering import Framebuffer
+from base.tiles import TILE_SIZE, Progress, finish, split_tiles, tile_seeds
+
+# time in seconds a worker may take for a job before it is handed out again
+JOB_TIMEOUT = 600
+
+# messages are pickled Python objects prefixed by their length (8 bytes, big endian)
+# (pickle executes code when loading, only connect coordinator and workers within a trusted network)
+HEADER = struct.Struct(">Q")
+
+
+def send_message(connection, message):
+    send_bytes(connection, pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def send_bytes(connection, data):
+    connection.sendall(HEADER.pack(len(data)) + data)
+
+
+def receive_message(connection):
+    size, = HEADER.unpack(_receive_exactly(connection, HEADER.size))
+    return pickle.loads(_receive_exactly(connection, size))
+
+
+def _receive_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(min(size - len(data), 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        data += chunk
+    return bytes(data)
+
+
+class Coordinator:
+    # hands out tiles of all cameras of a scene as jobs to workers connecting over sockets and adds the returned
+    # colors of the tiles to one framebuffer per camera, jobs of workers that disconnect or exceed job_timeout are
+    # handed out again
+    # (seeds are the same as for Scene.render with sweep=False, so the images equal those of a local render with the
+    # same seed that renders every camera on its own, sweeps share samples between cameras and differ from them)
+    def __init__(self, scene, seed=None, host="localhost", port=0, job_timeout=JOB_TIMEOUT, tile_size=TILE_SIZE):
+        self.job_timeout = job_timeout
+        # acceleration structure is built once before the scene is sent to the workers
+        scene.build()
+        self.scene_data = pickle.dumps(scene, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # jobs (camera index, tile, seed) of all cameras
+        self.scene = scene
+        self.cameras = scene.cameras
+        self.jobs = []
+        self.framebuffers = []
+        camera_seeds = np.random.SeedSequence(seed).spawn(len(scene.cameras))
+        for i, (cam, camera_seed) in enumerate(zip(scene.cameras, camera_seeds)):
+            tiles = split_tiles(cam.image_width, cam.image_height, tile_size)
+            self.jobs += [(i, tile, tile_seed) for tile, tile_seed in zip(tiles, tile_seeds(camera_seed, len(tiles)))]
+            self.framebuffers.append(Framebuffer(cam.image_width, cam.image_height))
+
+        # indices of jobs waiting for a worker and of finished jobs (guarded by condition)
+        self.pending = deque(range(len(self.jobs)))
+        self.finished = set()
+        self.condition = threading.Condition()
+        self.report = None
+
+        self.server = socket.create_server((host, port))
+        self.address = self.server.getsockname()[:2]
+
+    def run(self, progress=True):
+        # serves workers until all jobs are finished and returns the images of all cameras
+        self.report = Progress(len(self.jobs), progress)
+        threading.Thread(target=self._accept, daemon=True).start()
+        with self.condition:
+            while len(self.finished) < len(self.jobs):
+                self.condition.wait()
+        self.server.close()
+        return [finish(cam, self.scene, framebuffer) for framebuffer, cam in zip(self.framebuffers, self.cameras)]
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                # server was closed
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        # sends scene and jobs one after another to a worker until all jobs are finished
+        job = None
+        try:
+            with connection:
+                send_bytes(connection, self.scene_data)
+                connection.settimeout(self.job_timeout)
+                while True:
+                    job = self._next_job()
+                    if job is None:
+                        send_message(connection, ("done",))
+                        return
+                    send_message(connection, ("job", job) + self.jobs[job])
+                    _, result_job, colors, samples = receive_message(connection)
+                    self._finish_job(result_job, colors, samples)
+                    job = None
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # lost worker (connection closed, timeout or broken message): job is handed out again
+            if job is not None:
+                with self.condition:
+                    if job not in self.finished:
+                        self.pending.append(job)
+                    self.condition.notify_all()
+
+    def _next_job(self):
+        # returns index of the next pending job, waits while all remaining jobs are handed out
+        # (they may be returned by lost workers), None if all jobs are finished
+        with self.condition:
+            while not self.pending:
+                if len(self.finished) == len(self.jobs):
+                    return None
+                self.condition.wait()
+            return self.pending.popleft()
+
+    def _finish_job(self, job, colors, samples):
+        with self.condition:
+            # a job handed out again may be finished twice (but must only be added once)
+            if job not in self.finished:
+                camera_index, tile, _ = self.jobs[job]
+                self.framebuffers[camera_index].add(tile.x_start, tile.y_start, colors, samples)
+                self.finished.add(job)
+                self.report.update()
+            self.condition.notify_all()
+
+
+def run_worker(host, port):
+    # renders jobs of a coordinator until it reports that all jobs are finished (or it is gone)
+    with socket.create_connection((host, port)) as connection:
+        scene = receive_message(connection)
+        while True:
+            try:
+                message = receive_message(connection)
+            except ConnectionError:
+                return
+            if message[0] == "done":
+                return
+            _, job, camera_index, tile, seed = message
+            colors, samples = scene.cameras[camera_index].render_tile_colors(scene, tile, seed)
+            # float32 like the framebuffer of the coordinator
+            send_message(connection, ("result", job, colors.astype(np.float32), samples))
+
+
+def start_workers(host, port, processes):
+    # starts worker processes connecting to a coordinator and returns them
+    workers = [multiprocessing.Process(target=run_worker, args=(host, port), daemon=True) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def render_local(scene, workers=None, seed=None, progress=True):
+    # renders all cameras of scene by a coordinator and worker processes on localhost, returns the images
+    coordinator = Coordinator(scene, seed)
+    processes = start_workers(*coordinator.address, os.cpu_count() if workers is None else workers)
+    images = coordinator.run(progress)
+    for process in processes:
+        process.join()
+    return images
+
+
+def save_images(scene, images):
+    for i, image in enumerate(images):
+        image.save_image(scene.image_path(i))
+        print(f"Rendered {i + 1} camera!")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render scenes on several machines")
+    commands = parser.add_subparsers(dest="command", required=True)
+    coordinator_parser = commands.add_parser("coordinator", help="hand out tiles of a scene to workers")
+    coordinator_parser.add_argument("module", help="module defining scene, e.g. scenes.scene9")
+    coordinator_parser.add_argument("--host", default="")
+    coordinator_parser.add_argument("--port", type=int, default=5000)
+    coordinator_parser.add_argument("--seed", type=int)
+    coordinator_parser.add_argument("--timeout", type=float, default=JOB_TIMEOUT, help="seconds per job")
+    worker_parser = commands.add_parser("worker", help="render tiles of a coordinator")
+    worker_parser.add_argument("address", help="host:port of the coordinator")
+    worker_parser.add_argument("--processes", type=int, default=os.cpu_count())
+    local_parser = commands.add_parser("local", help="coordinator and workers on this machine")
+    local_parser.add_argument("module", help="module defining scene, e.g. scenes.scene9")
+    local_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    local_parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        host, port = args.address.rsplit(":", 1)
+        for process in start_workers(host, int(port), args.processes):
+            process.join()
+        return
+    scene = importlib.import_module(args.module).scene
+    if args.command == "coordinator":
+        coordinator = Coordinator(scene, args.seed, args.host, args.port, args.timeout)
+        print(f"Waiting for workers on port {coordinator.address[1]}")
+        save_images(scene, coordinator.run())
+    else:
+        save_images(scene, render_local(scene, args.workers, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import numpy as np
 
 
 class Vector:
+    # no instance dict: smaller and faster to create (many temporary vectors are created per ray)
+    __slots__ = ("x", "y", "z")
 
     def __init__(self, x, y, z):
         self.x = x
@@ -27,15 +29,43 @@ class Vector:
 
     def __truediv__(self, l):
         # overrides / operator for vectors to element-wise division by l
-        return Vector(self.x * 1/l, self.y * 1/l, self.z * 1/l)
+        inv = 1 / l
+        return Vector(self.x * inv, self.y * inv, self.z * inv)
+
+    def __iadd__(self, v):
+        # overrides += operator to add vector v in place (no new vector is created)
+        self.x += v.x
+        self.y += v.y
+        self.z += v.z
+        return self
+
+    def __imul__(self, l):
+        # overrides *= operator for scalar multiplication in place (v *= vector is still the dot product)
+        if type(l) is Vector:
+            return NotImplemented
+        self.x *= l
+        self.y *= l
+        self.z *= l
+        return self
+
+    def mul_add(self, v, l):
+        # fused self += v * l in place
+        self.x += v.x * l
+        self.y += v.y * l
+        self.z += v.z * l
+        return self
+
+    def mul(self, v):
+        # returns element-wise product with vector v (e.g. for attenuating colors)
+        return Vector(self.x * v.x, self.y * v.y, self.z * v.z)
 
     def __floordiv__(self, l):
         # overrides // operator for vectors to element-wise floor division by l
         return Vector(self.x * 1 // l, self.y * 1 // l, self.z * 1 // l)
 
     def length(self):
-        # returns length of vector
-        return np.sqrt(self.x ** 2 + self.y ** 2 + self.z ** 2)
+        # returns length of vector (as Python float, NumPy scalars are much slower in further calculations)
+        return (self.x * self.x + self.y * self.y + self.z * self.z) ** .5
 
     def normalize(self):
         # returns vector element-wise divided by its length
@@ -50,6 +80,10 @@ class Vector:
         # returns vector as formatted string
         return f"{self.x} {self.y} {self.z}"
 
+    def to_array(self):
+        # returns vector as NumPy array of floats
+        return np.array([self.x, self.y, self.z], dtype=float)
+
     def to_int_array(self):
         # returns vector as array of ints
         # rounded for more correct colors (but cast to int to \void floats in ppm file)
@@ -147,3 +181,57 @@ class Ray:
     def get_position(self, t):
         # returns position on ray as vector by passing ray parameter p
         return self.origin + self.direction * t
+
+
+# helpers for batches of vectors stored as (N, 3) NumPy arrays (used by the wavefront renderer)
+def batch_dot(a, b):
+    # returns row-wise dot products of two (N, 3) arrays
+    return np.einsum("ij,ij->i", a, b)
+
+
+def batch_normalize(a):
+    # returns rows of a divided by their lengths
+    return a / np.sqrt(batch_dot(a, a))[:, None]
+
+
+def batch_near_zero(a):
+    # same test as Vector.near_zero for each row
+    s = 1e-8
+    return np.all(a < s, axis=1)
+
+
+def batch_reflect(a, norm):
+    # returns rows of a reflected on the normals
+    return a - norm * (batch_dot(a, norm) * 2)[:, None]
+
+
+def batch_refract(a, norm, cos_theta, eta_ratio):
+    r_out_perp = (a + norm * cos_theta[:, None]) * eta_ratio[:, None]
+    r_out_parallel = norm * -np.sqrt(np.abs(1 - batch_dot(r_out_perp, r_out_perp)))[:, None]
+    return r_out_perp + r_out_parallel
+
+
+# helpers for 4x4 matrices of affine transforms (used by Instance), transforms are combined by matrix products,
+# e.g. translation(v) @ rotation(axis, 90) @ scaling(2) scales first and translates last
+def translation(offset):
+    # returns matrix moving points by offset (vector)
+    matrix = np.identity(4)
+    matrix[:3, 3] = offset.to_array()
+    return matrix
+
+
+def scaling(factors):
+    # returns matrix scaling by factors (one number or a vector with a factor per axis)
+    matrix = np.identity(4)
+    matrix[:3, :3] *= factors.to_array() if type(factors) is Vector else factors
+    return matrix
+
+
+def rotation(axis, angle):
+    # returns matrix rotating counter-clockwise around axis (vector) by angle in degrees (Rodrigues' formula)
+    x, y, z = axis.normalize().to_array()
+    k = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    theta = np.radians(angle)
+    matrix = np.identity(4)
+    matrix[:3, :3] += np.sin(theta) * k + (1 - np.cos(theta)) * k @ k
+    return matrix
@@ -1,6 +1,8 @@
-import cv2
 import os
 
+from base.rendering import Image
+
+# converts .ppm files rendered before scenes could save .png files directly (Scene image_format="png")
 in_dir = "../images/"
 ex_dir = "../images_report/"
 
@@ -9,8 +11,7 @@ file_names = os.listdir(in_dir)
 for file_name in file_names:
     file_split = file_name.split(".")
     if file_split[1] == "ppm":
-        img = cv2.imread(in_dir + file_name)
-        cv2.imwrite(ex_dir + file_split[0] + ".png", img)
+        img = Image.load_image(in_dir + file_name)
+        img.save_image(ex_dir + file_split[0] + ".png")
 
         print("Converted and saved in " + ex_dir + file_split[0] + ".png!")
-
@@ -0,0 +1,531 @@
+import math
+import weakref
+
+import numpy as np
+
+from base.materials import DiffuseMaterial, EmissiveMaterial, SpecularMaterial, TransmissiveMaterial
+
+# Numba is optional: without it the kernels stay plain Python functions and render mode "jit" falls back to the
+# wavefront renderer (see supported)
+try:
+    import numba
+except ImportError:
+    numba = None
+
+AVAILABLE = numba is not None
+
+# material types of the kernels
+DIFFUSE, SPECULAR, TRANSMISSIVE, EMISSIVE = range(4)
+MATERIAL_TYPES = {DiffuseMaterial: DIFFUSE, SpecularMaterial: SPECULAR, TransmissiveMaterial: TRANSMISSIVE,
+                  EmissiveMaterial: EMISSIVE}
+# kinds of the primitives between spheres and planes (see Scene.build)
+DISK, BOX = range(2)
+# concatenated mesh arrays of compiled scenes and the depth of their deepest hierarchy (see mesh_arrays) by their
+# hierarchy
+_meshes = weakref.WeakKeyDictionary()
+
+
+def jit(function):
+    # compiles function with Numba (cached on disk, so only the first render compiles it) if available
+    return numba.njit(cache=True)(function) if AVAILABLE else function
+
+
+def supported(camera, scene):
+    # returns if the kernels can render camera and scene: Numba is installed, the scene has spheres, disks, boxes,
+    # triangle meshes, instances of them and planes only with materials of this module and the camera doesn't
+    # sample lights (these fall back to the wavefront renderer)
+    scene.build()
+    return (AVAILABLE and not scene.unbatched and all(type(m) in MATERIAL_TYPES for m in scene.materials)
+            and not (camera.light_sampling and len(scene.lights) > 0))
+
+
+def material_arrays(materials):
+    # returns type, albedo (or emitted color), fuzz and index of refraction of the materials as arrays
+    types = np.array([MATERIAL_TYPES[type(m)] for m in materials], dtype=np.int64)
+    colors = np.zeros((len(materials), 3))
+    parameters = np.zeros(len(materials))
+    for j, m in enumerate(materials):
+        if type(m) is EmissiveMaterial:
+            colors[j] = m.emitted().to_array()
+        elif type(m) is not TransmissiveMaterial:
+            colors[j] = m.albedo.to_array()
+        if type(m) is SpecularMaterial:
+            parameters[j] = m.fuzz
+        elif type(m) is TransmissiveMaterial:
+            parameters[j] = m.ior
+    return types, colors, parameters
+
+
+def shape_arrays(scene):
+    # returns kinds and parameters of the disks and boxes of the compiled scene (center, normal and radius of disks,
+    # minimum and maximum of boxes) as arrays indexed by primitive index minus number of spheres
+    (_, disks), (_, boxes) = scene.shapes
+    kinds = np.concatenate([np.full(len(disks), DISK), np.full(len(boxes), BOX)]).astype(np.int64)
+    return (kinds, np.concatenate([disks.points, boxes.minima]), np.concatenate([disks.normals, boxes.maxima]),
+            np.concatenate([disks.radii, np.zeros(len(boxes))]))
+
+
+def mesh_arrays(scene):
+    # returns the meshes and instances of the compiled scene as tuple of arrays: root node of the mesh of each
+    # primitive followed by the nodes of the hierarchies (see BVH) and the triangles (corners, edges and normals, see
+    # TriangleStore) of the meshes concatenated and the matrix transforming rays into the space of the mesh of each
+    # primitive (3 rows of a 4x4 matrix, identity for meshes), children, leaf starts and triangle indices refer to
+    # the concatenated arrays, meshes shared by instances are stored once, also returns the depth of the deepest
+    # mesh hierarchy (kept until the scene changes)
+    if scene.bvh in _meshes:
+        return _meshes[scene.bvh]
+    prims = [(mesh, np.identity(4)) for mesh in scene.meshes] + [obj.flattened() for obj in scene.instances]
+    roots, inverses = [], [np.empty((0, 3, 4))]
+    # root node of each mesh by its id
+    stored = {}
+    nodes = [(np.empty((0, 3)), np.empty((0, 3)), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+              np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))]
+    triangles = [(np.empty((0, 3)),) * 4]
+    node_offset, triangle_offset, depth = 0, 0, 0
+    for mesh, inverse in prims:
+        inverses.append(inverse[None, :3])
+        if id(mesh) in stored:
+            roots.append(stored[id(mesh)])
+            continue
+        bvh = mesh.build()
+        depth = max(depth, bvh.depth)
+        stored[id(mesh)] = node_offset
+        roots.append(node_offset)
+        nodes.append((bvh.node_min, bvh.node_max, np.where(bvh.child >= 0, bvh.child + node_offset, -1),
+                      bvh.start + triangle_offset, bvh.count, bvh.indices + triangle_offset))
+        t = mesh.triangles
+        triangles.append((t.corners, t.edges1, t.edges2, t.normals))
+        node_offset += len(bvh.child)
+        triangle_offset += len(t)
+    arrays = (np.array(roots, dtype=np.int64),) + tuple(np.concatenate(a) for a in zip(*nodes)) + tuple(
+        np.concatenate(a) for a in zip(*triangles)) + (np.concatenate(inverses),)
+    _meshes[scene.bvh] = arrays, depth
+    return arrays, depth
+
+
+def render_tile(camera, scene, tile, sampler, stats=None):
+    # renders a tile like wavefront.render_tile with the compiled kernels: returns summed up colors and number of
+    # samples of each pixel, camera samples are taken from sampler, random numbers of paths from a seed of it
+    bvh = scene.build()
+    rays = camera.primary_rays(tile)
+    camera_samples = sampler.pixel_samples(tile.width * tile.height, camera.samples_per_pixel)
+    types, material_colors, parameters = material_arrays(scene.materials)
+    kinds, shape_a, shape_b, shape_radii = shape_arrays(scene)
+    meshes, mesh_depth = mesh_arrays(scene)
+    # traversal stacks of the scene's and of the mesh hierarchies (the kernels don't check bounds, a traversal keeps
+    # at most one pending node per level and the two children of the current one)
+    stacks = np.empty((2, max(bvh.depth, mesh_depth) + 2), dtype=np.int64)
+    lens_u, lens_v = rays.lens if rays.lens is not None else (np.zeros(3), np.zeros(3))
+    rr_depth = -1 if camera.russian_roulette_depth is None else camera.russian_roulette_depth
+    seed = int(sampler.rng.integers(1 << 32))
+    # light gathered up to each depth of a depth sweep is kept in a layer of its own (one layer without)
+    depths = np.array(camera.depth_sweep if camera.depth_sweep is not None else [camera.max_bounce_depth])
+
+    colors = np.zeros((tile.height, tile.width, len(depths), 3))
+    samples = np.zeros((tile.height, tile.width), dtype=np.int64)
+    # counters of rays per bounce, intersection tests and hits per material (last entry: objects without material)
+    ray_counts = np.zeros(camera.max_bounce_depth + 1, dtype=np.int64)
+    tests = np.zeros(1, dtype=np.int64)
+    hit_counts = np.zeros(len(scene.materials) + 1, dtype=np.int64)
+
+    _render_tile(rays.pixels, rays.step_x, rays.step_y, rays.origin, lens_u, lens_v, rays.lens is not None,
+                 rays.antialiasing, camera_samples, camera.adaptive, camera.min_samples, camera.noise_threshold,
+                 bvh.node_min, bvh.node_max, bvh.child, bvh.start, bvh.count, bvh.indices,
+                 scene.spheres.centers, scene.spheres.radii, kinds, shape_a, shape_b, shape_radii, meshes,
+                 scene.planes.points, scene.planes.normals, scene.material_ids, scene.colors, types, material_colors,
+                 parameters, camera.background_gradient[0].to_array(), camera.background_gradient[1].to_array(),
+                 camera.t_min, camera.t_max, camera.max_bounce_depth, depths, rr_depth, seed, stacks, colors,
+                 samples, ray_counts, tests, hit_counts)
+
+    if stats is not None:
+        for bounce, count in enumerate(ray_counts):
+            if count > 0:
+                stats.add_rays(bounce, count)
+        stats.intersection_tests += int(tests[0])
+        for j, count in enumerate(hit_counts):
+            if count > 0:
+                stats.add_hits(scene.materials[j] if j < len(scene.materials) else None, count)
+    return colors if camera.depth_sweep is not None else colors[:, :, 0], samples
+
+
+@jit
+def _seed(seed):
+    # Numba keeps its own random state (per thread), seeded for each tile
+    np.random.seed(seed)
+
+
+@jit
+def _closest_hit(node_min, node_max, child, start, count, indices, centers, radii, kinds, shape_a, shape_b,
+                 shape_radii, meshes, plane_points, plane_normals, ox, oy, oz, dx, dy, dz, t_min, t_max, stacks, tests):
+    # compiled version of Scene.hit: returns index of the closest primitive (-1 for no hit), its ray parameter and
+    # the hit triangle for meshes (see mesh_arrays), planes are tested first and limit the traversal of the hierarchy
+    ix = 1 / dx if dx != 0 else np.inf
+    iy = 1 / dy if dy != 0 else np.inf
+    iz = 1 / dz if dz != 0 else np.inf
+    a = dx * dx + dy * dy + dz * dz
+    best, triangle = -1, -1
+    mesh_offset = len(radii) + len(kinds)
+    plane_offset = mesh_offset + len(meshes[0])
+    for k in range(len(plane_points)):
+        tests[0] += 1
+        t = _plane_hit(plane_points[k], plane_normals[k], ox, oy, oz, dx, dy, dz)
+        if t_min <= t < t_max:
+            best = plane_offset + k
+            t_max = t
+    if len(child) == 0:
+        return best, t_max, triangle
+    stack = stacks[0]
+    stack[0] = 0
+    top = 1
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        t_near, t_far = _slabs(node_min[node], node_max[node], ox, oy, oz, ix, iy, iz)
+        if t_near > t_far or t_far < t_min or t_near > t_max:
+            continue
+
+        if child[node] < 0:
+            for k in range(start[node], start[node] + count[node]):
+                i = indices[k]
+                tests[0] += 1
+                if i >= mesh_offset:
+                    hit_triangle, t = _mesh_hit(meshes, i - mesh_offset, ox, oy, oz, dx, dy, dz, t_min, t_max,
+                                                stacks[1], tests)
+                    if hit_triangle >= 0:
+                        best, triangle = i, hit_triangle
+                        t_max = t
+                    continue
+                if i >= len(radii):
+                    t = _shape_hit(i - len(radii), kinds, shape_a, shape_b, shape_radii, ox, oy, oz, dx, dy, dz,
+                                   ix, iy, iz, t_min)
+                    if t_min <= t < t_max:
+                        best = i
+                        t_max = t
+                    continue
+                px, py, pz = ox - centers[i, 0], oy - centers[i, 1], oz - centers[i, 2]
+                half_b = px * dx + py * dy + pz * dz
+                discriminant = half_b * half_b - a * (px * px + py * py + pz * pz - radii[i] * radii[i])
+                if discriminant < 0:
+                    continue
+                sqrtd = math.sqrt(discriminant)
+                t = (-half_b - sqrtd) / a
+                if t < t_min or t > t_max:
+                    t = (-half_b + sqrtd) / a
+                    if t < t_min or t > t_max:
+                        continue
+                best = i
+                t_max = t
+            continue
+
+        # visit the child the ray enters first before the other one
+        left = child[node]
+        near_left = _slabs(node_min[left], node_max[left], ox, oy, oz, ix, iy, iz)[0]
+        near_right = _slabs(node_min[left + 1], node_max[left + 1], ox, oy, oz, ix, iy, iz)[0]
+        if near_left <= near_right:
+            stack[top], stack[top + 1] = left + 1, left
+        else:
+            stack[top], stack[top + 1] = left, left + 1
+        top += 2
+    return best, t_max, triangle
+
+
+@jit
+def _mesh_hit(meshes, m, ox, oy, oz, dx, dy, dz, t_min, t_max, stack, tests):
+    # closest hit of mesh or instance m within [t_min, t_max) by traversing the hierarchy of its mesh with the ray
+    # transformed into the space of the mesh (ray parameters stay the same): returns index of the triangle in the
+    # concatenated arrays of mesh_arrays (-1 for no hit) and its ray parameter
+    roots, node_min, node_max, child, start, count, indices, corners, edges1, edges2, _, inverses = meshes
+    a = inverses[m]
+    ox, oy, oz = (a[0, 0] * ox + a[0, 1] * oy + a[0, 2] * oz + a[0, 3],
+                  a[1, 0] * ox + a[1, 1] * oy + a[1, 2] * oz + a[1, 3],
+                  a[2, 0] * ox + a[2, 1] * oy + a[2, 2] * oz + a[2, 3])
+    dx, dy, dz = (a[0, 0] * dx + a[0, 1] * dy + a[0, 2] * dz,
+                  a[1, 0] * dx + a[1, 1] * dy + a[1, 2] * dz,
+                  a[2, 0] * dx + a[2, 1] * dy + a[2, 2] * dz)
+    ix = 1 / dx if dx != 0 else np.inf
+    iy = 1 / dy if dy != 0 else np.inf
+    iz = 1 / dz if dz != 0 else np.inf
+    best = -1
+    stack[0] = roots[m]
+    top = 1
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        t_near, t_far = _slabs(node_min[node], node_max[node], ox, oy, oz, ix, iy, iz)
+        if t_near > t_far or t_far < t_min or t_near > t_max:
+            continue
+
+        if child[node] < 0:
+            for k in range(start[node], start[node] + count[node]):
+                i = indices[k]
+                tests[0] += 1
+                t = _triangle_hit(corners[i], edges1[i], edges2[i], ox, oy, oz, dx, dy, dz)
+                if t_min <= t < t_max:
+                    best = i
+                    t_max = t
+            continue
+
+        left = child[node]
+        near_left = _slabs(node_min[left], node_max[left], ox, oy, oz, ix, iy, iz)[0]
+        near_right = _slabs(node_min[left + 1], node_max[left + 1], ox, oy, oz, ix, iy, iz)[0]
+        if near_left <= near_right:
+            stack[top], stack[top + 1] = left + 1, left
+        else:
+            stack[top], stack[top + 1] = left, left + 1
+        top += 2
+    return best, t_max
+
+
+@jit
+def _triangle_hit(corner, edge1, edge2, ox, oy, oz, dx, dy, dz):
+    # ray parameter of the hit of a triangle by the Möller–Trumbore test (inf for misses) like TriangleStore.hit
+    px, py, pz = dy * edge2[2] - dz * edge2[1], dz * edge2[0] - dx * edge2[2], dx * edge2[1] - dy * edge2[0]
+    det = edge1[0] * px + edge1[1] * py + edge1[2] * pz
+    if det == 0:
+        return np.inf
+    inv = 1 / det
+    sx, sy, sz = ox - corner[0], oy - corner[1], oz - corner[2]
+    u = (sx * px + sy * py + sz * pz) * inv
+    if u < 0 or u > 1:
+        return np.inf
+    qx, qy, qz = sy * edge1[2] - sz * edge1[1], sz * edge1[0] - sx * edge1[2], sx * edge1[1] - sy * edge1[0]
+    v = (dx * qx + dy * qy + dz * qz) * inv
+    if v < 0 or u + v > 1:
+        return np.inf
+    return (edge2[0] * qx + edge2[1] * qy + edge2[2] * qz) * inv
+
+
+@jit
+def _plane_hit(point, normal, ox, oy, oz, dx, dy, dz):
+    # ray parameter of the hit of a plane (inf for rays parallel to it) like PlaneStore.intersect
+    denominator = normal[0] * dx + normal[1] * dy + normal[2] * dz
+    if denominator == 0:
+        return np.inf
+    return ((point[0] - ox) * normal[0] + (point[1] - oy) * normal[1] + (point[2] - oz) * normal[2]) / denominator
+
+
+@jit
+def _shape_hit(k, kinds, shape_a, shape_b, shape_radii, ox, oy, oz, dx, dy, dz, ix, iy, iz, t_min):
+    # ray parameter of the hit of disk or box k (inf for misses) like DiskStore.intersect and BoxStore.hit_batch
+    if kinds[k] == DISK:
+        t = _plane_hit(shape_a[k], shape_b[k], ox, oy, oz, dx, dy, dz)
+        if t == np.inf:
+            return t
+        px, py, pz = ox + dx * t - shape_a[k, 0], oy + dy * t - shape_a[k, 1], oz + dz * t - shape_a[k, 2]
+        return t if px * px + py * py + pz * pz <= shape_radii[k] * shape_radii[k] else np.inf
+    t_near, t_far = _slabs(shape_a[k], shape_b[k], ox, oy, oz, ix, iy, iz)
+    if t_near > t_far:
+        return np.inf
+    # rays starting inside the box hit it where they leave it
+    return t_near if t_near >= t_min else t_far
+
+
+@jit
+def _normal(i, triangle, px, py, pz, centers, radii, kinds, shape_a, shape_b, meshes, plane_normals):
+    # outward normal of primitive i (and triangle of meshes) at a position on its surface (like Scene.hit_batch)
+    if i < len(radii):
+        return (px - centers[i, 0]) / radii[i], (py - centers[i, 1]) / radii[i], (pz - centers[i, 2]) / radii[i]
+    k = i - len(radii)
+    if k >= len(kinds) + len(meshes[0]):
+        normal = plane_normals[k - len(kinds) - len(meshes[0])]
+        return normal[0], normal[1], normal[2]
+    if k >= len(kinds):
+        # normals of instances are transformed by the transposed inverse
+        n, a = meshes[10][triangle], meshes[11][k - len(kinds)]
+        nx = a[0, 0] * n[0] + a[1, 0] * n[1] + a[2, 0] * n[2]
+        ny = a[0, 1] * n[0] + a[1, 1] * n[1] + a[2, 1] * n[2]
+        nz = a[0, 2] * n[0] + a[1, 2] * n[1] + a[2, 2] * n[2]
+        length = math.sqrt(nx * nx + ny * ny + nz * nz)
+        return nx / length, ny / length, nz / length
+    if kinds[k] == DISK:
+        return shape_b[k, 0], shape_b[k, 1], shape_b[k, 2]
+    # box: along the axis of the closest face
+    p = (px, py, pz)
+    axis, side, closest = 0, 1., np.inf
+    for a in range(3):
+        to_min, to_max = abs(p[a] - shape_a[k, a]), abs(p[a] - shape_b[k, a])
+        if min(to_min, to_max) < closest:
+            axis, side, closest = a, (1. if to_max < to_min else -1.), min(to_min, to_max)
+    return (side if axis == 0 else 0.), (side if axis == 1 else 0.), (side if axis == 2 else 0.)
+
+
+@jit
+def _slabs(box_min, box_max, ox, oy, oz, ix, iy, iz):
+    # ray parameters of entering and leaving an axis-aligned box (slab test like BVH.closest_hit)
+    nx, fx = (box_min[0], box_max[0]) if ix >= 0 else (box_max[0], box_min[0])
+    ny, fy = (box_min[1], box_max[1]) if iy >= 0 else (box_max[1], box_min[1])
+    nz, fz = (box_min[2], box_max[2]) if iz >= 0 else (box_max[2], box_min[2])
+    t_near = max((nx - ox) * ix, (ny - oy) * iy, (nz - oz) * iz)
+    t_far = min((fx - ox) * ix, (fy - oy) * iy, (fz - oz) * iz)
+    return t_near, t_far
+
+
+@jit
+def _ray_color(ox, oy, oz, dx, dy, dz, node_min, node_max, child, start, count, indices, centers, radii, kinds,
+               shape_a, shape_b, shape_radii, meshes, plane_points, plane_normals, material_ids, object_colors, types,
+               material_colors, parameters, background_low, background_high, t_min, t_max, max_depth, depths, layers,
+               rr_depth, stacks, ray_counts, tests, hit_counts):
+    # compiled version of Camera.ray_color (without light sampling), returns the gathered light as three floats,
+    # the light gathered up to each of the ascending depths is written to the rows of layers
+    r, g, b = 0., 0., 0.
+    layer = 0
+    # throughput
+    tr, tg, tb = 1., 1., 1.
+    for bounce in range(max_depth):
+        ray_counts[bounce] += 1
+        i, t, triangle = _closest_hit(node_min, node_max, child, start, count, indices, centers, radii, kinds,
+                                      shape_a, shape_b, shape_radii, meshes, plane_points, plane_normals, ox, oy, oz,
+                                      dx, dy, dz, t_min, t_max, stacks, tests)
+        if i < 0:
+            length = math.sqrt(dx * dx + dy * dy + dz * dz)
+            s = .5 * (dy / length + 1)
+            r += tr * (background_low[0] * (1 - s) + background_high[0] * s)
+            g += tg * (background_low[1] * (1 - s) + background_high[1] * s)
+            b += tb * (background_low[2] * (1 - s) + background_high[2] * s)
+            break
+
+        # hit position and normal against the ray
+        px, py, pz = ox + dx * t, oy + dy * t, oz + dz * t
+        nx, ny, nz = _normal(i, triangle, px, py, pz, centers, radii, kinds, shape_a, shape_b, meshes,
+                             plane_normals)
+        front_face = nx * dx + ny * dy + nz * dz <= 0
+        if not front_face:
+            nx, ny, nz = -nx, -ny, -nz
+
+        j = material_ids[i]
+        hit_counts[j if j >= 0 else len(hit_counts) - 1] += 1
+        if j < 0:
+            # objects without material show their plain color
+            r += tr * object_colors[i, 0]
+            g += tg * object_colors[i, 1]
+            b += tb * object_colors[i, 2]
+            break
+        material_type = types[j]
+        if material_type == EMISSIVE:
+            r += tr * material_colors[j, 0]
+            g += tg * material_colors[j, 1]
+            b += tb * material_colors[j, 2]
+            break
+
+        if material_type == DIFFUSE:
+            # normal plus random unit vector
+            z = 1 - 2 * np.random.random()
+            phi = 2 * math.pi * np.random.random()
+            radius = math.sqrt(max(1 - z * z, 0.))
+            sx, sy, sz = nx + radius * math.cos(phi), ny + radius * math.sin(phi), nz + z
+            if sx < 1e-8 and sy < 1e-8 and sz < 1e-8:
+                sx, sy, sz = nx, ny, nz
+            ar, ag, ab = material_colors[j, 0], material_colors[j, 1], material_colors[j, 2]
+        else:
+            length = math.sqrt(dx * dx + dy * dy + dz * dz)
+            ux, uy, uz = dx / length, dy / length, dz / length
+            cos_incident = ux * nx + uy * ny + uz * nz
+            # reflection of the unit direction
+            sx, sy, sz = ux - 2 * cos_incident * nx, uy - 2 * cos_incident * ny, uz - 2 * cos_incident * nz
+            if material_type == SPECULAR:
+                # plus random fuzz direction in the unit sphere
+                z = 1 - 2 * np.random.random()
+                phi = 2 * math.pi * np.random.random()
+                radius = np.random.random() ** (1 / 3)
+                w = math.sqrt(max(1 - z * z, 0.)) * radius
+                fuzz = parameters[j]
+                sx += fuzz * w * math.cos(phi)
+                sy += fuzz * w * math.sin(phi)
+                sz += fuzz * z * radius
+                if sx * nx + sy * ny + sz * nz <= 0:
+                    break
+                ar, ag, ab = material_colors[j, 0], material_colors[j, 1], material_colors[j, 2]
+            else:
+                # transmissive: reflection or refraction by Schlick's approximation of the reflectance
+                ratio = 1 / parameters[j] if front_face else parameters[j]
+                cos_theta = min(-cos_incident, 1.)
+                sin_theta = math.sqrt(1 - cos_theta * cos_theta)
+                r0 = ((1 - ratio) / (1 + ratio)) ** 2
+                reflectance = r0 + (1 - r0) * (1 - cos_theta) ** 5
+                if not (ratio * sin_theta > 1 or reflectance > np.random.random()):
+                    qx = (ux + nx * cos_theta) * ratio
+                    qy = (uy + ny * cos_theta) * ratio
+                    qz = (uz + nz * cos_theta) * ratio
+                    parallel = -math.sqrt(abs(1 - (qx * qx + qy * qy + qz * qz)))
+                    sx, sy, sz = qx + nx * parallel, qy + ny * parallel, qz + nz * parallel
+                ar, ag, ab = 1., 1., 1.
+
+        ox, oy, oz, dx, dy, dz = px, py, pz, sx, sy, sz
+        tr, tg, tb = tr * ar, tg * ag, tb * ab
+
+        # russian roulette (see Camera.ray_color)
+        if rr_depth >= 0 and bounce + 1 >= rr_depth:
+            survival = min(max(tr, tg, tb), 1.)
+            if np.random.random() >= survival:
+                break
+            tr, tg, tb = tr / survival, tg / survival, tb / survival
+        if layer < len(depths) and bounce + 1 == depths[layer]:
+            layers[layer, 0], layers[layer, 1], layers[layer, 2] = r, g, b
+            layer += 1
+    # paths ending before a depth gathered all their light
+    for k in range(layer, len(depths)):
+        layers[k, 0], layers[k, 1], layers[k, 2] = r, g, b
+    return r, g, b
+
+
+@jit
+def _render_tile(pixels, step_x, step_y, origin, lens_u, lens_v, has_lens, antialiasing, camera_samples, adaptive,
+                 min_samples, noise_threshold, node_min, node_max, child, start, count, indices, centers, radii,
+                 kinds, shape_a, shape_b, shape_radii, meshes, plane_points, plane_normals, material_ids, object_colors,
+                 types, material_colors, parameters, background_low, background_high, t_min, t_max, max_depth, depths,
+                 rr_depth, seed, stacks, colors, samples, ray_counts, tests, hit_counts):
+    # compiled version of the pixel loop of Camera.render_tile_colors with ray generation of PrimaryRays
+    _seed(seed)
+    layers = np.empty((len(depths), 3))
+    height, width = pixels.shape[0], pixels.shape[1]
+    samples_per_pixel = camera_samples.shape[1]
+    for y in range(height):
+        for x in range(width):
+            p = y * width + x
+            luminance_sum, luminance_sq_sum = 0., 0.
+            for s in range(samples_per_pixel):
+                sample = camera_samples[p, s]
+                dx, dy, dz = pixels[y, x, 0], pixels[y, x, 1], pixels[y, x, 2]
+                if antialiasing:
+                    dx += step_x[0] * sample[0] + step_y[0] * sample[1]
+                    dy += step_x[1] * sample[0] + step_y[1] * sample[1]
+                    dz += step_x[2] * sample[0] + step_y[2] * sample[1]
+                ox, oy, oz = origin[0], origin[1], origin[2]
+                if has_lens:
+                    lx, ly = _disc_point(sample[2], sample[3])
+                    qx = lens_u[0] * lx + lens_v[0] * ly
+                    qy = lens_u[1] * lx + lens_v[1] * ly
+                    qz = lens_u[2] * lx + lens_v[2] * ly
+                    ox, oy, oz, dx, dy, dz = ox + qx, oy + qy, oz + qz, dx - qx, dy - qy, dz - qz
+
+                r, g, b = _ray_color(ox, oy, oz, dx, dy, dz, node_min, node_max, child, start, count, indices,
+                                     centers, radii, kinds, shape_a, shape_b, shape_radii, meshes, plane_points,
+                                     plane_normals, material_ids, object_colors, types, material_colors, parameters,
+                                     background_low, background_high, t_min, t_max, max_depth, depths, layers,
+                                     rr_depth, stacks, ray_counts, tests, hit_counts)
+                colors[y, x] += layers
+                samples[y, x] = s + 1
+                if adaptive:
+                    # see Camera.converged
+                    luminance = .2126 * r + .7152 * g + .0722 * b
+                    luminance_sum += luminance
+                    luminance_sq_sum += luminance * luminance
+                    n = s + 1
+                    if n % min_samples == 0 and n > 1:
+                        mean = luminance_sum / n
+                        variance = max(luminance_sq_sum - luminance_sum * mean, 0.) / (n - 1)
+                        if math.sqrt(variance / n) / (2 * math.sqrt(max(mean, 1e-4))) < noise_threshold:
+                            break
+
+
+@jit
+def _disc_point(u, v):
+    # concentric mapping of map_to_unit_disc
+    a, b = 2 * u - 1, 2 * v - 1
+    if a == 0 and b == 0:
+        return 0., 0.
+    if abs(a) > abs(b):
+        r, phi = a, math.pi / 4 * (b / a)
+    else:
+        r, phi = b, math.pi / 2 - math.pi / 4 * (a / b)
+    return r * math.cos(phi), r * math.sin(phi)
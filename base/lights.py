@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+
+from base.geometries import Vector, batch_dot
+
+
+def cone_width(radius_sq, distance_sq):
+    # returns 1 - cos(theta_max) of the cone a sphere subtends from a point outside
+    # (written without cancellation for far away spheres)
+    s = radius_sq / distance_sq
+    return s / (1 + (1 - s) ** .5)
+
+
+def mis_weight(pdf, other_pdf):
+    # power heuristic (beta = 2) of multiple importance sampling for a sample of the strategy with density pdf
+    pdf_sq, other_sq = pdf * pdf, other_pdf * other_pdf
+    return pdf_sq / (pdf_sq + other_sq)
+
+
+class SphereLights:
+    # emissive spheres sampled directly by light sampling (next event estimation):
+    # a light is chosen uniformly and a direction uniformly within the cone it subtends (solid angle sampling),
+    # pdf returns the density of this mixture for a direction
+    def __init__(self, centers, radii):
+        self.centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        # radius may be negative for hollow spheres
+        self.radii = np.abs(np.asarray(radii, dtype=float))
+
+        # plain lists are much faster than NumPy arrays for single samples
+        self._lists = (self.centers.tolist(), self.radii.tolist())
+
+    def __len__(self):
+        return len(self.radii)
+
+    def sample(self, pos, sampler):
+        # returns random unit direction from pos towards a light (None if pos is inside the chosen light)
+        centers, radii = self._lists
+        i = min(int(sampler.uniform() * len(radii)), len(radii) - 1)
+        cx, cy, cz = centers[i]
+        wx, wy, wz = cx - pos.x, cy - pos.y, cz - pos.z
+        distance_sq = wx * wx + wy * wy + wz * wz
+        if distance_sq <= radii[i] * radii[i]:
+            return None
+        distance = distance_sq ** .5
+        w = Vector(wx / distance, wy / distance, wz / distance)
+
+        cos_theta = 1 - sampler.uniform() * cone_width(radii[i] * radii[i], distance_sq)
+        sin_theta = max(1 - cos_theta * cos_theta, 0) ** .5
+        phi = 2 * math.pi * sampler.uniform()
+        u, v = orthonormal_basis(w)
+        return u * (sin_theta * math.cos(phi)) + v * (sin_theta * math.sin(phi)) + w * cos_theta
+
+    def pdf(self, pos, direction):
+        # returns density (per solid angle) of sample choosing the unit direction from pos
+        centers, radii = self._lists
+        result = 0
+        for (cx, cy, cz), radius in zip(centers, radii):
+            wx, wy, wz = cx - pos.x, cy - pos.y, cz - pos.z
+            distance_sq = wx * wx + wy * wy + wz * wz
+            radius_sq = radius * radius
+            if distance_sq <= radius_sq:
+                continue
+            # direction is within the cone if its angle to the center is small enough
+            cos_center = wx * direction.x + wy * direction.y + wz * direction.z
+            width = cone_width(radius_sq, distance_sq)
+            if cos_center > 0 and cos_center * cos_center >= (1 - width) ** 2 * distance_sq:
+                result += 1 / (2 * math.pi * width)
+        return result / len(radii)
+
+    def sample_batch(self, pos, sampler):
+        # batched version of sample for (N, 3) positions, returns unit directions and mask of valid samples
+        n = len(pos)
+        u = sampler.uniforms(3 * n).reshape(n, 3)
+        i = np.minimum((u[:, 0] * len(self)).astype(int), len(self) - 1)
+        w = self.centers[i] - pos
+        distance_sq = batch_dot(w, w)
+        radius_sq = self.radii[i] ** 2
+        valid = distance_sq > radius_sq
+
+        # directions of invalid samples are meaningless
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = w / np.sqrt(distance_sq)[:, None]
+            cos_theta = 1 - u[:, 1] * cone_width(radius_sq, distance_sq)
+            sin_theta = np.sqrt(np.maximum(1 - cos_theta * cos_theta, 0))
+            phi = 2 * np.pi * u[:, 2]
+            a, b = batch_orthonormal_basis(w)
+        directions = (a * (sin_theta * np.cos(phi))[:, None] + b * (sin_theta * np.sin(phi))[:, None]
+                      + w * cos_theta[:, None])
+        return directions, valid
+
+    def pdf_batch(self, pos, directions):
+        # batched version of pdf for (N, 3) positions and unit directions
+        result = np.zeros(len(pos))
+        for center, radius in zip(self.centers, self.radii):
+            w = center - pos
+            distance_sq = batch_dot(w, w)
+            outside = distance_sq > radius * radius
+            cos_center = batch_dot(w, directions)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                width = cone_width(radius * radius, distance_sq)
+                inside_cone = outside & (cos_center > 0) & (cos_center ** 2 >= (1 - width) ** 2 * distance_sq)
+            result[inside_cone] += 1 / (2 * np.pi * width[inside_cone])
+        return result / len(self)
+
+
+def orthonormal_basis(w):
+    # returns two unit vectors orthogonal to unit vector w and each other
+    a = Vector(0, 1, 0) if abs(w.x) > .9 else Vector(1, 0, 0)
+    u = w.cross(a).normalize()
+    return u, w.cross(u)
+
+
+def batch_orthonormal_basis(w):
+    # batched version of orthonormal_basis for (N, 3) unit vectors
+    a = np.zeros_like(w)
+    x_axis = np.abs(w[:, 0]) > .9
+    a[x_axis, 1] = 1
+    a[~x_axis, 0] = 1
+    u = np.cross(w, a)
+    u /= np.sqrt(batch_dot(u, u))[:, None]
+    return u, np.cross(w, u)
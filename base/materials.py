@@ -1,6 +1,6 @@
 import numpy as np
 
-from base.geometries import Vector, Ray
+from base.geometries import Vector, Ray, batch_dot, batch_normalize, batch_near_zero, batch_reflect, batch_refract
 
 
 class Material:
@@ -9,7 +9,31 @@ class Material:
         return Vector(0, 0, 0)
 
     # super class for materials: offering an abstract scatter method
-    def scatter(self, ray, pos, norm, front_face):
+    # (random numbers are taken from sampler, see base.sampling, or from np.random if sampler is None)
+    def scatter(self, ray, pos, norm, front_face, sampler=None):
+        raise NotImplementedError("Please Implement this method")
+
+    # batched version of scatter for (N, 3) arrays of ray directions, positions and normals
+    # returns scattered directions (rays start at pos), attenuation color and mask of scattered rays
+    def scatter_batch(self, directions, pos, norm, front_face, sampler):
+        raise NotImplementedError("Please Implement this method")
+
+    # density (per solid angle) of scattered directions for combining scattering with light sampling
+    # (see Camera.light_sampling), None for materials scattering into (nearly) single directions
+    def scatter_pdf(self, norm, direction):
+        return None
+
+    # batched version of scatter_pdf for (N, 3) arrays
+    def scatter_pdf_batch(self, norm, directions):
+        return None
+
+    # color of light coming from direction scattered by the material (BRDF times cosine),
+    # only needed for materials with a scatter_pdf
+    def evaluate(self, norm, direction):
+        raise NotImplementedError("Please Implement this method")
+
+    # batched version of evaluate for (N, 3) arrays
+    def evaluate_batch(self, norm, directions):
         raise NotImplementedError("Please Implement this method")
 
 
@@ -18,13 +42,36 @@ class DiffuseMaterial(Material):
         self.albedo = albedo
 
     # implementation of a diffuse material (inherits from Material)
-    def scatter(self, ray, pos, norm, front_face):
+    def scatter(self, ray, pos, norm, front_face, sampler=None):
         # returns a new ray from hit position in random (scattered) direction and color of material
-        scatter_dir = norm + Vector.rand_in_unit_sphere().normalize()
+        if sampler is None:
+            scatter_dir = norm + Vector.rand_in_unit_sphere().normalize()
+        else:
+            scatter_dir = norm + sampler.rand_unit_vector()
         if scatter_dir.near_zero():
             scatter_dir = norm
         return Ray(pos, scatter_dir), self.albedo
 
+    def scatter_batch(self, directions, pos, norm, front_face, sampler):
+        scatter_dir = norm + sampler.unit_vectors(len(norm))
+        degenerate = batch_near_zero(scatter_dir)
+        scatter_dir[degenerate] = norm[degenerate]
+        return scatter_dir, self.albedo.to_array(), np.ones(len(norm), dtype=bool)
+
+    # directions norm + random unit vector are cosine distributed around norm (direction needn't be normalized)
+    def scatter_pdf(self, norm, direction):
+        return max(norm * direction / direction.length(), 0) / np.pi
+
+    def scatter_pdf_batch(self, norm, directions):
+        return np.maximum(batch_dot(norm, batch_normalize(directions)), 0) / np.pi
+
+    # lambertian reflection: albedo / pi times cosine of the (unit) direction
+    def evaluate(self, norm, direction):
+        return self.albedo * (max(norm * direction, 0) / np.pi)
+
+    def evaluate_batch(self, norm, directions):
+        return self.albedo.to_array() * (np.maximum(batch_dot(norm, directions), 0) / np.pi)[:, None]
+
 
 class SpecularMaterial(Material):
     # implementation of a specular material (inherits from Material)
@@ -34,35 +81,57 @@ class SpecularMaterial(Material):
         # < or <= makes no big difference (fuzz-vector length is smaller than 1 at all)
         self.fuzz = fuzz if fuzz <= 1 else 1
 
-    def scatter(self, ray, pos, norm, front_face):
+    def scatter(self, ray, pos, norm, front_face, sampler=None):
         # returns a new ray from hit position in reflection direction (plus random fuzz direction)
         # and color of material
         reflect_dir = ray.direction.normalize().reflect(norm)
-        scattered_dir = reflect_dir + (Vector.rand_in_unit_sphere() * self.fuzz)
+        fuzz_dir = Vector.rand_in_unit_sphere() if sampler is None else sampler.rand_in_unit_sphere()
+        scattered_dir = reflect_dir + (fuzz_dir * self.fuzz)
         if scattered_dir * norm > 0:
             return Ray(pos, scattered_dir), self.albedo
         return None
 
+    def scatter_batch(self, directions, pos, norm, front_face, sampler):
+        reflect_dir = batch_reflect(batch_normalize(directions), norm)
+        scattered_dir = reflect_dir + sampler.in_unit_sphere(len(norm)) * self.fuzz
+        return scattered_dir, self.albedo.to_array(), batch_dot(scattered_dir, norm) > 0
+
 
 class TransmissiveMaterial(Material):
     def __init__(self, ior):
         self.ior = ior
 
-    def scatter(self, ray, pos, norm, front_face):
+    def scatter(self, ray, pos, norm, front_face, sampler=None):
         refraction_ratio = 1/self.ior if front_face else self.ior
 
         unit_direction = ray.direction.normalize()
 
-        cos_theta = np.amin([(unit_direction*-1)*norm, 1])
+        cos_theta = min((unit_direction*-1)*norm, 1)
         sin_theta = np.sqrt(1.0 - cos_theta * cos_theta)
 
-        if refraction_ratio * sin_theta > 1 or self.reflectance(cos_theta, refraction_ratio) > np.random.uniform(0, 1):
+        u = np.random.uniform(0, 1) if sampler is None else sampler.uniform()
+        if refraction_ratio * sin_theta > 1 or self.reflectance(cos_theta, refraction_ratio) > u:
             scattered_dir = unit_direction.reflect(norm)
         else:
-                scattered_dir = unit_direction.refract(norm, cos_theta, refraction_ratio)
+            scattered_dir = unit_direction.refract(norm, cos_theta, refraction_ratio)
 
         return Ray(pos, scattered_dir), Vector(1, 1, 1)
 
+    def scatter_batch(self, directions, pos, norm, front_face, sampler):
+        refraction_ratio = np.where(front_face, 1/self.ior, self.ior)
+
+        unit_direction = batch_normalize(directions)
+
+        cos_theta = np.minimum(-batch_dot(unit_direction, norm), 1)
+        sin_theta = np.sqrt(1.0 - cos_theta * cos_theta)
+
+        reflected = ((refraction_ratio * sin_theta > 1)
+                     | (self.reflectance(cos_theta, refraction_ratio) > sampler.uniforms(len(norm))))
+        scattered_dir = np.where(reflected[:, None], batch_reflect(unit_direction, norm),
+                                 batch_refract(unit_direction, norm, cos_theta, refraction_ratio))
+
+        return scattered_dir, np.ones(3), np.ones(len(norm), dtype=bool)
+
     @staticmethod
     def reflectance(cosine, ref_idx):
         # Schlick's approximation for reflectance
@@ -76,9 +145,12 @@ class EmissiveMaterial(Material):
         self.color = color
         self.intensity = intensity
 
-    def scatter(self, ray, pos, norm, front_face):
+    def scatter(self, ray, pos, norm, front_face, sampler=None):
         return None
 
+    def scatter_batch(self, directions, pos, norm, front_face, sampler):
+        return directions, np.zeros(3), np.zeros(len(norm), dtype=bool)
+
     def emitted(self):
         return self.emit()
 
@@ -0,0 +1,173 @@
+import argparse
+import os
+import re
+
+import numpy as np
+
+from base.geometries import Vector
+from base.objects import TriangleMesh
+
+# scalar property types of .ply files
+PLY_TYPES = {"char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1", "short": "i2", "int16": "i2",
+             "ushort": "u2", "uint16": "u2", "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+             "float": "f4", "float32": "f4", "double": "f8", "float64": "f8"}
+PLY_FORMATS = {"ascii": None, "binary_little_endian": "<", "binary_big_endian": ">"}
+
+
+def load_mesh(path, color=Vector.null(), material=None):
+    # returns TriangleMesh of an .obj or .ply file (polygons are split into triangles)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".obj":
+        vertices, faces = read_obj(path)
+    elif extension == ".ply":
+        vertices, faces = read_ply(path)
+    else:
+        raise ValueError(f"Unknown mesh format {extension}")
+    mesh = TriangleMesh(vertices, faces, color, material)
+    mesh.path = path
+    return mesh
+
+
+def triangulate(polygons, counts):
+    # returns (F, 3) triangles of polygons given by their concatenated vertex indices and numbers of vertices,
+    # polygons are split into fans around their first vertex
+    counts = np.asarray(counts, dtype=np.int64)
+    fans = np.maximum(counts - 2, 0)
+    first = np.repeat(np.cumsum(counts) - counts, fans)
+    # position of each triangle within its fan (1 for the first one)
+    j = np.arange(len(first)) - np.repeat(np.cumsum(fans) - fans, fans) + 1
+    return np.stack([polygons[first], polygons[first + j], polygons[first + j + 1]], axis=1)
+
+
+def read_obj(path):
+    # returns (V, 3) vertices and (F, 3) vertex indices of the faces of a Wavefront .obj file (texture coordinates,
+    # normals, groups and materials are ignored), lines are matched by regular expressions over the whole text
+    # instead of being parsed one by one
+    with open(path) as f:
+        text = f.read()
+    vertices = np.array(re.findall(r"^v[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)", text, re.MULTILINE),
+                        dtype=float).reshape(-1, 3)
+    lines = re.findall(r"^f[ \t]+(.*?)\s*$", text, re.MULTILINE)
+    # only the vertex of each v/vt/vn reference
+    references = re.sub(r"/\S*", "", "\n".join(lines))
+    counts = [len(line.split()) for line in references.split("\n")] if lines else []
+    polygons = np.array(references.split(), dtype=np.int64)
+    if np.any(polygons < 0):
+        # negative indices count back from the last vertex defined before the face
+        defined = np.searchsorted([m.start() for m in re.finditer(r"^v[ \t]", text, re.MULTILINE)],
+                                  [m.start() for m in re.finditer(r"^f[ \t]", text, re.MULTILINE)])
+        polygons = np.where(polygons < 0, np.repeat(defined, counts) + polygons + 1, polygons)
+    # indices start at 1
+    return vertices, triangulate(polygons - 1, counts)
+
+
+def read_ply(path):
+    # returns (V, 3) vertices and (F, 3) vertex indices of the faces of a .ply file in ascii or binary format
+    # (other properties and elements are skipped)
+    with open(path, "rb") as f:
+        data = f.read()
+    end = data.index(b"end_header")
+    header = data[:end].decode("ascii").split("\n")
+    body = data[data.index(b"\n", end) + 1:]
+    if header[0].strip() != "ply":
+        raise ValueError(f"{path} is not a PLY file")
+
+    byte_order = None
+    # elements as [name, count, properties], properties as (name, type) or (name, (count type, index type))
+    elements = []
+    for line in header[1:]:
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == "format":
+            byte_order = PLY_FORMATS[words[1]]
+        elif words[0] == "element":
+            elements.append([words[1], int(words[2]), []])
+        elif words[0] == "property":
+            if words[1] == "list":
+                elements[-1][2].append((words[4], (PLY_TYPES[words[2]], PLY_TYPES[words[3]])))
+            else:
+                elements[-1][2].append((words[2], PLY_TYPES[words[1]]))
+
+    vertices, faces = np.empty((0, 3)), np.empty((0, 3), dtype=np.int64)
+    if byte_order is None:
+        lines = iter(body.decode("ascii").split("\n"))
+        for name, count, properties in elements:
+            rows = [next(lines).split() for _ in range(count)]
+            if name == "vertex":
+                names = [p for p, _ in properties]
+                values = np.array(rows, dtype=float).reshape(-1, len(properties))
+                vertices = values[:, [names.index("x"), names.index("y"), names.index("z")]]
+            elif name == "face":
+                # the vertex indices are the first list of each row
+                counts = [int(row[0]) for row in rows]
+                polygons = np.array([i for row, n in zip(rows, counts) for i in row[1:n + 1]], dtype=np.int64)
+                faces = triangulate(polygons, counts)
+        return vertices, faces
+
+    offset = 0
+    for name, count, properties in elements:
+        if all(not isinstance(t, tuple) for _, t in properties):
+            # fixed size rows are read at once
+            dtype = np.dtype([(p, byte_order + t) for p, t in properties])
+            rows = np.frombuffer(body, dtype, count, offset)
+            offset += dtype.itemsize * count
+            if name == "vertex":
+                vertices = np.stack([rows["x"], rows["y"], rows["z"]], axis=1).astype(float)
+            continue
+        if name != "face" or len(properties) != 1:
+            raise ValueError(f"{path}: lists are only supported as the only property of faces")
+        count_type, index_type = (np.dtype(byte_order + t) for t in properties[0][1])
+        # triangles (the usual case) are read at once, other polygons one by one
+        triangles = np.dtype([("n", count_type), ("i", index_type, 3)])
+        if len(body) >= offset + triangles.itemsize * count:
+            rows = np.frombuffer(body, triangles, count, offset)
+            if np.all(rows["n"] == 3):
+                faces = rows["i"].astype(np.int64)
+                offset += triangles.itemsize * count
+                continue
+        counts, polygons = [], []
+        for _ in range(count):
+            n = int(np.frombuffer(body, count_type, 1, offset)[0])
+            polygons.append(np.frombuffer(body, index_type, n, offset + count_type.itemsize))
+            counts.append(n)
+            offset += count_type.itemsize + index_type.itemsize * n
+        faces = triangulate(np.concatenate(polygons).astype(np.int64), counts)
+    return vertices, faces
+
+
+def write_ply(path, vertices, faces):
+    # writes vertices and triangles as binary .ply file (little endian)
+    vertices = np.asarray(vertices, dtype="<f4").reshape(-1, 3)
+    faces = np.asarray(faces).reshape(-1, 3)
+    rows = np.empty(len(faces), dtype=[("n", "u1"), ("i", "<i4", 3)])
+    rows["n"], rows["i"] = 3, faces
+    header = (f"ply\nformat binary_little_endian 1.0\nelement vertex {len(vertices)}\nproperty float x\n"
+              f"property float y\nproperty float z\nelement face {len(faces)}\n"
+              f"property list uchar int vertex_indices\nend_header\n")
+    with open(path, "wb") as f:
+        f.write(header.encode("ascii"))
+        f.write(vertices.tobytes())
+        f.write(rows.tobytes())
+
+
+def write_obj(path, vertices, faces):
+    # writes vertices and triangles as .obj file
+    with open(path, "w") as f:
+        np.savetxt(f, np.asarray(vertices).reshape(-1, 3), fmt="v %.9g %.9g %.9g")
+        np.savetxt(f, np.asarray(faces).reshape(-1, 3) + 1, fmt="f %d %d %d")
+
+
+def main():
+    # prints size and bounds of mesh files
+    parser = argparse.ArgumentParser(description="Print size and bounds of mesh files")
+    parser.add_argument("paths", nargs="+", help=".obj or .ply files")
+    for path in parser.parse_args().paths:
+        mesh = load_mesh(path)
+        low, high = mesh.bounding_box()
+        print(f"{path}: {len(mesh.vertices)} vertices, {len(mesh)} triangles, bounds {low.to_array()} to "
+              f"{high.to_array()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
-import sys
+import copy
+import os
 
 import numpy as np
 
-from base.geometries import Ray, Vector
-from base.rendering import Image
-
-sys.setrecursionlimit(1500)
+from base import jit, progressive, tiles, wavefront
+from base.bvh import BVH
+from base.geometries import Ray, Vector, batch_dot, batch_normalize
+from base.lights import SphereLights, mis_weight
+from base.materials import EmissiveMaterial
+from base.rendering import TONE_MAPPINGS, ImageStream, resolve
+from base.sampling import SAMPLERS, map_to_unit_disc
+from base.stats import RenderStats
+from base.store import BoxStore, DiskStore, PlaneStore, SphereStore, TriangleStore
 
 
 class Transform:
@@ -28,6 +34,15 @@ class RenderObject(Transform):
         # color and material of object)
         raise NotImplementedError("Please Implement this method")
 
+    def occludes(self, ray, t_min, t_max):
+        # returns if the ray hits the object anywhere within [t_min, t_max] (shadow rays don't need the closest hit,
+        # subclasses may implement it cheaper than hit)
+        return self.hit(ray, t_min, t_max) is not None
+
+    def bounding_box(self):
+        # returns tuple of (minimum, maximum) corner of an axis-aligned box enclosing the object (abstract method)
+        raise NotImplementedError("Please Implement this method")
+
 
 class Sphere(RenderObject):
     def __init__(self, position, radius, color=Vector.null(), material=None):
@@ -67,19 +82,323 @@ class Sphere(RenderObject):
 
             # getting intersection point and normal in this point
             pos = ray.get_position(t)
-            norm = (ray.get_position(t) - self.position) / self.radius
+            norm = (pos - self.position) / self.radius
             # <= because norm should point out if norm and ray are orthogonal
             front_face = norm * ray.direction <= 0
             return t, pos, norm if front_face else norm * -1, front_face, self.color, self.material
 
+    def occludes(self, ray, t_min, t_max):
+        # same roots as hit, without position and normal
+        pointer = ray.origin - self.position
+        a = ray.direction * ray.direction
+        half_b = pointer * ray.direction
+        discriminant = half_b * half_b - a * (pointer * pointer - self.radius * self.radius)
+        if discriminant < 0:
+            return False
+        sqrtd = discriminant ** .5
+        t = (-half_b - sqrtd) / a
+        if t_min <= t <= t_max:
+            return True
+        t = (-half_b + sqrtd) / a
+        return t_min <= t <= t_max
+
+    def bounding_box(self):
+        # radius may be negative for hollow spheres
+        r = abs(self.radius)
+        return self.position - Vector(r, r, r), self.position + Vector(r, r, r)
+
+
+class Plane(RenderObject):
+    # infinite plane through position with normal, planes are unbounded (bounding_box is None): they aren't part of
+    # the bounding volume hierarchy, rays are tested against them before traversing it
+    def __init__(self, position, normal, color=Vector.null(), material=None):
+        super().__init__(position, material)
+        self.normal = normal.normalize()
+        self.color = color
+
+    def intersect(self, ray):
+        # returns ray parameter of the hit of the plane (None for rays parallel to it) and cosine of ray and normal
+        denominator = self.normal * ray.direction
+        if denominator == 0:
+            return None, denominator
+        return ((self.position - ray.origin) * self.normal) / denominator, denominator
+
+    def hit(self, ray, t_min, t_max):
+        t, denominator = self.intersect(ray)
+        if t is None or t < t_min or t > t_max:
+            return None
+        # <= like for spheres: normals point against the ray
+        front_face = denominator <= 0
+        return t, ray.get_position(t), self.normal if front_face else self.normal * -1, front_face, self.color, \
+            self.material
+
+    def occludes(self, ray, t_min, t_max):
+        t, _ = self.intersect(ray)
+        return t is not None and t_min <= t <= t_max
+
+    def bounding_box(self):
+        return None
+
+
+class Disk(Plane):
+    # circular part of a plane around position (center) with radius
+    def __init__(self, position, normal, radius, color=Vector.null(), material=None):
+        super().__init__(position, normal, color, material)
+        self.radius = radius
+
+    def intersect(self, ray):
+        t, denominator = super().intersect(ray)
+        if t is None:
+            return t, denominator
+        pointer = ray.get_position(t) - self.position
+        return (t if pointer * pointer <= self.radius * self.radius else None), denominator
+
+    def bounding_box(self):
+        # extent along an axis is the radius times the sine of the angle between normal and axis
+        n = self.normal
+        extent = Vector(*(self.radius * max(1 - c * c, 0) ** .5 for c in (n.x, n.y, n.z)))
+        return self.position - extent, self.position + extent
+
+
+class AABB(RenderObject):
+    # axis-aligned box between the corners minimum and maximum (position is its center)
+    def __init__(self, minimum, maximum, color=Vector.null(), material=None):
+        super().__init__((minimum + maximum) * .5, material)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.color = color
+
+    def intersect(self, ray, t_min):
+        # returns ray parameter of the hit (entering the box or, for rays starting inside it, leaving it) and
+        # the axis and side (-1 for the minimum, 1 for the maximum) of the face hit, None if missed
+        t_near, t_far = -float("inf"), float("inf")
+        near_face, far_face = None, None
+        for axis, (o, d, low, high) in enumerate(zip((ray.origin.x, ray.origin.y, ray.origin.z),
+                                                     (ray.direction.x, ray.direction.y, ray.direction.z),
+                                                     (self.minimum.x, self.minimum.y, self.minimum.z),
+                                                     (self.maximum.x, self.maximum.y, self.maximum.z))):
+            if d == 0:
+                if o < low or o > high:
+                    return None
+                continue
+            t0, t1 = (low - o) / d, (high - o) / d
+            # faces the ray enters and leaves through
+            enter, leave = ((axis, -1), (axis, 1)) if d > 0 else ((axis, 1), (axis, -1))
+            if d < 0:
+                t0, t1 = t1, t0
+            if t0 > t_near:
+                t_near, near_face = t0, enter
+            if t1 < t_far:
+                t_far, far_face = t1, leave
+        if t_near > t_far:
+            return None
+        return (t_near, near_face) if t_near >= t_min else (t_far, far_face)
+
+    def hit(self, ray, t_min, t_max):
+        result = self.intersect(ray, t_min)
+        if result is None or not t_min <= result[0] <= t_max:
+            return None
+        t, (axis, side) = result
+        norm = Vector(*(float(side) if a == axis else 0. for a in range(3)))
+        front_face = norm * ray.direction <= 0
+        return t, ray.get_position(t), norm if front_face else norm * -1, front_face, self.color, self.material
+
+    def occludes(self, ray, t_min, t_max):
+        result = self.intersect(ray, t_min)
+        return result is not None and t_min <= result[0] <= t_max
+
+    def bounding_box(self):
+        return self.minimum, self.maximum
+
+
+class TriangleMesh(RenderObject):
+    # triangles given by (V, 3) vertices and (F, 3) indices of their corners (counter-clockwise seen from the front,
+    # see base.meshfile for loading .obj and .ply files), hits are searched in a bounding volume hierarchy over the
+    # triangles of the mesh, built on first use (the scene's hierarchy only holds the bounding box of the mesh)
+    def __init__(self, vertices, faces, color=Vector.null(), material=None):
+        self.vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+        self.faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        super().__init__(Vector(*self.vertices.mean(axis=0)) if len(self.vertices) else Vector.null(), material)
+        self.color = color
+        # file the mesh was loaded from (scene files refer to it)
+        self.path = None
+        self.triangles = None
+        self.bvh = None
+
+    def __len__(self):
+        return len(self.faces)
+
+    def build(self):
+        # compiles triangles and hierarchy if not done yet
+        if self.bvh is None:
+            self.triangles = TriangleStore(self.vertices, self.faces)
+            self.bvh = BVH(*self.triangles.bounding_boxes())
+        return self.bvh
+
+    def hit(self, ray, t_min, t_max):
+        result = self.build().closest_hit(ray, t_min, t_max, self.triangles.hit)
+        if result is None:
+            return None
+        t, i = result
+        norm = Vector(*self.triangles.normals[i])
+        # <= like for spheres: normals point against the ray
+        front_face = norm * ray.direction <= 0
+        return t, ray.get_position(t), norm if front_face else norm * -1, front_face, self.color, self.material
+
+    def occludes(self, ray, t_min, t_max):
+        return self.build().any_hit(ray, t_min, t_max, self.triangles.occludes)
+
+    def bounding_box(self):
+        # box of the root of the hierarchy (instances ask for it many times)
+        bvh = self.build()
+        if bvh.size == 0:
+            return Vector.null(), Vector.null()
+        return Vector(*bvh.node_min[0].tolist()), Vector(*bvh.node_max[0].tolist())
+
+    def normals(self, triangles):
+        # returns (N, 3) array of the normals of the given triangles (indices like hit_batch stores them)
+        return self.triangles.normals[triangles]
+
+    def hit_batch(self, origins, directions, t_min, t_best, triangles, stats=None):
+        # stores hits of rays closer than t_best in t_best and the hit triangles in triangles (in place),
+        # returns boolean array of the rays with a closer hit (triangle tests are counted in stats if given)
+        def hit_leaf(prims, rays, t_rays_best, index):
+            t_rays, index_rays = t_rays_best[rays], index[rays]
+            self.triangles.hit_batch(prims, origins[rays], directions[rays], t_min, t_rays, index_rays)
+            t_rays_best[rays], index[rays] = t_rays, index_rays
+            if stats is not None:
+                stats.intersection_tests += len(prims) * len(rays)
+
+        t, index = self.build().closest_hit_batch(origins, directions, t_min, t_best, hit_leaf)
+        closer = index >= 0
+        t_best[closer], triangles[closer] = t[closer], index[closer]
+        return closer
+
+    def occluded_batch(self, origins, directions, t_min, t_max, occluded):
+        # marks rays hitting the mesh within [t_min, t_max] (array per ray) in occluded (in place)
+        def occluded_leaf(prims, rays, t_max_rays, occluded_all):
+            occluded_rays = occluded_all[rays]
+            self.triangles.occluded_batch(prims, origins[rays], directions[rays], t_min, t_max_rays, occluded_rays)
+            occluded_all[rays] = occluded_rays
+
+        occluded |= self.build().any_hit_batch(origins, directions, t_min, t_max, occluded_leaf)
+
+
+class Instance(RenderObject):
+    # geometry (a bounded RenderObject, e.g. a TriangleMesh) placed by a 4x4 matrix of an affine transform (see
+    # translation, rotation and scaling in base.geometries), many instances share one geometry and its hierarchy:
+    # rays are transformed into the space of the geometry instead of copying it, the scene's hierarchy only holds
+    # the bounding boxes of the instances (two levels for meshes), color and material default to the geometry's
+    def __init__(self, geometry, matrix=np.identity(4), color=None, material=None):
+        self.matrix = np.array(matrix, dtype=float).reshape(4, 4)
+        self.inverse = np.linalg.inv(self.matrix)
+        super().__init__(Vector(*self.matrix[:3, 3].tolist()), geometry.material if material is None else material)
+        self.geometry = geometry
+        self.color = getattr(geometry, "color", Vector.null()) if color is None else color
+
+    def batched(self):
+        # returns if batched hits support the geometry (triangle meshes and instances of them)
+        return type(self.geometry) is TriangleMesh or type(self.geometry) is Instance and self.geometry.batched()
+
+    def flattened(self):
+        # returns the geometry of nested instances and the matrix transforming rays of the scene into its space
+        geometry, inverse = self.geometry, self.inverse
+        while type(geometry) is Instance:
+            geometry, inverse = geometry.geometry, geometry.inverse @ inverse
+        return geometry, inverse
+
+    def build(self):
+        # compiles the shared geometry if not done yet
+        if self.batched():
+            self.geometry.build()
+
+    def local_ray(self, ray):
+        # returns ray in the space of the geometry (ray parameters stay the same, the direction isn't normalized)
+        linear, offset = self.inverse[:3, :3], self.inverse[:3, 3]
+        origin = linear @ ray.origin.to_array() + offset
+        return Ray(Vector(*origin.tolist()), Vector(*(linear @ ray.direction.to_array()).tolist()))
+
+    def hit(self, ray, t_min, t_max):
+        result = self.geometry.hit(self.local_ray(ray), t_min, t_max)
+        if result is None:
+            return None
+        t, _, norm, front_face = result[:4]
+        # normals are transformed by the transposed inverse (front_face stays the same)
+        norm = Vector(*(norm.to_array() @ self.inverse[:3, :3]).tolist()).normalize()
+        return t, ray.get_position(t), norm, front_face, self.color, self.material
+
+    def occludes(self, ray, t_min, t_max):
+        return self.geometry.occludes(self.local_ray(ray), t_min, t_max)
+
+    def bounding_box(self):
+        # box around the transformed corners of the box of the geometry
+        low, high = self.geometry.bounding_box()
+        corners = np.array([[x, y, z] for x in (low.x, high.x) for y in (low.y, high.y) for z in (low.z, high.z)])
+        corners = corners @ self.matrix[:3, :3].T + self.matrix[:3, 3]
+        return Vector(*corners.min(axis=0).tolist()), Vector(*corners.max(axis=0).tolist())
+
+    def local_rays(self, origins, directions):
+        # batched version of local_ray for (N, 3) arrays
+        linear = self.inverse[:3, :3].T
+        return origins @ linear + self.inverse[:3, 3], directions @ linear
+
+    def normals(self, hits):
+        # returns (N, 3) array of the normals of the given hits of the geometry (see hit_batch)
+        return batch_normalize(self.geometry.normals(hits) @ self.inverse[:3, :3])
+
+    def hit_batch(self, origins, directions, t_min, t_best, hits, stats=None):
+        # like TriangleMesh.hit_batch, hits of the geometry are stored in hits (triangles for meshes)
+        return self.geometry.hit_batch(*self.local_rays(origins, directions), t_min, t_best, hits, stats)
+
+    def occluded_batch(self, origins, directions, t_min, t_max, occluded):
+        self.geometry.occluded_batch(*self.local_rays(origins, directions), t_min, t_max, occluded)
+
 
 class Camera(Transform):
     def __init__(self, aspect_ratio, image_width, focal_length, fov=130,
                  lookfrom=Vector(0, 0, 0), lookat=Vector(0, 0, -1), vup=Vector(0, 1, 0),
                  samples_per_pixel=1, t_min=.001, t_max=float("inf"), max_bounce_depth=50,
-                 background_gradient=(Vector(1, 1, 1), Vector(.5, .7, 1)), aperture=0.0):
+                 background_gradient=(Vector(1, 1, 1), Vector(.5, .7, 1)), aperture=0.0, render_mode="scalar",
+                 sampler="random", adaptive=False, noise_threshold=.01, min_samples=8, russian_roulette_depth=5,
+                 light_sampling=False, exposure=0., tone_mapping="clamp", denoise=False):
         super().__init__(lookfrom)
 
+        # "scalar" traces ray by ray, "wavefront" traces batches of rays as NumPy arrays,
+        # "jit" traces ray by ray in kernels compiled by Numba (wavefront if Numba isn't installed, see base.jit)
+        if render_mode not in ("scalar", "wavefront", "jit"):
+            raise ValueError(f"Unknown render mode {render_mode}")
+        self.render_mode = render_mode
+
+        # distribution of camera samples within pixels: "random", "stratified", "halton" or "sobol"
+        if sampler not in SAMPLERS:
+            raise ValueError(f"Unknown sampler {sampler}")
+        self.sampler = sampler
+
+        # adaptive sampling stops sampling a pixel after min_samples (and every min_samples more samples)
+        # once the estimated noise of its displayed brightness (0 to 1) is below noise_threshold,
+        # samples_per_pixel is the maximal number of samples then
+        self.adaptive = adaptive
+        self.noise_threshold = noise_threshold
+        self.min_samples = max(1, min(min_samples, samples_per_pixel))
+
+        # paths are terminated randomly after this many bounces with probability depending on their throughput
+        # (surviving paths are weighted up, so the image stays the same on average), None turns it off
+        self.russian_roulette_depth = russian_roulette_depth
+        # light of emissive spheres is also sampled directly at diffuse hits (next event estimation),
+        # combined with light found by scattering through multiple importance sampling
+        # (pays off for bright or small lights, not if most light comes from the background)
+        self.light_sampling = light_sampling
+
+        # linear colors are scaled by 2 ** exposure and tone mapped ("clamp", "reinhard" or "aces", see
+        # base.rendering) when converting them to 8 bit images, HDR images (.pfm, .hdr) keep the linear colors
+        if tone_mapping not in TONE_MAPPINGS:
+            raise ValueError(f"Unknown tone mapping {tone_mapping}")
+        self.exposure = exposure
+        self.tone_mapping = tone_mapping
+        # finished renders are filtered by an à-trous wavelet filter guided by albedo, normals and depth of the
+        # first hits (see base.denoise), so fewer samples per pixel give a clean image
+        self.denoise = denoise
+
         self.background_gradient = background_gradient
 
         self.fov = fov
@@ -88,6 +407,13 @@ class Camera(Transform):
         self.t_min = t_min
         self.t_max = t_max
         self.max_bounce_depth = max_bounce_depth
+        # camera rays are jittered within their pixels (antialiasing) if more than one sample per pixel is taken,
+        # passes of a render with more samples per pixel force it (see tiles.render_sweep)
+        self.force_antialiasing = False
+        # bounce depths (ascending, the last one is max_bounce_depth) whose gathered light is kept separately by
+        # render_tile_colors, which returns a layer of colors for each of them then: paths are traced once and
+        # give the images of all depths (see render_depths), None keeps only the light of all bounces
+        self.depth_sweep = None
 
         self.aspect_ratio = aspect_ratio
 
@@ -113,112 +439,686 @@ class Camera(Transform):
         self.lower_left_corner = (self.position + self.direction * self.focal_length
                                   - self.vertical/2 - self.horizontal/2)
 
-    def get_ray(self, x, y, antialiasing):
+    def view_key(self):
+        # returns hashable parameters of the samples the camera takes: cameras with equal keys only differ in
+        # their number of samples per pixel, their bounce depth and the conversion of their images (exposure, tone
+        # mapping, denoising), so the samples and paths of one are the first samples and bounces of those of
+        # another (see tiles.render_sweep)
+        def hashable(value):
+            if type(value) is Vector:
+                return tuple(value.to_array().tolist())
+            if isinstance(value, (tuple, list)):
+                return tuple(hashable(v) for v in value)
+            return value
+
+        return tuple((name, hashable(value)) for name, value in sorted(vars(self).items())
+                     if name not in ("samples_per_pixel", "min_samples", "max_bounce_depth", "exposure", "tone_mapping",
+                                     "denoise"))
+
+    def set_image_width(self, image_width):
+        # changes the resolution keeping aspect ratio and view (e.g. for quick previews and benchmarks)
+        self.image_width = image_width
+        self.image_height = int(self.image_width // self.aspect_ratio)
+
+    def get_ray(self, x, y, antialiasing, sampler=None):
+        # random numbers are taken from camera samples of sampler (see base.sampling) or from np.random
+        camera_sample = sampler.camera_sample() if sampler is not None else None
         # antialiasing offset
         rand_offset_x, rand_offset_y = 0, 0
-        # depth of field offset (lens)
-        lens_offset = Vector.rand_in_unit_disc() * self.lens_radius
-        position_offset = self.u * lens_offset.x + self.v * lens_offset.y
+        # depth of field offset (lens), pinhole cameras don't need it
+        if self.lens_radius == 0:
+            position_offset = Vector.null()
+        elif camera_sample is None:
+            lens_offset = Vector.rand_in_unit_disc() * self.lens_radius
+            position_offset = self.u * lens_offset.x + self.v * lens_offset.y
+        else:
+            lens_offset = sampler.disc_point(camera_sample[2], camera_sample[3]) * self.lens_radius
+            position_offset = self.u * lens_offset.x + self.v * lens_offset.y
 
         if antialiasing:
-            rand_offset_x = np.random.uniform(0, 1)
-            rand_offset_y = np.random.uniform(0, 1)
+            if camera_sample is None:
+                rand_offset_x = np.random.uniform(0, 1)
+                rand_offset_y = np.random.uniform(0, 1)
+            else:
+                rand_offset_x, rand_offset_y = camera_sample[0], camera_sample[1]
 
         return Ray(self.position + position_offset, self.lower_left_corner
                    + self.horizontal * (x + rand_offset_x) / (self.image_width - 1)
                    + self.vertical * (y + rand_offset_y) / (self.image_height - 1) - self.position - position_offset)
 
-    def ray_color(self, ray, scene, depth):
-        # no more light gathered if max bounce depth is exceeded
-        if depth <= 0:
-            return Vector.null()
+    def get_rays(self, xs, ys, antialiasing, sampler, camera_samples=None):
+        # batched version of get_ray for arrays of pixel coordinates (samples_per_pixel consecutive entries
+        # per pixel or one entry per given (N, CAMERA_DIMENSIONS) camera sample), returns (N, 3) origins and directions
+        n = len(xs)
+        u, v = self.u.to_array(), self.v.to_array()
+        if camera_samples is None:
+            camera_samples = sampler.pixel_samples(n // self.samples_per_pixel, self.samples_per_pixel).reshape(n, -1)
+
+        position_offset = np.zeros((n, 3))
+        if self.lens_radius > 0:
+            lens_offset = map_to_unit_disc(camera_samples[:, 2:4]) * self.lens_radius
+            position_offset = np.outer(lens_offset[:, 0], u) + np.outer(lens_offset[:, 1], v)
+
+        rand_offset_x, rand_offset_y = 0, 0
+        if antialiasing:
+            rand_offset_x = camera_samples[:, 0]
+            rand_offset_y = camera_samples[:, 1]
+
+        origins = self.position.to_array() + position_offset
+        directions = (self.lower_left_corner.to_array()
+                      + np.outer((xs + rand_offset_x) / (self.image_width - 1), self.horizontal.to_array())
+                      + np.outer((ys + rand_offset_y) / (self.image_height - 1), self.vertical.to_array())
+                      - origins)
+        return origins, directions
+
+    def primary_rays(self, tile):
+        # returns ray generation for the pixels of tile (see PrimaryRays)
+        return PrimaryRays(self, tile)
+
+    def ray_color(self, ray, scene, depth, sampler=None, stats=None, depths=None):
+        # follows the path of ray for at most depth bounces and returns the gathered light,
+        # throughput is the attenuation of all bounces so far (rays, hits and timings are added to stats if given),
+        # with ascending depths the list of the light gathered up to each of these bounce depths is returned
+        result_color = Vector.null()
+        layers = []
+        throughput = Vector(1, 1, 1)
+        # lights are sampled only in scenes with emissive spheres (and with random numbers of a sampler)
+        scene.build()
+        light_sampling = self.light_sampling and sampler is not None and len(scene.lights) > 0
+        # scatter density of the previous hit if its lights were sampled too (light of hit objects is weighted then)
+        scatter_pdf = None
+        for bounce in range(depth):
+            if stats is None:
+                result = scene.hit(ray, self.t_min, self.t_max)
+            else:
+                stats.add_rays(bounce)
+                result = stats.timed("hit", scene.hit, ray, self.t_min, self.t_max, stats)
+            if result is None:
+                unit_dir = ray.direction.normalize()
+                t = .5 * (unit_dir.y + 1)
+                background = self.background_gradient[0] * (1 - t) + self.background_gradient[1] * t
+                result_color += background.mul(throughput)
+                break
 
-        result = scene.hit(ray, self.t_min, self.t_max)
-        if result is not None:
             _, pos, norm, front_face, color, material = result
+            if stats is not None:
+                stats.add_hits(material)
 
             # to show normal vector as color
             # return Vector(norm.x + 1, norm.y + 1, norm.z + 1) * .5
 
-            if material is not None:
-                scatter_result = material.scatter(ray, pos, norm, front_face)
-                emitted_result = material.emitted()
+            # objects without material show their plain color
+            emitted = color if material is None else material.emitted()
+            if scatter_pdf and (emitted.x or emitted.y or emitted.z):
+                emitted = emitted * mis_weight(scatter_pdf, scene.lights.pdf(ray.origin, ray.direction.normalize()))
+            result_color += emitted.mul(throughput)
+            if material is None:
+                break
 
-                if scatter_result is not None:
-                    scattered_ray, attenuation = scatter_result
-                    r_c = self.ray_color(scattered_ray, scene, depth - 1)
-                    return emitted_result + Vector(r_c.x * attenuation.x, r_c.y * attenuation.y, r_c.z * attenuation.z)
-                else:
-                    return emitted_result
+            if stats is None:
+                scatter_result = material.scatter(ray, pos, norm, front_face, sampler)
             else:
-                # to show plain object color
-                return color
+                scatter_result = stats.timed("scatter", material.scatter, ray, pos, norm, front_face, sampler)
+            if scatter_result is None:
+                break
+            scattered_ray, attenuation = scatter_result
+            # lights aren't sampled at the last bounce, the light found there belongs to paths one bounce longer
+            # (whose scattered half of the estimate isn't traced)
+            sample = light_sampling and bounce + 1 < depth
+            scatter_pdf = material.scatter_pdf(norm, scattered_ray.direction) if sample else None
+            light = None
+            if scatter_pdf is not None:
+                if stats is None:
+                    light = self.sample_light(scene, pos, norm, material, sampler)
+                else:
+                    light = stats.timed("light", self.sample_light, scene, pos, norm, material, sampler, stats)
+            # the gathered light of this depth doesn't include the sampled light for the same reason
+            if depths is not None and bounce + 1 in depths:
+                layers.append(Vector(result_color.x, result_color.y, result_color.z))
+            if light is not None:
+                result_color += light.mul(throughput)
+            ray = scattered_ray
+            throughput = throughput.mul(attenuation)
+
+            # russian roulette: continue with probability of the largest throughput component
+            if self.russian_roulette_depth is not None and bounce + 1 >= self.russian_roulette_depth:
+                survival = min(max(throughput.x, throughput.y, throughput.z), 1)
+                if (sampler.uniform() if sampler is not None else np.random.random()) >= survival:
+                    break
+                throughput *= 1 / survival
+        if depths is None:
+            return result_color
+        # paths ending before a depth gathered all their light
+        return layers + [result_color] * (len(depths) - len(layers))
+
+    def sample_light(self, scene, pos, norm, material, sampler, stats=None):
+        # next event estimation: returns light arriving at pos from a direction sampled towards the lights of scene
+        # and scattered by material, weighted against finding it by scattering (multiple importance sampling)
+        direction = scene.lights.sample(pos, sampler)
+        if direction is None or direction * norm <= 0:
+            return Vector.null()
+        # shadow ray: light of the first object hit in direction arrives (nothing if it isn't emissive)
+        if stats is not None:
+            stats.shadow_rays += 1
+        result = scene.hit(Ray(pos, direction), self.t_min, self.t_max, stats)
+        light_pdf = scene.lights.pdf(pos, direction)
+        if result is None or light_pdf == 0:
+            return Vector.null()
+        color, hit_material = result[4], result[5]
+        emitted = color if hit_material is None else hit_material.emitted()
+        weight = mis_weight(light_pdf, material.scatter_pdf(norm, direction)) / light_pdf
+        return material.evaluate(norm, direction).mul(emitted) * weight
+
+    def render(self, scene, workers=1, seed=None, progress=True, stream=None, stats=None):
+        # renders image tile by tile with given number of worker processes (None for one per CPU),
+        # seed makes the image reproducible independent of the number of workers,
+        # finished tiles are written to stream (ImageStream) if given, ray statistics to stats (RenderStats) if given,
+        # the linear colors are kept in the framebuffer of the image
+        return tiles.render(self, scene, workers, seed, progress, stream, stats=stats)
+
+    def render_depths(self, scene, depths, workers=1, seed=None, progress=True, stats=None):
+        # renders images of the camera for each of the bounce depths from the same paths: paths are traced once to
+        # the largest depth and the light gathered up to each depth is kept separately (see tiles.render_sweep),
+        # returns the images in order of depths (statistics of the paths are added to stats if given)
+        cameras = []
+        for depth in depths:
+            cam = copy.copy(self)
+            cam.max_bounce_depth = depth
+            cameras.append(cam)
+        images = dict(tiles.render_sweep(cameras, scene, workers, seed, progress,
+                                         stats=[stats] + [None] * (len(cameras) - 1)))
+        return [images[i] for i in range(len(cameras))]
+
+    def create_sampler(self, seed):
+        # returns sampler of the kind selected for this camera
+        return SAMPLERS[self.sampler](seed)
+
+    def render_tile(self, scene, tile, seed, stats=None):
+        # renders pixels of a tile with its own random seed and returns them as int array
+        # together with the number of samples of each pixel
+        colors, samples = self.render_tile_colors(scene, tile, seed, stats)
+        if stats is None:
+            return self.write_colors(colors, samples), samples
+        return stats.timed("output", self.write_colors, colors, samples), samples
 
-        unit_dir = ray.direction.normalize()
-        t = .5 * (unit_dir.y + 1)
-        return self.background_gradient[0] * (1 - t) + self.background_gradient[1] * t
+    def render_tile_colors(self, scene, tile, seed, stats=None):
+        # renders a tile like render_tile, but returns the summed up colors of all samples of each pixel
+        # as float array (for accumulating samples of several renders), with depth_sweep as (height, width, layers, 3)
+        # array of the colors gathered up to each depth
+        if self.render_mode == "jit" and jit.supported(self, scene):
+            return jit.render_tile(self, scene, tile, self.create_sampler(seed), stats)
+        if self.render_mode in ("wavefront", "jit"):
+            return wavefront.render_tile(self, scene, tile, self.create_sampler(seed), stats=stats)
 
-    def render(self, scene):
-        i = Image(self.image_width, self.image_height)
+        sampler = self.create_sampler(seed)
+        rays = self.primary_rays(tile)
+        layers = 1 if self.depth_sweep is None else len(self.depth_sweep)
+        colors = np.empty((tile.height, tile.width, layers, 3))
+        samples = np.empty((tile.height, tile.width), dtype=int)
         # looping through pixels for rendering
-        for y in range(self.image_height)[::-1]:
-            for x in range(self.image_width):
-                pixel_color = Vector.null()
+        for y in range(tile.y_start, tile.y_end)[::-1]:
+            for x in range(tile.x_start, tile.x_end):
+                pixel_colors = [Vector.null() for _ in range(layers)]
+                # sums of luminance and squared luminance of samples for adaptive sampling
+                luminance_sum, luminance_sq_sum = 0, 0
+                sampler.start_pixel(self.samples_per_pixel)
                 for s in range(self.samples_per_pixel):
-                    ray = self.get_ray(x, y, self.samples_per_pixel > 1)
-                    pixel_color = pixel_color + self.ray_color(ray, scene, self.max_bounce_depth)
-                i.image_list[y, x] = self.write_color(pixel_color).to_int_array()
-            print(f"\r{(1-y/self.image_height)*100:.2f}%")
-        return i
+                    if stats is None:
+                        ray = rays.ray(x, y, sampler)
+                    else:
+                        ray = stats.timed("get_ray", rays.ray, x, y, sampler)
+                    sample_colors = self.ray_color(ray, scene, self.max_bounce_depth, sampler, stats, self.depth_sweep)
+                    if self.depth_sweep is None:
+                        sample_colors = [sample_colors]
+                    for pixel_color, color in zip(pixel_colors, sample_colors):
+                        pixel_color += color
+                    if self.adaptive:
+                        luminance = self.luminance(sample_colors[-1])
+                        luminance_sum += luminance
+                        luminance_sq_sum += luminance * luminance
+                        if (s + 1) % self.min_samples == 0 and self.converged(luminance_sum, luminance_sq_sum, s + 1):
+                            break
+                samples[y - tile.y_start, x - tile.x_start] = s + 1
+                colors[y - tile.y_start, x - tile.x_start] = [(c.x, c.y, c.z) for c in pixel_colors]
+        return colors if self.depth_sweep is not None else colors[:, :, 0], samples
 
-    def write_color(self, pixel_color):
+    @staticmethod
+    def luminance(color):
+        # relative luminance of Vectors or (..., 3) arrays of colors
+        if type(color) is Vector:
+            return .2126 * color.x + .7152 * color.y + .0722 * color.z
+        return color @ np.array([.2126, .7152, .0722])
+
+    def converged(self, luminance_sum, luminance_sq_sum, samples):
+        # returns if standard error of the mean luminance of a pixel (or array of pixels) is small enough
+        # to stop sampling: the error is propagated through gamma correction (displayed value sqrt(mean))
+        mean = luminance_sum / samples
+        variance = np.maximum(luminance_sq_sum - luminance_sum * mean, 0) / np.maximum(samples - 1, 1)
+        error = np.sqrt(variance / samples) / (2 * np.sqrt(np.maximum(mean, 1e-4)))
+        return (samples > 1) & (error < self.noise_threshold)
+
+    def write_color(self, pixel_color, samples=None):
         # doesn't have to be clamped because no single summed up color value is bigger then 1
-        return Vector.gamma2_corrected(pixel_color / self.samples_per_pixel) * 255
+        samples = self.samples_per_pixel if samples is None else samples
+        return Vector.gamma2_corrected(pixel_color / samples) * 255
+
+    def write_colors(self, pixel_colors, samples=None):
+        # batched version of write_color and to_int_array for an array of summed up pixel colors
+        # (samples: array of number of samples per pixel) with exposure and tone mapping of the camera
+        samples = self.samples_per_pixel if samples is None else samples
+        return resolve(pixel_colors, samples, self.exposure, self.tone_mapping)
+
+
+class PrimaryRays:
+    # ray generation of a camera for the pixels of a tile: direction offsets of the pixel columns and rows are
+    # computed once instead of for every sample (like Camera.get_ray and Camera.get_rays do), lens offsets only for
+    # cameras with aperture, ray gives single rays and batch arrays of rays
+    def __init__(self, camera, tile):
+        self.x_start, self.y_start = tile.x_start, tile.y_start
+        self.antialiasing = camera.samples_per_pixel > 1 or camera.force_antialiasing
+        self.origin = camera.position.to_array()
+        # direction offsets of one pixel to the right and one pixel up
+        self.step_x = camera.horizontal.to_array() / (camera.image_width - 1)
+        self.step_y = camera.vertical.to_array() / (camera.image_height - 1)
+        # directions to the lower left corner of the pixels are the sum of column and row offsets
+        # (pixels holds the sums for all pixels of the tile, indexed by row and column)
+        self.columns = np.arange(tile.x_start, tile.x_end)[:, None] * self.step_x
+        self.rows = (camera.lower_left_corner.to_array() - self.origin
+                     + np.arange(tile.y_start, tile.y_end)[:, None] * self.step_y)
+        self.pixels = self.rows[:, None] + self.columns[None]
+        # lens axes scaled by the lens radius (None for pinhole cameras)
+        self.lens = None
+        if camera.lens_radius > 0:
+            self.lens = (camera.u.to_array() * camera.lens_radius, camera.v.to_array() * camera.lens_radius)
+
+        # plain lists are much faster than NumPy arrays for single rays
+        self._columns, self._rows = self.columns.tolist(), self.rows.tolist()
+        self._origin, self._step = self.origin.tolist(), (self.step_x.tolist(), self.step_y.tolist())
+        self._lens = None if self.lens is None else (self.lens[0].tolist(), self.lens[1].tolist())
+
+    def ray(self, x, y, sampler):
+        # returns ray through pixel (x, y) of the tile for the next camera sample of sampler (like Camera.get_ray)
+        camera_sample = sampler.camera_sample()
+        cx, cy, cz = self._columns[x - self.x_start]
+        rx, ry, rz = self._rows[y - self.y_start]
+        dx, dy, dz = cx + rx, cy + ry, cz + rz
+        if self.antialiasing:
+            (ax, ay, az), (bx, by, bz) = self._step
+            s, t = camera_sample[0], camera_sample[1]
+            dx, dy, dz = dx + ax * s + bx * t, dy + ay * s + by * t, dz + az * s + bz * t
+        ox, oy, oz = self._origin
+        if self._lens is not None:
+            (ux, uy, uz), (vx, vy, vz) = self._lens
+            offset = sampler.disc_point(camera_sample[2], camera_sample[3])
+            px, py, pz = ux * offset.x + vx * offset.y, uy * offset.x + vy * offset.y, uz * offset.x + vz * offset.y
+            ox, oy, oz, dx, dy, dz = ox + px, oy + py, oz + pz, dx - px, dy - py, dz - pz
+        return Ray(Vector(ox, oy, oz), Vector(dx, dy, dz))
+
+    def batch(self, xs, ys, camera_samples):
+        # returns (N, 3) origins and directions of rays through pixels (xs, ys) of the tile for (N, CAMERA_DIMENSIONS)
+        # camera samples (like Camera.get_rays)
+        directions = self.pixels[ys - self.y_start, xs - self.x_start]
+        if self.antialiasing:
+            directions += camera_samples[:, :2] @ np.stack([self.step_x, self.step_y])
+        origins = np.repeat(self.origin[None], len(directions), axis=0)
+        if self.lens is not None:
+            lens_offset = map_to_unit_disc(camera_samples[:, 2:4])
+            offset = np.outer(lens_offset[:, 0], self.lens[0]) + np.outer(lens_offset[:, 1], self.lens[1])
+            origins += offset
+            directions -= offset
+        return origins, directions
 
 
 class Scene:
     # a scene represents an environment by carrying cameras and render_objects
-    def __init__(self, name, path=""):
+    def __init__(self, name, path="", image_format="ppm"):
         self.name = name
         self.path = path
+        # file format of rendered images ("ppm", "png" or HDR "pfm" and "hdr" with linear colors)
+        self.image_format = image_format
 
         # lists of objects for rendering
         self.render_objects = []
         self.cameras = []
+        # spheres added in bulk (see add_spheres) as pairs of SphereStore and the materials it refers to
+        self.sphere_arrays = []
 
-    def render(self):
-        # rendering of scene is calling render method of all cameras
-        for i in range(len(self.cameras)):
-            # rendering image
-            img = self.cameras[i].render(self)
-            # saving image
-            if i > 0:
-                img.save_image(f"{self.path}{self.name}-{i + 1}.ppm")
+        # runtime representation of render_objects, compiled lazily before rendering or hitting:
+        # materials are stored once in a list, spheres in a SphereStore referring to materials by index,
+        # other objects are kept as they are (for hit) and disks, boxes and planes also in stores (for hit_batch),
+        # a bounding volume hierarchy covers all objects but planes (they are unbounded)
+        # primitives are indexed in the order spheres, disks, boxes, triangle meshes, instances of them, other
+        # bounded objects, planes (objects holds all but the spheres), material_ids and colors are indexed the same way
+        self.materials = []
+        self.spheres = None
+        self.objects = []
+        self.bvh = None
+        # pairs of first primitive index and DiskStore or BoxStore, triangle meshes and instances of them (each
+        # with a hierarchy of its own) following the index of the first mesh, objects batched hits don't support
+        self.shapes = []
+        self.meshes = []
+        self.instances = []
+        self.mesh_offset = 0
+        self.unbatched = []
+        self.planes = None
+        self.plane_offset = 0
+        self.material_ids = None
+        self.colors = None
+        # emissive spheres for light sampling
+        self.lights = None
+        # ray statistics (RenderStats) of each camera of the last render with stats=True
+        self.stats = []
+
+    def image_path(self, i, extension=None):
+        # returns path of the image of camera i
+        extension = self.image_format if extension is None else extension
+        if i > 0:
+            return f"{self.path}{self.name}-{i + 1}.{extension}"
+        return f"{self.path}{self.name}.{extension}"
+
+    def render(self, workers=1, seed=None, stream=False, progressive_passes=None, stats=False, auxiliary=False,
+               sweep=True):
+        # rendering of scene is rendering all cameras, cameras differing only in samples per pixel and bounce depth
+        # share their samples and paths (see sweep_groups, sweep=False renders every camera on its own)
+        # (workers: number of processes rendering tiles in parallel, None for one per CPU)
+        # with stream=True finished tiles are written to a .ppm file while rendering
+        # (the file is replaced by the final image, it's only kept if rendering crashes)
+        # with progressive_passes=n images are rendered in passes of n samples per pixel and checkpoints are
+        # saved to .npz files next to the images: rendering again resumes or extends them (see base.progressive)
+        # with stats=True ray counters and stage timings are collected (kept in self.stats) and saved as .stats.json
+        # with auxiliary=True albedo, normals and depth of the first hits are saved as .albedo.pfm, .normal.pfm and
+        # .depth.pfm (the buffers the denoiser uses, see base.denoise)
+        seeds = np.random.SeedSequence(seed).spawn(len(self.cameras))
+        cam_stats = [RenderStats() if stats else None for _ in self.cameras]
+        streams = [None] * len(self.cameras)
+        groups = [[i] for i in range(len(self.cameras))]
+        if sweep and progressive_passes is None:
+            groups = self.sweep_groups()
+        for group in groups:
+            if stream and progressive_passes is None:
+                for i in group:
+                    streams[i] = ImageStream(self.image_path(i, "partial.ppm"), self.cameras[i].image_width,
+                                             self.cameras[i].image_height)
+            # rendering images
+            if progressive_passes is not None:
+                i = group[0]
+                images = [(i, progressive.render(self.cameras[i], self, self.image_path(i, "npz"), progressive_passes,
+                                                 workers, seeds[i], stats=cam_stats[i]))]
             else:
-                img.save_image(f"{self.path}{self.name}.ppm")
-            print(f"Rendered {i+1} camera!")
+                images = ((group[j], img) for j, img in tiles.render_sweep(
+                    [self.cameras[i] for i in group], self, workers, seeds[group[0]],
+                    streams=[streams[i] for i in group], stats=[cam_stats[i] for i in group]))
+            # saving images (as soon as each one is finished)
+            for i, img in images:
+                if cam_stats[i] is None:
+                    img.save_image(self.image_path(i))
+                else:
+                    cam_stats[i].timed("output", img.save_image, self.image_path(i))
+                    cam_stats[i].save(self.image_path(i, "stats.json"))
+                if auxiliary:
+                    buffers = img.auxiliary
+                    if buffers is None:
+                        buffers = tiles.auxiliary_buffers(self.cameras[i], self)
+                    buffers.save(self.image_path(i))
+                if streams[i] is not None:
+                    streams[i].close()
+                    os.remove(streams[i].path)
+                print(f"Rendered {i+1} camera!")
+        self.stats = cam_stats if stats else []
+
+    def sweep_groups(self):
+        # returns lists of indices of the cameras rendered together by tiles.render_sweep: cameras with equal
+        # view_key (e.g. the same view with 2, 4, 8 and 16 samples per pixel or bounce depths), adaptive cameras
+        # are rendered alone (their pixels take different numbers of samples), cameras with one sample per pixel
+        # only with each other (their rays go through the pixel centres, the first sample of a sweep is jittered)
+        groups = {}
+        for i, cam in enumerate(self.cameras):
+            groups.setdefault((i,) if cam.adaptive else (cam.view_key(), cam.samples_per_pixel == 1), []).append(i)
+        return list(groups.values())
 
     def add_cam(self, cam):
         # adds a Camera to scene
         self.cameras.append(cam)
 
     def add_render_object(self, obj):
-        # adds RenderObject to scene
+        # adds RenderObject to scene (runtime representation has to be rebuilt)
         self.render_objects.append(obj)
+        self.bvh = None
 
-    def hit(self, ray, t_min, t_max):
+    def add_spheres(self, centers, radii, materials=(), material_ids=None, colors=None):
+        # adds many spheres at once without creating Sphere objects: (N, 3) centers and N radii,
+        # material_ids index into materials (-1 for spheres without material showing their colors)
+        n = len(radii)
+        material_ids = np.full(n, -1) if material_ids is None else material_ids
+        colors = np.zeros((n, 3)) if colors is None else colors
+        self.sphere_arrays.append((SphereStore(centers, radii, material_ids, colors), list(materials)))
+        self.bvh = None
+
+    def build(self):
+        # compiles render objects to their runtime representation if they changed since last build
+        if self.bvh is not None:
+            return self.bvh
+
+        self.materials = []
+        materials = [obj.material for obj in self.render_objects] + [m for _, ms in self.sphere_arrays for m in ms]
+        for material in materials:
+            if material is not None and not any(material is m for m in self.materials):
+                self.materials.append(material)
+
+        spheres = [obj for obj in self.render_objects if type(obj) is Sphere]
+        stores = [SphereStore.from_spheres(spheres, [self.material_index(obj.material) for obj in spheres])]
+        for store, store_materials in self.sphere_arrays:
+            # material index -1 (no material) takes the last entry of the mapping
+            mapping = np.array([self.material_index(m) for m in store_materials] + [-1], dtype=int)
+            stores.append(SphereStore(store.centers, store.radii, mapping[store.material_ids], store.colors))
+        self.spheres = SphereStore.concatenate(stores)
+
+        disks = [obj for obj in self.render_objects if type(obj) is Disk]
+        boxes = [obj for obj in self.render_objects if type(obj) is AABB]
+        planes = [obj for obj in self.render_objects if type(obj) is Plane]
+        self.meshes = [obj for obj in self.render_objects if type(obj) is TriangleMesh]
+        self.instances = [obj for obj in self.render_objects if type(obj) is Instance and obj.batched()]
+        self.unbatched = [obj for obj in self.render_objects
+                          if type(obj) not in (Sphere, Disk, AABB, TriangleMesh, Plane, Instance)
+                          or type(obj) is Instance and not obj.batched()]
+        self.objects = disks + boxes + self.meshes + self.instances + self.unbatched + planes
+        self.shapes = [(len(self.spheres), DiskStore.from_disks(disks)),
+                       (len(self.spheres) + len(disks), BoxStore.from_boxes(boxes))]
+        self.mesh_offset = len(self.spheres) + len(disks) + len(boxes)
+        # shared geometry of instances is only built once
+        for obj in self.meshes + self.instances:
+            obj.build()
+        self.planes = PlaneStore.from_planes(planes)
+        self.plane_offset = len(self.spheres) + len(self.objects) - len(planes)
+        self.material_ids = np.concatenate([self.spheres.material_ids,
+                                            np.array([self.material_index(obj.material) for obj in self.objects],
+                                                     dtype=int)])
+        self.colors = np.concatenate([self.spheres.colors, np.reshape(
+            [getattr(obj, "color", Vector.null()).to_array() for obj in self.objects], (-1, 3))])
+        emissive = np.isin(self.spheres.material_ids,
+                           [i for i, m in enumerate(self.materials) if isinstance(m, EmissiveMaterial)])
+        self.lights = SphereLights(self.spheres.centers[emissive], self.spheres.radii[emissive])
+
+        # primitives of the hierarchy are the spheres followed by the other objects but planes
+        bounds = [self.spheres.bounding_boxes()] + [store.bounding_boxes() for _, store in self.shapes]
+        boxes = [obj.bounding_box() for obj in self.meshes + self.instances + self.unbatched]
+        bounds.append((np.reshape([box[0].to_array() for box in boxes], (-1, 3)),
+                       np.reshape([box[1].to_array() for box in boxes], (-1, 3))))
+        self.bvh = BVH(np.concatenate([b[0] for b in bounds]), np.concatenate([b[1] for b in bounds]))
+        return self.bvh
+
+    def material_index(self, material):
+        # returns index of material in the material list of the compiled scene (-1 for no material)
+        for i, m in enumerate(self.materials):
+            if m is material:
+                return i
+        return -1
+
+    def hit(self, ray, t_min, t_max, stats=None):
         # returns information about a hit/intersection of a ray with a render object
         # (scene checks instead of camera to enable more use cases)
-        result = None
-        # checks for hit for all render objects
-        for obj in self.render_objects:
-            result_obj = obj.hit(ray, t_min, t_max)
+        # only objects whose bounding boxes are intersected by the ray are checked,
+        # result is the hit closest to camera (intersection tests are counted in stats if given)
+        # planes are checked first, their closest hit limits the traversal of the hierarchy
+        bvh = self.build()
+
+        def counting_hit_primitive(i, ray, t_min, t_max):
+            stats.intersection_tests += 1
+            return self._hit_primitive(i, ray, t_min, t_max)
+
+        hit_primitive = self._hit_primitive if stats is None else counting_hit_primitive
+
+        closest = None
+        for i in range(self.plane_offset, self.plane_offset + len(self.planes)):
+            result = hit_primitive(i, ray, t_min, t_max)
+            if result is not None:
+                closest, t_max = result, result[0]
+        result = bvh.closest_hit(ray, t_min, t_max, hit_primitive)
+        return closest if result is None else result
+
+    def occluded(self, ray, t_min, t_max):
+        # returns if any render object is hit by ray within [t_min, t_max] (e.g. for shadow rays),
+        # stops at the first hit found instead of searching the closest one
+        bvh = self.build()
+        for i in range(self.plane_offset, self.plane_offset + len(self.planes)):
+            if self._occludes_primitive(i, ray, t_min, t_max):
+                return True
+        return bvh.any_hit(ray, t_min, t_max, self._occludes_primitive)
+
+    def _occludes_primitive(self, i, ray, t_min, t_max):
+        if i >= len(self.spheres):
+            return self.objects[i - len(self.spheres)].occludes(ray, t_min, t_max)
+        return self.spheres.occludes(i, ray, t_min, t_max)
+
+    def _hit_primitive(self, i, ray, t_min, t_max):
+        if i >= len(self.spheres):
+            return self.objects[i - len(self.spheres)].hit(ray, t_min, t_max)
+        result = self.spheres.hit(i, ray, t_min, t_max)
+        if result is None:
+            return None
+        return result[:5] + (self.materials[result[5]] if result[5] >= 0 else None,)
+
+    def hit_batch(self, origins, directions, t_min, t_max, stats=None):
+        # batched version of hit for (N, 3) arrays of ray origins and directions
+        # returns arrays of ray parameter t, intersection positions, normals, front_face flags,
+        # material indices (-1 for no material) and primitive indices (-1 for no hit, t is inf then)
+        # (each ray reaching a leaf is tested against all primitives of the leaf, each ray against all planes,
+        # counted in stats if given)
+        bvh = self.build()
+
+        # closest plane hits limit the traversal of the hierarchy (stores without primitives are skipped)
+        t_planes = np.full(len(origins), t_max, dtype=float)
+        plane_index = np.full(len(origins), -1)
+        if len(self.planes):
+            self.planes.hit_batch(range(len(self.planes)), origins, directions, t_min, t_planes, plane_index,
+                                  self.plane_offset)
+            if stats is not None:
+                stats.intersection_tests += len(self.planes) * len(origins)
+        shapes = [(offset, store) for offset, store in self.shapes if len(store)]
+        only_spheres = bvh.size == len(self.spheres)
+        # meshes and instances (primitives from mesh_offset on), hit triangle of rays hitting one of them
+        nested = self.meshes + self.instances
+        triangles = np.full(len(origins), -1)
+        # objects batched hits don't support (e.g. instances of spheres, the primitives after the nested ones) are
+        # hit ray by ray, outward normals of rays hitting one of them
+        unbatched_offset = self.mesh_offset + len(nested)
+        unbatched_norm = np.zeros((len(origins), 3))
+
+        def hit_leaf(prims, rays, t_best, index):
+            t_rays, index_rays = t_best[rays], index[rays]
+            o, d = origins[rays], directions[rays]
+            self.spheres.hit_batch(prims if only_spheres else prims[prims < len(self.spheres)], o, d, t_min, t_rays,
+                                   index_rays)
+            for offset, store in shapes:
+                local = prims[(prims >= offset) & (prims < offset + len(store))] - offset
+                if len(local):
+                    store.hit_batch(local, o, d, t_min, t_rays, index_rays, offset)
+            for i in prims[(prims >= self.mesh_offset) & (prims < self.mesh_offset + len(nested))]:
+                triangles_rays = triangles[rays]
+                closer = nested[i - self.mesh_offset].hit_batch(o, d, t_min, t_rays, triangles_rays, stats)
+                index_rays[closer] = i
+                triangles[rays] = triangles_rays
+            for i in prims[prims >= unbatched_offset]:
+                obj = self.objects[i - len(self.spheres)]
+                for k in range(len(rays)):
+                    result = obj.hit(Ray(Vector(*o[k].tolist()), Vector(*d[k].tolist())), t_min, t_rays[k])
+                    if result is not None:
+                        t_rays[k], index_rays[k] = result[0], i
+                        # front_face is found from the normal below like for the other primitives
+                        unbatched_norm[rays[k]] = result[2].to_array() * (1 if result[3] else -1)
+            t_best[rays], index[rays] = t_rays, index_rays
+            if stats is not None:
+                stats.intersection_tests += len(prims) * len(rays)
+
+        t, index = bvh.closest_hit_batch(origins, directions, t_min, t_planes, hit_leaf)
+        if len(self.planes):
+            index = np.where(index >= 0, index, plane_index)
+        hit = index >= 0
+        t[~hit] = np.inf
+
+        pos = origins + directions * np.where(hit, t, 0)[:, None]
+        norm = np.zeros_like(pos)
+        spheres = hit & (index < len(self.spheres))
+        norm[spheres] = self.spheres.normals(index[spheres], pos[spheres])
+        for offset, store in shapes + ([(self.plane_offset, self.planes)] if len(self.planes) else []):
+            mask = (index >= offset) & (index < offset + len(store))
+            if np.any(mask):
+                norm[mask] = store.surface_normals(index[mask] - offset, pos[mask])
+        # hits of meshes and instances grouped by primitive (there may be many instances)
+        rays = np.flatnonzero((index >= self.mesh_offset) & (index < self.mesh_offset + len(nested)))
+        rays = rays[np.argsort(index[rays], kind="stable")]
+        prims, starts = np.unique(index[rays], return_index=True)
+        for i, group in zip(prims, np.split(rays, starts[1:])):
+            norm[group] = nested[i - self.mesh_offset].normals(triangles[group])
+        unbatched = (index >= unbatched_offset) & (index < self.plane_offset)
+        norm[unbatched] = unbatched_norm[unbatched]
+        # <= because norm should point out if norm and ray are orthogonal
+        front_face = batch_dot(norm, directions) <= 0
+        norm[~front_face] *= -1
+        material_ids = np.full(len(index), -1)
+        material_ids[hit] = self.material_ids[index[hit]]
+        return t, pos, norm, front_face, material_ids, index
 
-            # returns a result only if it was a hit and if hit object is closer to camera than others
-            if result_obj is not None:
-                if result is None or result_obj[0] < result[0]:
-                    result = result_obj
-        return result
+    def occluded_batch(self, origins, directions, t_min, t_max):
+        # batched version of occluded for (N, 3) arrays of ray origins and directions,
+        # t_max may be an array for segments of different length, returns boolean array
+        bvh = self.build()
+        shapes = [(offset, store) for offset, store in self.shapes if len(store)]
+        only_spheres = bvh.size == len(self.spheres)
+        nested = self.meshes + self.instances
+        # objects batched hits don't support are hit ray by ray (see hit_batch)
+        unbatched_offset = self.mesh_offset + len(nested)
 
+        def occluded_leaf(prims, rays, t_max_rays, occluded):
+            occluded_rays = occluded[rays]
+            o, d = origins[rays], directions[rays]
+            self.spheres.occluded_batch(prims if only_spheres else prims[prims < len(self.spheres)], o, d, t_min,
+                                        t_max_rays, occluded_rays)
+            for offset, store in shapes:
+                local = prims[(prims >= offset) & (prims < offset + len(store))] - offset
+                if len(local):
+                    store.occluded_batch(local, o, d, t_min, t_max_rays, occluded_rays)
+            for i in prims[(prims >= self.mesh_offset) & (prims < self.mesh_offset + len(nested))]:
+                nested[i - self.mesh_offset].occluded_batch(o, d, t_min, t_max_rays, occluded_rays)
+            for i in prims[prims >= unbatched_offset]:
+                obj = self.objects[i - len(self.spheres)]
+                for k in np.flatnonzero(~occluded_rays):
+                    occluded_rays[k] = obj.occludes(Ray(Vector(*o[k].tolist()), Vector(*d[k].tolist())), t_min,
+                                                    t_max_rays[k])
+            occluded[rays] = occluded_rays
 
+        occluded = bvh.any_hit_batch(origins, directions, t_min, t_max, occluded_leaf)
+        self.planes.occluded_batch(range(len(self.planes)), origins, directions, t_min, t_max, occluded)
+        return occluded
 
+    def emitted_batch(self, material_ids, index):
+        # returns light emitted by hit objects (material indices and primitive indices of hit_batch) as (N, 3)
+        # array, objects without material show their plain color and rays without hit get nothing
+        emitted = np.zeros((len(index), 3))
+        plain = (material_ids < 0) & (index >= 0)
+        emitted[plain] = self.colors[index[plain]]
+        for j, material in enumerate(self.materials):
+            mask = material_ids == j
+            if np.any(mask):
+                emitted[mask] = material.emitted().to_array()
+        return emitted
@@ -0,0 +1,95 @@
+import copy
+import json
+import os
+import time
+
+import numpy as np
+
+from base import tiles
+from base.rendering import Framebuffer
+from base.stats import timed
+
+# minimal time in seconds between two checkpoints (the last pass is always saved)
+CHECKPOINT_INTERVAL = 60
+
+
+class Checkpoint:
+    # state of a progressive render: summed up colors and number of samples of each pixel (Framebuffer), passes so far
+    # and the seed all passes take their random numbers from (pass i always uses the same seeds, so resuming a
+    # render gives the same image as rendering it at once)
+    def __init__(self, width, height, entropy, spawn_key=()):
+        self.width = width
+        self.height = height
+        self.framebuffer = Framebuffer(width, height)
+        # samples per pixel of all passes so far (pixels may have less with adaptive sampling)
+        self.samples_per_pixel = 0
+        self.passes = 0
+
+        # root of the random number generation of all passes
+        self.entropy = entropy if isinstance(entropy, int) else [int(e) for e in entropy]
+        self.spawn_key = tuple(spawn_key)
+
+    def pass_seed(self, i):
+        # returns seed sequence of pass i (independent of the passes before)
+        return np.random.SeedSequence(self.entropy, spawn_key=self.spawn_key + (i,))
+
+    def save(self, path):
+        # writes checkpoint to a temporary file first, so a crash while saving keeps the previous checkpoint
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            np.savez(f, colors=self.framebuffer.colors, samples=self.framebuffer.samples,
+                     state=np.array([self.width, self.height, self.samples_per_pixel, self.passes]),
+                     entropy=np.array(json.dumps(self.entropy)), spawn_key=np.array(self.spawn_key, dtype=int))
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            width, height, samples_per_pixel, passes = data["state"].tolist()
+            checkpoint = Checkpoint(width, height, json.loads(str(data["entropy"])), data["spawn_key"].tolist())
+            checkpoint.framebuffer.colors[:] = data["colors"]
+            checkpoint.framebuffer.samples[:] = data["samples"]
+        checkpoint.samples_per_pixel = samples_per_pixel
+        checkpoint.passes = passes
+        return checkpoint
+
+    def image(self, camera):
+        # returns image of the samples so far (pixels without samples stay black)
+        return self.framebuffer.image(camera.exposure, camera.tone_mapping)
+
+
+def render(camera, scene, path, samples_per_pass=1, workers=1, seed=None, progress=True,
+           checkpoint_interval=CHECKPOINT_INTERVAL, stats=None):
+    # renders image of camera in passes of samples_per_pass samples per pixel until camera.samples_per_pixel
+    # are reached and saves checkpoints to path (.npz) in between (statistics of all passes are added to stats):
+    # an existing checkpoint at path is resumed (its seed is used instead of seed), a finished render is extended
+    # by rendering it again with more samples_per_pixel, the checkpoint is kept to allow this
+    if os.path.exists(path):
+        checkpoint = Checkpoint.load(path)
+        if (checkpoint.width, checkpoint.height) != (camera.image_width, camera.image_height):
+            raise ValueError(f"Checkpoint {path} has size {checkpoint.width}x{checkpoint.height}, "
+                             f"but camera renders {camera.image_width}x{camera.image_height}")
+    else:
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        checkpoint = Checkpoint(camera.image_width, camera.image_height, seed.entropy, seed.spawn_key)
+
+    # passes are rendered by a copy of camera with samples_per_pixel of one pass
+    pass_camera = copy.copy(camera)
+    last_save = time.monotonic()
+    while checkpoint.samples_per_pixel < camera.samples_per_pixel:
+        pass_camera.samples_per_pixel = min(samples_per_pass, camera.samples_per_pixel - checkpoint.samples_per_pixel)
+        pass_camera.min_samples = min(camera.min_samples, pass_camera.samples_per_pixel)
+        if progress:
+            print(f"pass {checkpoint.passes + 1}: samples {checkpoint.samples_per_pixel + 1} to "
+                  f"{checkpoint.samples_per_pixel + pass_camera.samples_per_pixel} of {camera.samples_per_pixel}")
+        tiles.accumulate(pass_camera, scene, checkpoint.framebuffer, workers,
+                         checkpoint.pass_seed(checkpoint.passes), progress, stats=stats)
+        checkpoint.samples_per_pixel += pass_camera.samples_per_pixel
+        checkpoint.passes += 1
+
+        if checkpoint.samples_per_pixel >= camera.samples_per_pixel or \
+                time.monotonic() - last_save >= checkpoint_interval:
+            timed(stats, "output", checkpoint.save, path)
+            last_save = time.monotonic()
+    return tiles.finish(camera, scene, checkpoint.framebuffer, stats)
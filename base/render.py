@@ -0,0 +1,56 @@
+import argparse
+import os
+
+import numpy as np
+
+from base import tiles
+from base.scenefile import load_scene
+from base.stats import RenderStats
+
+
+def main():
+    # renders cameras of a scene file, e.g. python -m base.render scene.json --camera 0
+    parser = argparse.ArgumentParser(description="Render a scene file (.json or .npz)")
+    parser.add_argument("scene", help="scene file")
+    parser.add_argument("--camera", type=int, help="index of the camera to render (all cameras if not given)")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes (0 for one per CPU)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="image path of the camera (default: path of the scene)")
+    parser.add_argument("--stats", action="store_true", help="save ray statistics as .stats.json next to the image")
+    parser.add_argument("--denoise", action="store_true", help="denoise the images (see base.denoise)")
+    parser.add_argument("--auxiliary", action="store_true",
+                        help="save albedo, normals and depth of the first hits as .pfm files next to the image")
+    args = parser.parse_args()
+    # images of all cameras are saved at the paths of the scene
+    if args.output is not None and args.camera is None:
+        parser.error("--output needs --camera")
+
+    scene = load_scene(args.scene)
+    if args.denoise:
+        for cam in scene.cameras:
+            cam.denoise = True
+    workers = args.workers or None
+    if args.camera is None:
+        scene.render(workers, args.seed, stats=args.stats, auxiliary=args.auxiliary)
+        return
+    if not 0 <= args.camera < len(scene.cameras):
+        parser.error(f"scene has {len(scene.cameras)} cameras")
+
+    # same seed as the camera gets from Scene.render with sweep=False (the camera is rendered on its own, not as
+    # part of a sweep)
+    seed = np.random.SeedSequence(args.seed).spawn(len(scene.cameras))[args.camera]
+    stats = RenderStats() if args.stats else None
+    image = scene.cameras[args.camera].render(scene, workers, seed, stats=stats)
+    path = args.output or scene.image_path(args.camera)
+    image.save_image(path)
+    if args.auxiliary:
+        buffers = image.auxiliary
+        if buffers is None:
+            buffers = tiles.auxiliary_buffers(scene.cameras[args.camera], scene)
+        buffers.save(path)
+    if stats is not None:
+        stats.save(os.path.splitext(path)[0] + ".stats.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+import os
+import struct
+import zlib
+
 import numpy as np
 
 
@@ -8,8 +12,32 @@ class Image:
         self.height = height
 
         self.image_list = np.empty((height, width, 3), dtype=int)
+        # number of samples of each pixel (if rendered by a camera)
+        self.samples = None
+        # linear colors of the render (Framebuffer, if rendered by a camera) for HDR output
+        self.framebuffer = None
+        # features of the first hits guiding the denoiser (AuxiliaryBuffers, if rendered by a denoising camera)
+        self.auxiliary = None
+
+    def save_image(self, path, ascii=False):
+        # saves image as binary .ppm (P6), .png or, with the linear colors of the framebuffer, as HDR image
+        # .pfm or .hdr depending on the file extension of path
+        # (ascii=True writes the former plain .ppm format P3 with one value per line)
+        extension = os.path.splitext(path)[1].lower()
+        if extension in (".pfm", ".hdr"):
+            if self.framebuffer is None:
+                raise ValueError(f"{extension} images need the linear colors of a render (framebuffer)")
+            self.framebuffer.save(path)
+        elif extension == ".png":
+            self.save_png(path)
+        elif ascii:
+            self.save_ascii_ppm(path)
+        else:
+            with open(path, "wb") as f:
+                f.write(ppm_header(self.width, self.height))
+                f.write(self.to_bytes().tobytes())
 
-    def save_image(self, path):
+    def save_ascii_ppm(self, path):
         # write pixels
         flat = np.flip(self.image_list, axis=0).flatten()
         np.savetxt(path, flat, fmt="%3d", header=f"P3\n{self.width} {self.height} 255",
@@ -25,3 +53,192 @@ class Image:
         #             f.write(f" {self.image_list[y, x, 0]} ")
         #             f.write(f" {self.image_list[y, x, 1]} ")
         #             f.write(f" {self.image_list[y, x, 2]} ")
+
+    def save_png(self, path):
+        # minimal PNG writer (8 bit RGB) based on zlib, every scanline uses filter "Up" (difference to row above)
+        rows = self.to_bytes()
+        filtered = np.empty((self.height, 1 + self.width * 3), dtype=np.uint8)
+        filtered[:, 0] = 2
+        filtered[:, 1:] = rows.reshape(self.height, -1)
+        filtered[1:, 1:] -= rows.reshape(self.height, -1)[:-1]
+
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            write_png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0))
+            write_png_chunk(f, b"IDAT", zlib.compress(filtered.tobytes(), 6))
+            write_png_chunk(f, b"IEND", b"")
+
+    def to_bytes(self):
+        # returns image as uint8 array with top row first (image_list starts with the bottom row)
+        return np.clip(np.flip(self.image_list, axis=0), 0, 255).astype(np.uint8)
+
+    @staticmethod
+    def load_image(path):
+        # loads a .ppm file (P3 or P6 with 8 bit values)
+        with open(path, "rb") as f:
+            data = f.read()
+        tokens = []
+        position = 0
+        # header: magic number, width, height and maximal value separated by whitespace (and comments)
+        while len(tokens) < 4:
+            while data[position:position + 1].isspace():
+                position += 1
+            if data[position:position + 1] == b"#":
+                position = data.index(b"\n", position)
+                continue
+            end = position
+            while not data[end:end + 1].isspace():
+                end += 1
+            tokens.append(data[position:end])
+            position = end
+        width, height = int(tokens[1]), int(tokens[2])
+
+        if tokens[0] == b"P6":
+            values = np.frombuffer(data, dtype=np.uint8, count=width * height * 3, offset=position + 1)
+        else:
+            values = np.array(data[position:].split(), dtype=int)
+        i = Image(width, height)
+        i.image_list[:] = np.flip(values.reshape(height, width, 3), axis=0)
+        return i
+
+
+def reinhard(colors):
+    # scales colors by 1 / (1 + luminance), keeps hue and maps any brightness below 1
+    luminance = colors @ np.array([.2126, .7152, .0722], dtype=colors.dtype)
+    return colors / (1 + luminance[..., None])
+
+
+def aces(colors):
+    # filmic curve of the ACES reference rendering (fit by K. Narkowicz) for each channel
+    return colors * (2.51 * colors + .03) / (colors * (2.43 * colors + .59) + .14)
+
+
+# tone mapping operators applied to linear colors (after exposure) when converting them to 8 bit
+# ("clamp" keeps colors as they are, values above 1 are clipped)
+TONE_MAPPINGS = {"clamp": None, "reinhard": reinhard, "aces": aces}
+
+
+def resolve(colors, samples, exposure=0., tone_mapping="clamp"):
+    # converts summed up linear colors of pixels with samples (array per pixel or number) to int values 0 to 255:
+    # mean color scaled by 2 ** exposure, tone mapped and gamma corrected (gamma 2), pixels without samples are black
+    if isinstance(samples, np.ndarray):
+        samples = np.maximum(samples, 1)[..., None]
+    colors = colors / samples
+    if exposure != 0:
+        colors = colors * 2. ** exposure
+    if TONE_MAPPINGS[tone_mapping] is not None:
+        colors = TONE_MAPPINGS[tone_mapping](colors)
+    return np.around(np.sqrt(colors) * 255).astype(int)
+
+
+class Framebuffer:
+    # float32 accumulation buffer of a render: summed up linear colors and number of samples of each pixel
+    # (rows start at the bottom like Image.image_list), buffers of several passes or machines are merged by adding,
+    # conversion to 8 bit (exposure, tone mapping) only happens for the final image
+    def __init__(self, width, height, layers=None):
+        # with layers several images share the samples (e.g. light gathered up to several bounce depths of the same
+        # paths, see Camera.depth_sweep) and colors have shape (height, width, layers, 3)
+        self.width = width
+        self.height = height
+        self.colors = np.zeros((height, width, 3) if layers is None else (height, width, layers, 3), dtype=np.float32)
+        self.samples = np.zeros((height, width), dtype=np.int32)
+
+    def add(self, x_start, y_start, colors, samples):
+        # adds summed up colors and samples of a tile with lower left corner (x_start, y_start)
+        # colors are rounded to float32 before adding, so sums don't depend on where tiles were rendered
+        height, width = samples.shape
+        self.colors[y_start:y_start + height, x_start:x_start + width] += np.asarray(colors, dtype=np.float32)
+        self.samples[y_start:y_start + height, x_start:x_start + width] += samples
+
+    def merge(self, other):
+        self.colors += other.colors
+        self.samples += other.samples
+
+    def mean(self):
+        # returns mean linear color of each pixel (black for pixels without samples)
+        samples = np.maximum(self.samples, 1)
+        return self.colors / samples.reshape(samples.shape + (1,) * (self.colors.ndim - 2))
+
+    def layer(self, k):
+        # returns copy of the framebuffer (of layer k of a framebuffer with layers)
+        framebuffer = Framebuffer(self.width, self.height)
+        framebuffer.colors[:] = self.colors if self.colors.ndim == 3 else self.colors[:, :, k]
+        framebuffer.samples[:] = self.samples
+        return framebuffer
+
+    def image(self, exposure=0., tone_mapping="clamp"):
+        # returns 8 bit image of the mean colors (see resolve), the image keeps samples and framebuffer
+        i = Image(self.width, self.height)
+        i.image_list[:] = resolve(self.colors, self.samples, exposure, tone_mapping)
+        i.samples = self.samples
+        i.framebuffer = self
+        return i
+
+    def save(self, path, exposure=0., tone_mapping="clamp"):
+        # saves mean colors as HDR image (.pfm or .hdr, linear without exposure) or as 8 bit image
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".pfm":
+            self.save_pfm(path)
+        elif extension == ".hdr":
+            self.save_hdr(path)
+        else:
+            self.image(exposure, tone_mapping).save_image(path)
+
+    def save_pfm(self, path):
+        # portable float map: 32 bit floats (little endian as the scale is negative), rows from the bottom
+        with open(path, "wb") as f:
+            f.write(f"PF\n{self.width} {self.height}\n-1.0\n".encode())
+            f.write(self.mean().astype("<f4").tobytes())
+
+    def save_hdr(self, path):
+        # Radiance RGBE image (flat scanlines without run length encoding): 8 bit mantissas sharing the exponent
+        # of the largest channel, rows from the top
+        colors = np.flip(self.mean(), axis=0).astype(float)
+        largest = colors.max(axis=2)
+        mantissa, exponent = np.frexp(largest)
+        rgbe = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        visible = largest > 1e-32
+        scale = np.zeros_like(largest)
+        scale[visible] = mantissa[visible] * 256 / largest[visible]
+        rgbe[..., :3] = np.clip(colors * scale[..., None], 0, 255)
+        rgbe[..., 3] = np.where(visible, exponent + 128, 0)
+        with open(path, "wb") as f:
+            f.write(f"#?RADIANCE\nFORMAT=32-bit_rle_rgbe\n\n-Y {self.height} +X {self.width}\n".encode())
+            f.write(rgbe.tobytes())
+
+
+def ppm_header(width, height):
+    return f"P6\n{width} {height}\n255\n".encode()
+
+
+def write_png_chunk(f, chunk_type, data):
+    f.write(struct.pack(">I", len(data)))
+    f.write(chunk_type)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+class ImageStream:
+    # binary .ppm file written while rendering: pixels of finished tiles are written to their place in the
+    # file at once, so a crashed render keeps all finished tiles (unfinished ones stay black)
+    def __init__(self, path, width, height):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.header_size = len(ppm_header(width, height))
+
+        self.file = open(path, "wb")
+        self.file.write(ppm_header(width, height))
+        self.file.truncate(self.header_size + width * height * 3)
+
+    def write_tile(self, x_start, y_start, pixels):
+        # writes (height, width, 3) pixels with lower left corner (x_start, y_start) like in Image.image_list
+        rows = np.clip(pixels, 0, 255).astype(np.uint8)
+        for y in range(len(rows)):
+            # file starts with the top row
+            self.file.seek(self.header_size + ((self.height - 1 - (y_start + y)) * self.width + x_start) * 3)
+            self.file.write(rows[y].tobytes())
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,208 @@
+import math
+
+import numpy as np
+
+from base.geometries import Vector
+
+# number of random numbers generated at once for scalar requests
+BLOCK_SIZE = 4096
+# dimensions of a camera sample: antialiasing offset in x and y, lens position u and v
+CAMERA_DIMENSIONS = 4
+
+
+def map_to_unit_sphere(u):
+    # maps (N, 3) uniform numbers to points uniformly distributed in the unit sphere (no rejection)
+    z = 1 - 2 * u[:, 0]
+    phi = 2 * np.pi * u[:, 1]
+    r = np.sqrt(np.maximum(1 - z * z, 0)) * np.cbrt(u[:, 2])
+    return np.stack([r * np.cos(phi), r * np.sin(phi), z * np.cbrt(u[:, 2])], axis=1)
+
+
+def map_to_unit_vector(u):
+    # maps (N, 2) uniform numbers to unit vectors (uniformly distributed on the unit sphere)
+    z = 1 - 2 * u[:, 0]
+    phi = 2 * np.pi * u[:, 1]
+    r = np.sqrt(np.maximum(1 - z * z, 0))
+    return np.stack([r * np.cos(phi), r * np.sin(phi), z], axis=1)
+
+
+def map_to_unit_disc(u):
+    # maps (N, 2) uniform numbers to points in the unit disc (z = 0), the concentric mapping keeps
+    # stratification of the numbers
+    a = 2 * u[:, 0] - 1
+    b = 2 * u[:, 1] - 1
+    first = np.abs(a) > np.abs(b)
+    r = np.where(first, a, b)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        phi = np.where(first, np.pi / 4 * (b / a), np.pi / 2 - np.pi / 4 * (a / b))
+    phi = np.where(r == 0, 0, phi)
+    return np.stack([r * np.cos(phi), r * np.sin(phi), np.zeros(len(u))], axis=1)
+
+
+class Sampler:
+    # serves random samples from pre-generated blocks of a NumPy random generator:
+    # scalar methods return Vectors (for Camera.get_ray and Material.scatter), methods taking a count n
+    # return (n, 3) arrays (for the wavefront renderer)
+    # camera samples are independent random numbers, subclasses distribute them better within pixels
+    def __init__(self, seed=None, block_size=BLOCK_SIZE):
+        self.rng = np.random.default_rng(seed)
+        self.block_size = block_size
+        self._block = []
+        self._position = 0
+        # camera samples of the current pixel (scalar rendering)
+        self._pixel = []
+        self._pixel_position = 0
+
+    def uniform(self):
+        # returns a random float in [0, 1)
+        if self._position == len(self._block):
+            self._block = self.rng.random(self.block_size).tolist()
+            self._position = 0
+        self._position += 1
+        return self._block[self._position - 1]
+
+    def uniforms(self, n):
+        return self.rng.random(n)
+
+    # scalar versions use math instead of NumPy (NumPy scalars are slow in further Vector calculations)
+    def rand_in_unit_sphere(self):
+        z = 1 - 2 * self.uniform()
+        phi = 2 * math.pi * self.uniform()
+        r = self.uniform() ** (1 / 3)
+        s = max(1 - z * z, 0) ** .5 * r
+        return Vector(s * math.cos(phi), s * math.sin(phi), z * r)
+
+    def rand_unit_vector(self):
+        z = 1 - 2 * self.uniform()
+        phi = 2 * math.pi * self.uniform()
+        s = max(1 - z * z, 0) ** .5
+        return Vector(s * math.cos(phi), s * math.sin(phi), z)
+
+    def rand_in_unit_disc(self):
+        return self.disc_point(self.uniform(), self.uniform())
+
+    @staticmethod
+    def disc_point(u, v):
+        # scalar version of map_to_unit_disc
+        a, b = 2 * u - 1, 2 * v - 1
+        if a == 0 and b == 0:
+            return Vector(0, 0, 0)
+        if abs(a) > abs(b):
+            r, phi = a, math.pi / 4 * (b / a)
+        else:
+            r, phi = b, math.pi / 2 - math.pi / 4 * (a / b)
+        return Vector(r * math.cos(phi), r * math.sin(phi), 0)
+
+    def rand_in_hemisphere(self, norm):
+        in_unit_sphere = self.rand_in_unit_sphere()
+        if in_unit_sphere * norm > 0:
+            return in_unit_sphere
+        else:
+            return in_unit_sphere * -1
+
+    def in_unit_sphere(self, n):
+        return map_to_unit_sphere(self.rng.random((n, 3)))
+
+    def unit_vectors(self, n):
+        return map_to_unit_vector(self.rng.random((n, 2)))
+
+    def in_unit_disc(self, n):
+        return map_to_unit_disc(self.rng.random((n, 2)))
+
+    def in_hemisphere(self, norm):
+        # random vectors in unit sphere flipped to the hemispheres of the (N, 3) normals
+        v = self.in_unit_sphere(len(norm))
+        v[np.einsum("ij,ij->i", v, norm) <= 0] *= -1
+        return v
+
+    def pixel_samples(self, pixels, samples_per_pixel):
+        # returns camera samples in [0, 1) as (pixels, samples_per_pixel, CAMERA_DIMENSIONS) array
+        return self.rng.random((pixels, samples_per_pixel, CAMERA_DIMENSIONS))
+
+    def start_pixel(self, samples_per_pixel):
+        # prepares camera samples of the next pixel for camera_sample (scalar rendering)
+        self._pixel = self.pixel_samples(1, samples_per_pixel)[0].tolist()
+        self._pixel_position = 0
+
+    def camera_sample(self):
+        # returns next camera sample of the current pixel as list of CAMERA_DIMENSIONS floats
+        if self._pixel_position == len(self._pixel):
+            return [self.uniform() for _ in range(CAMERA_DIMENSIONS)]
+        self._pixel_position += 1
+        return self._pixel[self._pixel_position - 1]
+
+
+class StratifiedSampler(Sampler):
+    # jittered samples: pixel and lens are divided into (about) samples_per_pixel strata with one sample each,
+    # strata of pixel and lens are combined randomly
+    def pixel_samples(self, pixels, samples_per_pixel):
+        columns = max(1, int(np.sqrt(samples_per_pixel)))
+        rows = -(-samples_per_pixel // columns)
+        samples = np.empty((pixels, samples_per_pixel, CAMERA_DIMENSIONS))
+        for d in range(0, CAMERA_DIMENSIONS, 2):
+            # strata of each pixel in random order (more strata than samples if samples_per_pixel isn't a product)
+            strata = self.rng.permuted(np.tile(np.arange(columns * rows), (pixels, 1)), axis=1)[:, :samples_per_pixel]
+            jitter = self.rng.random((pixels, samples_per_pixel, 2))
+            samples[:, :, d] = (strata % columns + jitter[:, :, 0]) / columns
+            samples[:, :, d + 1] = (strata // columns + jitter[:, :, 1]) / rows
+        return samples
+
+
+def radical_inverse(indices, base):
+    # returns van der Corput sequence of base for integer indices
+    result = np.zeros(len(indices))
+    indices = indices.copy()
+    scale = 1 / base
+    while np.any(indices > 0):
+        result += (indices % base) * scale
+        indices //= base
+        scale /= base
+    return result
+
+
+class HaltonSampler(Sampler):
+    # low-discrepancy Halton points (bases 2, 3, 5, 7) shifted randomly for each pixel (Cranley-Patterson rotation)
+    BASES = (2, 3, 5, 7)
+
+    def pixel_samples(self, pixels, samples_per_pixel):
+        indices = np.arange(samples_per_pixel)
+        points = np.stack([radical_inverse(indices, base) for base in self.BASES], axis=1)
+        return (points[None] + self.rng.random((pixels, 1, CAMERA_DIMENSIONS))) % 1
+
+
+class SobolSampler(Sampler):
+    # low-discrepancy Sobol points scrambled by a random digital shift for each pixel
+    # (direction numbers of the first dimensions from S. Joe and F. Y. Kuo: (s, a, m) per dimension)
+    PARAMETERS = (None, (1, 0, (1,)), (2, 1, (1, 3)), (3, 1, (1, 3, 1)))
+    BITS = 32
+
+    def __init__(self, seed=None, block_size=BLOCK_SIZE):
+        super().__init__(seed, block_size)
+        self.directions = np.array([self._directions(p) for p in self.PARAMETERS], dtype=np.uint64)
+
+    def _directions(self, parameters):
+        if parameters is None:
+            # first dimension is the van der Corput sequence of base 2
+            return [1 << (self.BITS - 1 - i) for i in range(self.BITS)]
+        s, a, m = parameters
+        v = [m[i] << (self.BITS - 1 - i) for i in range(s)]
+        for i in range(s, self.BITS):
+            value = v[i - s] ^ (v[i - s] >> s)
+            for k in range(1, s):
+                if (a >> (s - 1 - k)) & 1:
+                    value ^= v[i - k]
+            v.append(value)
+        return v
+
+    def pixel_samples(self, pixels, samples_per_pixel):
+        indices = np.arange(samples_per_pixel, dtype=np.uint64)
+        points = np.zeros((samples_per_pixel, CAMERA_DIMENSIONS), dtype=np.uint64)
+        for bit in range(max(1, int(samples_per_pixel - 1).bit_length())):
+            set_bit = ((indices >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+            points[set_bit] ^= self.directions[:, bit]
+        shift = self.rng.integers(0, 1 << self.BITS, (pixels, 1, CAMERA_DIMENSIONS), dtype=np.uint64)
+        return (points[None] ^ shift) / float(1 << self.BITS)
+
+
+# samplers selectable by name (Camera parameter sampler)
+SAMPLERS = {"random": Sampler, "stratified": StratifiedSampler, "halton": HaltonSampler, "sobol": SobolSampler}
@@ -0,0 +1,191 @@
+import argparse
+import importlib
+import io
+import json
+import os
+
+import numpy as np
+
+from base.geometries import Vector
+from base.materials import DiffuseMaterial, EmissiveMaterial, SpecularMaterial, TransmissiveMaterial
+from base.meshfile import load_mesh
+from base.objects import AABB, Camera, Disk, Plane, Scene, TriangleMesh
+
+# material types of scene files with their class and constructor parameters
+MATERIALS = {"diffuse": (DiffuseMaterial, ("albedo",)),
+             "specular": (SpecularMaterial, ("albedo", "fuzz")),
+             "transmissive": (TransmissiveMaterial, ("ior",)),
+             "emissive": (EmissiveMaterial, ("color", "intensity"))}
+# object types of scene files (objects other than spheres) with their class and constructor parameters
+OBJECTS = {"plane": (Plane, ("position", "normal")),
+           "disk": (Disk, ("position", "normal", "radius")),
+           "box": (AABB, ("minimum", "maximum"))}
+# camera parameters given as vectors
+CAMERA_VECTORS = ("lookfrom", "lookat", "vup")
+
+# Scene files describe a scene as JSON object (.json) or as NumPy archive (.npz) holding the same JSON object
+# in its array "scene" and the sphere arrays in binary form:
+# {"name": "image9", "path": "../images/", "image_format": "ppm",
+#  "materials": [{"type": "diffuse", "albedo": [1, 0, 0]}, {"type": "emissive", "color": [1, 1, 1], "intensity": 1}],
+#  "spheres": {"centers": [[0, -1, -13], ...], "radii": [4, ...], "materials": [0, ...], "colors": [[0, 0, 0], ...]},
+#  "objects": [{"type": "plane", "position": [0, -5, 0], "normal": [0, 1, 0], "material": 0, "color": [0, 0, 0]},
+#              {"type": "mesh", "file": "bunny.ply", "material": 0}],
+#  "cameras": [{"aspect_ratio": 1.78, "image_width": 1920, "focal_length": 1, "lookfrom": [0, 20, -13], ...}]}
+# sphere "materials" index into the material list (-1 for no material), "materials" and "colors" are optional,
+# like "material" and "color" of objects, mesh "file"s are .obj or .ply files relative to the scene file,
+# cameras take the keyword arguments of Camera (vectors as lists, t_max null for infinity)
+
+
+def load_scene(path):
+    # builds a Scene from a scene file, spheres are added in bulk (see Scene.add_spheres) and equal material
+    # definitions become the same material object
+    if os.path.splitext(path)[1].lower() == ".npz":
+        with np.load(path) as data:
+            description = json.loads(str(data["scene"]))
+            spheres = {key: data[key] for key in ("centers", "radii", "materials", "colors") if key in data}
+    else:
+        with open(path) as f:
+            description = json.load(f)
+        spheres = description.get("spheres", {})
+
+    scene = Scene(description.get("name", os.path.splitext(os.path.basename(path))[0]), description.get("path", ""),
+                  description.get("image_format", "ppm"))
+
+    materials = []
+    material_ids = []
+    known = {}
+    for definition in description.get("materials", []):
+        key = json.dumps(definition, sort_keys=True)
+        if key not in known:
+            known[key] = len(materials)
+            materials.append(material_from_dict(definition))
+        material_ids.append(known[key])
+
+    radii = np.asarray(spheres.get("radii", []), dtype=float)
+    if len(radii) > 0:
+        ids = np.asarray(spheres.get("materials", np.full(len(radii), -1)), dtype=int)
+        # material index -1 (no material) takes the last entry of the mapping
+        ids = np.array(material_ids + [-1], dtype=int)[ids]
+        scene.add_spheres(spheres["centers"], radii, materials, ids, spheres.get("colors"))
+
+    for definition in description.get("objects", []):
+        material = definition.get("material", -1)
+        scene.add_render_object(object_from_dict(definition, materials[material_ids[material]] if material >= 0
+                                                 else None, os.path.dirname(path)))
+
+    for definition in description.get("cameras", []):
+        scene.add_cam(camera_from_dict(definition))
+    return scene
+
+
+def save_scene(scene, path):
+    # writes the compiled scene (spheres, other objects, materials and cameras) to a .json or .npz scene file
+    scene.build()
+    if scene.unbatched:
+        raise NotImplementedError(f"Scene files do not support {type(scene.unbatched[0]).__name__}")
+    description = {"name": scene.name, "path": scene.path, "image_format": scene.image_format,
+                   "materials": [material_to_dict(m) for m in scene.materials],
+                   "objects": [object_to_dict(obj, scene.material_index(obj.material), os.path.dirname(path))
+                               for obj in scene.objects],
+                   "cameras": [camera_to_dict(cam) for cam in scene.cameras]}
+    spheres = {"centers": scene.spheres.centers, "radii": scene.spheres.radii,
+               "materials": scene.spheres.material_ids, "colors": scene.spheres.colors}
+
+    if os.path.splitext(path)[1].lower() == ".npz":
+        # np.savez appends .npz to paths, but not to file objects
+        buffer = io.BytesIO()
+        np.savez(buffer, scene=np.array(json.dumps(description)), **spheres)
+        with open(path, "wb") as f:
+            f.write(buffer.getvalue())
+    else:
+        description["spheres"] = {key: value.tolist() for key, value in spheres.items()}
+        with open(path, "w") as f:
+            json.dump(description, f)
+
+
+def material_from_dict(definition):
+    if definition["type"] not in MATERIALS:
+        raise ValueError(f"Unknown material type {definition['type']}")
+    cls, parameters = MATERIALS[definition["type"]]
+    return cls(*[Vector(*definition[p]) if isinstance(definition[p], list) else definition[p] for p in parameters])
+
+
+def material_to_dict(material):
+    for name, (cls, parameters) in MATERIALS.items():
+        if type(material) is cls:
+            definition = {"type": name}
+            for p in parameters:
+                value = getattr(material, p)
+                definition[p] = [float(value.x), float(value.y), float(value.z)] if type(value) is Vector else value
+            return definition
+    raise NotImplementedError(f"Scene files do not support {type(material).__name__}")
+
+
+def object_from_dict(definition, material, directory=""):
+    if definition["type"] == "mesh":
+        return load_mesh(os.path.join(directory, definition["file"]), Vector(*definition.get("color", (0, 0, 0))),
+                         material)
+    if definition["type"] not in OBJECTS:
+        raise ValueError(f"Unknown object type {definition['type']}")
+    cls, parameters = OBJECTS[definition["type"]]
+    return cls(*[Vector(*definition[p]) if isinstance(definition[p], list) else definition[p] for p in parameters],
+               color=Vector(*definition.get("color", (0, 0, 0))), material=material)
+
+
+def object_to_dict(obj, material_index, directory=""):
+    if type(obj) is TriangleMesh:
+        # meshes are referenced by the file they were loaded from
+        if obj.path is None:
+            raise NotImplementedError("Scene files only support meshes loaded from files")
+        return {"type": "mesh", "file": os.path.relpath(obj.path, directory or "."), "material": material_index,
+                "color": obj.color.to_array().tolist()}
+    for name, (cls, parameters) in OBJECTS.items():
+        if type(obj) is cls:
+            definition = {"type": name}
+            for p in parameters:
+                value = getattr(obj, p)
+                definition[p] = [float(value.x), float(value.y), float(value.z)] if type(value) is Vector else value
+            definition["material"] = material_index
+            definition["color"] = obj.color.to_array().tolist()
+            return definition
+    raise NotImplementedError(f"Scene files do not support {type(obj).__name__}")
+
+
+def camera_from_dict(definition):
+    kwargs = dict(definition)
+    for key in CAMERA_VECTORS:
+        if key in kwargs:
+            kwargs[key] = Vector(*kwargs[key])
+    if "background_gradient" in kwargs:
+        kwargs["background_gradient"] = tuple(Vector(*color) for color in kwargs["background_gradient"])
+    if kwargs.get("t_max", 0) is None:
+        kwargs["t_max"] = float("inf")
+    return Camera(**kwargs)
+
+
+def camera_to_dict(cam):
+    # lookat is a point in view direction and v lies in the plane of vup and view direction,
+    # so both give the same camera
+    lookat = cam.position + cam.direction
+    return {"aspect_ratio": cam.aspect_ratio, "image_width": cam.image_width, "focal_length": cam.focal_length,
+            "fov": cam.fov, "lookfrom": cam.position.to_array().tolist(), "lookat": lookat.to_array().tolist(),
+            "vup": cam.v.to_array().tolist(), "samples_per_pixel": cam.samples_per_pixel, "t_min": cam.t_min,
+            "t_max": None if cam.t_max == float("inf") else cam.t_max, "max_bounce_depth": cam.max_bounce_depth,
+            "background_gradient": [color.to_array().tolist() for color in cam.background_gradient],
+            "aperture": cam.lens_radius * 2, "render_mode": cam.render_mode, "sampler": cam.sampler,
+            "adaptive": cam.adaptive, "noise_threshold": cam.noise_threshold, "min_samples": cam.min_samples,
+            "russian_roulette_depth": cam.russian_roulette_depth, "light_sampling": cam.light_sampling,
+            "exposure": cam.exposure, "tone_mapping": cam.tone_mapping, "denoise": cam.denoise}
+
+
+def main():
+    # converts a scene module (e.g. scenes.scene9) to a scene file
+    parser = argparse.ArgumentParser(description="Convert a scene module to a scene file")
+    parser.add_argument("module", help="module defining scene, e.g. scenes.scene9")
+    parser.add_argument("output", help=".json or .npz file")
+    args = parser.parse_args()
+    save_scene(importlib.import_module(args.module).scene, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import json
+import time
+
+# stages of rendering whose time is measured: generating camera rays, closest hits of path rays, scattering at
+# hits, light sampling (including its shadow rays), denoising (including its auxiliary buffers) and output
+# (converting, writing and saving pixels)
+STAGES = ("get_ray", "hit", "scatter", "light", "denoise", "output")
+
+
+class RenderStats:
+    # ray counters and stage timings of a render, only collected if a RenderStats is passed to the render
+    # (e.g. Scene.render(stats=True)), so rendering without it doesn't pay for the instrumentation
+    # stage times are summed up over all worker processes (the wall time is the time of the whole render),
+    # measuring single rays adds some overhead to the timings of the scalar renderer
+    def __init__(self):
+        # rays traced at each bounce (index 0: primary rays from the camera, then scattered secondary rays)
+        self.rays = []
+        # shadow rays towards lights (light sampling)
+        self.shadow_rays = 0
+        # ray-primitive intersection tests of all rays
+        self.intersection_tests = 0
+        # hits per material type ("None" for spheres without material showing their color)
+        self.hits = {}
+        self.times = dict.fromkeys(STAGES, 0.)
+        self.wall_time = 0.
+
+    def add_rays(self, bounce, count=1):
+        # bounces are traced in order, so a new bounce is at most one behind the list
+        if bounce == len(self.rays):
+            self.rays.append(0)
+        self.rays[bounce] += int(count)
+
+    def add_hits(self, material, count=1):
+        name = type(material).__name__ if material is not None else "None"
+        self.hits[name] = self.hits.get(name, 0) + int(count)
+
+    def timed(self, stage, function, *args):
+        # returns function(*args) and adds its time to stage
+        start = time.perf_counter()
+        result = function(*args)
+        self.times[stage] += time.perf_counter() - start
+        return result
+
+    def merge(self, other):
+        # adds counters and times of other (e.g. of a tile rendered by another process)
+        for bounce, count in enumerate(other.rays):
+            self.add_rays(bounce, count)
+        self.shadow_rays += other.shadow_rays
+        self.intersection_tests += other.intersection_tests
+        for name, count in other.hits.items():
+            self.hits[name] = self.hits.get(name, 0) + count
+        for stage, seconds in other.times.items():
+            self.times[stage] += seconds
+        self.wall_time += other.wall_time
+
+    def bounce_depths(self):
+        # histogram of path lengths: number of paths ending after each number of bounces
+        # (paths traced at a bounce but not at the next one ended there)
+        return [count - following for count, following in zip(self.rays, self.rays[1:] + [0])]
+
+    def to_dict(self):
+        primary = self.rays[0] if self.rays else 0
+        total = sum(self.rays) + self.shadow_rays
+        return {"primary_rays": primary, "secondary_rays": sum(self.rays) - primary, "shadow_rays": self.shadow_rays,
+                "intersection_tests": self.intersection_tests, "hits": self.hits,
+                "bounce_depths": self.bounce_depths(), "times": self.times, "wall_time": self.wall_time,
+                "rays_per_second": total / self.wall_time if self.wall_time > 0 else None}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def timed(stats, stage, function, *args):
+    # returns function(*args), timed in stats if given (for calls per batch, scalar code checks stats itself)
+    if stats is None:
+        return function(*args)
+    return stats.timed(stage, function, *args)
@@ -0,0 +1,344 @@
+import numpy as np
+
+from base.geometries import Vector, batch_dot
+
+# maximal number of ray triangle tests computed at once by TriangleStore
+BATCH_TESTS = 1 << 18
+
+
+class SphereStore:
+    # struct-of-arrays representation of spheres used at render time
+    # (Sphere objects are only used to describe a scene)
+    def __init__(self, centers, radii, material_ids, colors):
+        self.centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        self.radii = np.asarray(radii, dtype=float)
+        # index into the material list of the scene (-1 for spheres without material)
+        self.material_ids = np.asarray(material_ids, dtype=int)
+        self.colors = np.asarray(colors, dtype=float).reshape(-1, 3)
+
+        # plain lists are much faster than NumPy arrays for hitting single rays
+        self._lists = None
+
+    def __len__(self):
+        return len(self.radii)
+
+    @staticmethod
+    def from_spheres(spheres, material_ids):
+        return SphereStore([s.position.to_array() for s in spheres], [s.radius for s in spheres], material_ids,
+                           [s.color.to_array() for s in spheres])
+
+    @staticmethod
+    def concatenate(stores):
+        return SphereStore(np.concatenate([s.centers for s in stores]), np.concatenate([s.radii for s in stores]),
+                           np.concatenate([s.material_ids for s in stores]), np.concatenate([s.colors for s in stores]))
+
+    def bounding_boxes(self):
+        # radius may be negative for hollow spheres
+        r = np.abs(self.radii)[:, None]
+        return self.centers - r, self.centers + r
+
+    def _as_lists(self):
+        if self._lists is None:
+            self._lists = (self.centers.tolist(), self.radii.tolist(),
+                           [Vector(*color) for color in self.colors.tolist()])
+        return self._lists
+
+    def hit(self, i, ray, t_min, t_max):
+        # same as Sphere.hit for sphere i, but returns the material index instead of the material
+        centers, radii, colors = self._as_lists()
+        cx, cy, cz = centers[i]
+        radius = radii[i]
+        o, d = ray.origin, ray.direction
+
+        px, py, pz = o.x - cx, o.y - cy, o.z - cz
+        a = d.x * d.x + d.y * d.y + d.z * d.z
+        half_b = px * d.x + py * d.y + pz * d.z
+        c = px * px + py * py + pz * pz - radius * radius
+
+        discriminant = half_b * half_b - a * c
+        if discriminant < 0:
+            return None
+        sqrtd = discriminant ** .5
+        t = (-half_b - sqrtd) / a
+        if t < t_min or t > t_max:
+            t = (-half_b + sqrtd) / a
+            if t < t_min or t > t_max:
+                return None
+
+        pos = Vector(o.x + d.x * t, o.y + d.y * t, o.z + d.z * t)
+        norm = Vector((pos.x - cx) / radius, (pos.y - cy) / radius, (pos.z - cz) / radius)
+        # <= because norm should point out if norm and ray are orthogonal
+        front_face = norm * d <= 0
+        return t, pos, norm if front_face else norm * -1, front_face, colors[i], self.material_ids[i]
+
+    def occludes(self, i, ray, t_min, t_max):
+        # returns if sphere i is hit by ray within [t_min, t_max] (see RenderObject.occludes)
+        centers, radii, _ = self._as_lists()
+        cx, cy, cz = centers[i]
+        o, d = ray.origin, ray.direction
+        px, py, pz = o.x - cx, o.y - cy, o.z - cz
+        a = d.x * d.x + d.y * d.y + d.z * d.z
+        half_b = px * d.x + py * d.y + pz * d.z
+        discriminant = half_b * half_b - a * (px * px + py * py + pz * pz - radii[i] * radii[i])
+        if discriminant < 0:
+            return False
+        sqrtd = discriminant ** .5
+        t = (-half_b - sqrtd) / a
+        if t_min <= t <= t_max:
+            return True
+        t = (-half_b + sqrtd) / a
+        return t_min <= t <= t_max
+
+    def occluded_batch(self, spheres, origins, directions, t_min, t_max, occluded):
+        # marks rays hitting any of the given spheres within [t_min, t_max] (array per ray) in occluded (in place)
+        a = batch_dot(directions, directions)
+        for i in spheres:
+            pointer = origins - self.centers[i]
+            half_b = batch_dot(pointer, directions)
+            discriminant = half_b ** 2 - a * (batch_dot(pointer, pointer) - self.radii[i] ** 2)
+            sqrtd = np.sqrt(np.maximum(discriminant, 0))
+            t_near, t_far = (-half_b - sqrtd) / a, (-half_b + sqrtd) / a
+            occluded |= (discriminant >= 0) & (((t_near >= t_min) & (t_near <= t_max))
+                                               | ((t_far >= t_min) & (t_far <= t_max)))
+
+    def hit_batch(self, spheres, origins, directions, t_min, t_best, index):
+        # intersects rays with the given spheres one after another and stores closer hits
+        # in t_best and index (arrays are updated in place)
+        a = batch_dot(directions, directions)
+        for i in spheres:
+            pointer = origins - self.centers[i]
+            half_b = batch_dot(pointer, directions)
+            c = batch_dot(pointer, pointer) - self.radii[i] ** 2
+
+            discriminant = half_b ** 2 - a * c
+            sqrtd = np.sqrt(np.maximum(discriminant, 0))
+
+            t = (-half_b - sqrtd) / a
+            valid = (t >= t_min) & (t <= t_best)
+            t_far = (-half_b + sqrtd) / a
+            t = np.where(valid, t, t_far)
+            valid |= (t_far >= t_min) & (t_far <= t_best)
+
+            closer = (discriminant >= 0) & valid & (t < t_best)
+            t_best[closer] = t[closer]
+            index[closer] = i
+
+    def normals(self, index, pos):
+        # returns outward normals of spheres at positions on their surfaces
+        return (pos - self.centers[index]) / self.radii[index, None]
+
+
+class PlaneStore:
+    # struct-of-arrays representation of planes (points on them and unit normals), planes are unbounded and
+    # are tested against all rays instead of being part of the bounding volume hierarchy
+    def __init__(self, points, normals):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 3)
+        self.normals = np.asarray(normals, dtype=float).reshape(-1, 3)
+
+    def __len__(self):
+        return len(self.points)
+
+    @staticmethod
+    def from_planes(planes):
+        return PlaneStore([p.position.to_array() for p in planes], [p.normal.to_array() for p in planes])
+
+    def intersect(self, i, origins, directions):
+        # returns ray parameters of the hits of plane i (inf for rays parallel to it)
+        denominator = directions @ self.normals[i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (self.points[i] - origins) @ self.normals[i] / denominator
+        return np.where(denominator != 0, t, np.inf)
+
+    def hit_batch(self, planes, origins, directions, t_min, t_best, index, offset):
+        # like SphereStore.hit_batch for the given planes, index stores offset + plane index
+        for i in planes:
+            t = self.intersect(i, origins, directions)
+            closer = (t >= t_min) & (t < t_best)
+            t_best[closer] = t[closer]
+            index[closer] = offset + i
+
+    def occluded_batch(self, planes, origins, directions, t_min, t_max, occluded):
+        # like SphereStore.occluded_batch for the given planes
+        for i in planes:
+            t = self.intersect(i, origins, directions)
+            occluded |= (t >= t_min) & (t <= t_max)
+
+    def surface_normals(self, index, pos):
+        # returns normals of planes (pointing to the side the plane normal points to)
+        return self.normals[index]
+
+
+class DiskStore(PlaneStore):
+    # struct-of-arrays representation of disks: planes limited to radius around their points (centers)
+    def __init__(self, centers, normals, radii):
+        super().__init__(centers, normals)
+        self.radii = np.asarray(radii, dtype=float)
+
+    @staticmethod
+    def from_disks(disks):
+        return DiskStore([d.position.to_array() for d in disks], [d.normal.to_array() for d in disks],
+                         [d.radius for d in disks])
+
+    def bounding_boxes(self):
+        # extent of a disk along an axis is its radius times the sine of the angle between normal and axis
+        extent = self.radii[:, None] * np.sqrt(np.maximum(1 - self.normals ** 2, 0))
+        return self.points - extent, self.points + extent
+
+    def intersect(self, i, origins, directions):
+        # returns ray parameters of the hits of disk i (inf for rays missing it)
+        t = super().intersect(i, origins, directions)
+        finite = np.isfinite(t)
+        pointer = np.zeros_like(origins)
+        pointer[finite] = origins[finite] + directions[finite] * t[finite, None] - self.points[i]
+        return np.where(finite & (batch_dot(pointer, pointer) <= self.radii[i] ** 2), t, np.inf)
+
+
+class BoxStore:
+    # struct-of-arrays representation of axis-aligned boxes given by their minimum and maximum corners
+    def __init__(self, minima, maxima):
+        self.minima = np.asarray(minima, dtype=float).reshape(-1, 3)
+        self.maxima = np.asarray(maxima, dtype=float).reshape(-1, 3)
+
+    def __len__(self):
+        return len(self.minima)
+
+    @staticmethod
+    def from_boxes(boxes):
+        return BoxStore([b.minimum.to_array() for b in boxes], [b.maximum.to_array() for b in boxes])
+
+    def bounding_boxes(self):
+        return self.minima, self.maxima
+
+    def intersect(self, i, origins, directions):
+        # returns ray parameters entering and leaving box i by the slab test (entering > leaving for misses)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_directions = 1 / directions
+            t0 = (self.minima[i] - origins) * inv_directions
+            t1 = (self.maxima[i] - origins) * inv_directions
+        return np.max(np.fmin(t0, t1), axis=1), np.min(np.fmax(t0, t1), axis=1)
+
+    def hit_batch(self, boxes, origins, directions, t_min, t_best, index, offset):
+        # like SphereStore.hit_batch for the given boxes (rays starting inside a box hit it where they leave it),
+        # index stores offset + box index
+        for i in boxes:
+            t_near, t_far = self.intersect(i, origins, directions)
+            t = np.where(t_near >= t_min, t_near, t_far)
+            closer = (t_near <= t_far) & (t >= t_min) & (t < t_best)
+            t_best[closer] = t[closer]
+            index[closer] = offset + i
+
+    def occluded_batch(self, boxes, origins, directions, t_min, t_max, occluded):
+        # like SphereStore.occluded_batch for the given boxes
+        for i in boxes:
+            t_near, t_far = self.intersect(i, origins, directions)
+            t = np.where(t_near >= t_min, t_near, t_far)
+            occluded |= (t_near <= t_far) & (t >= t_min) & (t <= t_max)
+
+    def surface_normals(self, index, pos):
+        # returns outward normals of boxes at positions on their surfaces: along the axis of the closest face
+        to_min, to_max = np.abs(pos - self.minima[index]), np.abs(pos - self.maxima[index])
+        axis = np.argmin(np.minimum(to_min, to_max), axis=1)
+        rows = np.arange(len(index))
+        normals = np.zeros((len(index), 3))
+        normals[rows, axis] = np.where(to_max[rows, axis] < to_min[rows, axis], 1., -1.)
+        return normals
+
+
+class TriangleStore:
+    # struct-of-arrays representation of triangles by a corner and the edges to the other two corners (as used by
+    # the Möller–Trumbore test) and unit normals (counter-clockwise corners seen from the front)
+    def __init__(self, vertices, faces):
+        corners = np.asarray(vertices, dtype=float).reshape(-1, 3)[np.asarray(faces, dtype=int).reshape(-1, 3)]
+        self.corners = corners[:, 0]
+        self.edges1 = corners[:, 1] - corners[:, 0]
+        self.edges2 = corners[:, 2] - corners[:, 0]
+        normals = np.cross(self.edges1, self.edges2)
+        length = np.linalg.norm(normals, axis=1)
+        # degenerate triangles are never hit, their normal doesn't matter
+        self.normals = normals / np.where(length > 0, length, 1)[:, None]
+        self._lists = None
+
+    def __len__(self):
+        return len(self.corners)
+
+    def bounding_boxes(self):
+        far1, far2 = self.corners + self.edges1, self.corners + self.edges2
+        return np.minimum(np.minimum(self.corners, far1), far2), np.maximum(np.maximum(self.corners, far1), far2)
+
+    def _as_lists(self):
+        if self._lists is None:
+            self._lists = (self.corners.tolist(), self.edges1.tolist(), self.edges2.tolist())
+        return self._lists
+
+    def hit(self, i, ray, t_min, t_max):
+        # returns ray parameter of the hit of triangle i within [t_min, t_max] and i (None for no hit)
+        corners, edges1, edges2 = self._as_lists()
+        cx, cy, cz = corners[i]
+        ax, ay, az = edges1[i]
+        bx, by, bz = edges2[i]
+        o, d = ray.origin, ray.direction
+
+        # p = d x edge2, determinant 0 for rays parallel to the triangle
+        px, py, pz = d.y * bz - d.z * by, d.z * bx - d.x * bz, d.x * by - d.y * bx
+        det = ax * px + ay * py + az * pz
+        if det == 0:
+            return None
+        inv = 1 / det
+        sx, sy, sz = o.x - cx, o.y - cy, o.z - cz
+        u = (sx * px + sy * py + sz * pz) * inv
+        if u < 0 or u > 1:
+            return None
+        qx, qy, qz = sy * az - sz * ay, sz * ax - sx * az, sx * ay - sy * ax
+        v = (d.x * qx + d.y * qy + d.z * qz) * inv
+        if v < 0 or u + v > 1:
+            return None
+        t = (bx * qx + by * qy + bz * qz) * inv
+        if t < t_min or t > t_max:
+            return None
+        return t, i
+
+    def occludes(self, i, ray, t_min, t_max):
+        return self.hit(i, ray, t_min, t_max) is not None
+
+    def intersect(self, triangles, origins, directions):
+        # returns (rays, triangles) array of ray parameters of the hits of the given triangles (inf for misses),
+        # all rays are tested against all triangles at once (computed by components, np.cross is slow for small
+        # arrays)
+        cx, cy, cz = self.corners[triangles].T
+        ax, ay, az = self.edges1[triangles].T
+        bx, by, bz = self.edges2[triangles].T
+        dx, dy, dz = directions[:, 0, None], directions[:, 1, None], directions[:, 2, None]
+        sx, sy, sz = origins[:, 0, None] - cx, origins[:, 1, None] - cy, origins[:, 2, None] - cz
+        px, py, pz = dy * bz - dz * by, dz * bx - dx * bz, dx * by - dy * bx
+        det = ax * px + ay * py + az * pz
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv = 1 / det
+            u = (sx * px + sy * py + sz * pz) * inv
+            qx, qy, qz = sy * az - sz * ay, sz * ax - sx * az, sx * ay - sy * ax
+            v = (dx * qx + dy * qy + dz * qz) * inv
+            t = (bx * qx + by * qy + bz * qz) * inv
+        return np.where((det != 0) & (u >= 0) & (v >= 0) & (u + v <= 1), t, np.inf)
+
+    def hit_batch(self, triangles, origins, directions, t_min, t_best, index):
+        # like SphereStore.hit_batch for the given triangles (rays are tested in chunks to bound memory)
+        triangles = np.asarray(triangles)
+        chunk = max(1, BATCH_TESTS // max(len(triangles), 1))
+        for start in range(0, len(origins), chunk):
+            rays = slice(start, start + chunk)
+            t = self.intersect(triangles, origins[rays], directions[rays])
+            t[t < t_min] = np.inf
+            closest = np.argmin(t, axis=1)
+            t = t[np.arange(len(t)), closest]
+            closer = t < t_best[rays]
+            t_best[rays][closer] = t[closer]
+            index[rays][closer] = triangles[closest[closer]]
+
+    def occluded_batch(self, triangles, origins, directions, t_min, t_max, occluded):
+        # like SphereStore.occluded_batch for the given triangles
+        triangles = np.asarray(triangles)
+        t_max = np.broadcast_to(t_max, len(origins))
+        chunk = max(1, BATCH_TESTS // max(len(triangles), 1))
+        for start in range(0, len(origins), chunk):
+            rays = slice(start, start + chunk)
+            t = self.intersect(triangles, origins[rays], directions[rays])
+            occluded[rays] |= np.any((t >= t_min) & (t <= t_max[rays, None]), axis=1)
@@ -0,0 +1,187 @@
+import copy
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from base import wavefront
+from base.denoise import AUXILIARY_SAMPLES, AuxiliaryBuffers, denoise
+from base.rendering import Framebuffer
+from base.stats import RenderStats, timed
+
+# edge length of square tiles in pixels (tiles at the right and top border may be smaller)
+TILE_SIZE = 32
+
+
+class Tile:
+    # rectangular part of an image covering pixels [x_start, x_end) x [y_start, y_end)
+    def __init__(self, index, x_start, x_end, y_start, y_end):
+        self.index = index
+        self.x_start = x_start
+        self.x_end = x_end
+        self.y_start = y_start
+        self.y_end = y_end
+
+        self.width = x_end - x_start
+        self.height = y_end - y_start
+
+
+class Progress:
+    # reports rendering progress in percent of finished tiles
+    def __init__(self, total, enabled=True):
+        self.total = total
+        self.done = 0
+        self.enabled = enabled
+
+    def update(self, count=1):
+        self.done += count
+        if self.enabled:
+            print(f"\r{self.done / self.total * 100:.2f}%", end="" if self.done < self.total else "\n", flush=True)
+
+
+def split_tiles(width, height, tile_size=TILE_SIZE):
+    # splits an image into tiles starting with the top rows (like the former row by row rendering)
+    tiles = []
+    for y_end in range(height, 0, -tile_size):
+        for x_start in range(0, width, tile_size):
+            tiles.append(Tile(len(tiles), x_start, min(x_start + tile_size, width), max(0, y_end - tile_size), y_end))
+    return tiles
+
+
+def tile_seeds(seed, count):
+    # returns an independent seed sequence for each tile, so the image only depends on seed and tiling
+    # (not on the number of workers or the order in which tiles are finished)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(count)
+
+
+# camera and scene of a worker process (sent once per worker instead of once per tile)
+_worker_state = None
+
+
+def _init_worker(camera, scene):
+    global _worker_state
+    _worker_state = camera, scene
+
+
+def _render_tile_colors(tile, seed, collect_stats=False):
+    # statistics of the worker process are returned with the tile (None if not collected)
+    camera, scene = _worker_state
+    stats = RenderStats() if collect_stats else None
+    colors, samples = camera.render_tile_colors(scene, tile, seed, stats)
+    # float32 like the framebuffer halves the data sent back
+    return tile, colors.astype(np.float32), samples, stats
+
+
+def render(camera, scene, workers=1, seed=None, progress=True, stream=None, tile_size=TILE_SIZE, stats=None):
+    # renders image of camera tile by tile in a pool of worker processes (or in this process for one worker),
+    # finished tiles are also written to stream (see ImageStream) if given, statistics of all tiles to stats
+    framebuffer = Framebuffer(camera.image_width, camera.image_height)
+    accumulate(camera, scene, framebuffer, workers, seed, progress, tile_size, stats, stream)
+    return finish(camera, scene, framebuffer, stats)
+
+
+def render_sweep(cameras, scene, workers=1, seed=None, progress=True, streams=None, stats=None):
+    # renders cameras differing only in samples_per_pixel and max_bounce_depth (equal Camera.view_key) as one render:
+    # each pass adds the samples missing for the camera with the next larger number of samples to the same
+    # framebuffer, so the samples of a camera are the first samples of those with more (instead of all samples
+    # being taken again for every camera), paths are traced to the largest depth and the light gathered up to the
+    # depth of each camera is kept in a layer of the framebuffer (see Camera.depth_sweep),
+    # yields index and image of each camera as soon as its samples are reached
+    # (streams and stats are lists with the ImageStream and RenderStats of each camera or None, the statistics of
+    # a camera include those of the passes before)
+    # a single camera is rendered like render, passes of more cameras keep antialiasing even with one sample
+    # (cameras with one sample per pixel are only swept with each other, see Scene.sweep_groups)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    streams = [None] * len(cameras) if streams is None else streams
+    stats = [None] * len(cameras) if stats is None else stats
+    order = sorted(range(len(cameras)), key=lambda i: cameras[i].samples_per_pixel)
+    depths = sorted({cam.max_bounce_depth for cam in cameras})
+    pass_camera = copy.copy(cameras[order[-1]])
+    pass_camera.force_antialiasing = pass_camera.samples_per_pixel > 1
+    pass_camera.max_bounce_depth = depths[-1]
+    layers = None
+    if len(depths) > 1:
+        pass_camera.depth_sweep = tuple(depths)
+        layers = len(depths)
+
+    framebuffer = Framebuffer(pass_camera.image_width, pass_camera.image_height, layers)
+    samples_per_pixel = 0
+    previous_stats = None
+    for i in order:
+        if stats[i] is not None and previous_stats is not None:
+            stats[i].merge(previous_stats)
+        pass_camera.samples_per_pixel = cameras[i].samples_per_pixel - samples_per_pixel
+        if pass_camera.samples_per_pixel > 0:
+            # tiles of each pass take the next seeds spawned from seed
+            accumulate(pass_camera, scene, framebuffer, workers, seed, progress, stats=stats[i], stream=streams[i])
+        samples_per_pixel = cameras[i].samples_per_pixel
+        previous_stats = stats[i]
+        # the image keeps a copy, the framebuffer is still added to by the next passes
+        snapshot = framebuffer.layer(depths.index(cameras[i].max_bounce_depth))
+        yield i, finish(cameras[i], scene, snapshot, stats[i])
+
+
+def finish(camera, scene, framebuffer, stats=None):
+    # returns image of a finished render, denoised if the camera denoises (the image keeps the auxiliary
+    # buffers guiding the denoiser then)
+    auxiliary = None
+    if camera.denoise:
+        auxiliary = timed(stats, "denoise", auxiliary_buffers, camera, scene)
+        framebuffer = timed(stats, "denoise", denoise, framebuffer, auxiliary)
+    image = timed(stats, "output", framebuffer.image, camera.exposure, camera.tone_mapping)
+    image.auxiliary = auxiliary
+    return image
+
+
+def auxiliary_buffers(camera, scene, samples_per_pixel=AUXILIARY_SAMPLES, tile_size=TILE_SIZE):
+    # returns features of the first hits of camera rays (see base.denoise.AuxiliaryBuffers), the camera samples
+    # of a fixed seed are taken, so they are the same for every render of a camera
+    scene.build()
+    auxiliary = AuxiliaryBuffers(camera.image_width, camera.image_height)
+    tiles = split_tiles(camera.image_width, camera.image_height, tile_size)
+    for tile, tile_seed in zip(tiles, tile_seeds(0, len(tiles))):
+        sampler = camera.create_sampler(tile_seed)
+        auxiliary.add(tile.x_start, tile.y_start,
+                      *wavefront.auxiliary_tile(camera, scene, tile, sampler, samples_per_pixel))
+    return auxiliary
+
+
+def accumulate(camera, scene, framebuffer, workers=1, seed=None, progress=True, tile_size=TILE_SIZE, stats=None,
+               stream=None):
+    # renders all tiles of camera once and adds summed up colors and number of samples of each pixel to framebuffer
+    # (see base.progressive), the pixels of finished tiles are written to stream if given
+    workers = os.cpu_count() if workers is None else workers
+    start = time.perf_counter()
+    # acceleration structure is built once before it is copied to the workers
+    scene.build()
+    tiles = split_tiles(camera.image_width, camera.image_height, tile_size)
+    seeds = tile_seeds(seed, len(tiles))
+    report = Progress(len(tiles), progress)
+
+    def add(tile, tile_colors, tile_samples, tile_stats=None):
+        framebuffer.add(tile.x_start, tile.y_start, tile_colors, tile_samples)
+        if stream is not None:
+            region = np.s_[tile.y_start:tile.y_end, tile.x_start:tile.x_end]
+            # depth sweeps show the light of all bounces
+            colors = framebuffer.colors[region] if camera.depth_sweep is None else framebuffer.colors[region][:, :, -1]
+            timed(stats, "output", stream.write_tile, tile.x_start, tile.y_start,
+                  camera.write_colors(colors, framebuffer.samples[region]))
+        if tile_stats is not None:
+            stats.merge(tile_stats)
+        report.update()
+
+    if workers <= 1:
+        for tile, tile_seed in zip(tiles, seeds):
+            add(tile, *camera.render_tile_colors(scene, tile, tile_seed, stats))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(camera, scene)) as pool:
+            futures = [pool.submit(_render_tile_colors, tile, tile_seed, stats is not None)
+                       for tile, tile_seed in zip(tiles, seeds)]
+            for future in as_completed(futures):
+                add(*future.result())
+    if stats is not None:
+        stats.wall_time += time.perf_counter() - start
@@ -0,0 +1,214 @@
+import numpy as np
+
+from base.geometries import batch_dot, batch_normalize
+from base.lights import mis_weight
+from base.sampling import CAMERA_DIMENSIONS
+from base.stats import timed
+
+# maximal number of rays traced together
+BATCH_SIZE = 1 << 16
+
+
+def trace(camera, scene, origins, directions, sampler, stats=None):
+    # traces rays bounce by bounce (like Camera.ray_color for single rays)
+    # and returns the gathered color of each ray as (N, 3) array (statistics are added to stats if given),
+    # with camera.depth_sweep as (N, layers, 3) array of the colors gathered up to each depth
+    colors = np.zeros((len(origins), 3))
+    layers = []
+    # attenuation gathered along the path of each active ray
+    throughput = np.ones((len(origins), 3))
+    # indices of rays still bouncing
+    active = np.arange(len(origins))
+    # scatter densities of the previous hits whose lights were sampled too (0 otherwise)
+    scatter_pdf = np.zeros(len(origins))
+    scene.build()
+    light_sampling = camera.light_sampling and len(scene.lights) > 0
+
+    background_low = camera.background_gradient[0].to_array()
+    background_high = camera.background_gradient[1].to_array()
+
+    for bounce in range(camera.max_bounce_depth):
+        if len(active) == 0:
+            break
+        if stats is not None:
+            stats.add_rays(bounce, len(active))
+        t, pos, norm, front_face, material_ids, index = timed(stats, "hit", scene.hit_batch, origins, directions,
+                                                              camera.t_min, camera.t_max, stats)
+
+        # rays hitting nothing gather the background gradient
+        missed = index < 0
+        if np.any(missed):
+            unit_y = batch_normalize(directions[missed])[:, 1]
+            s = (.5 * (unit_y + 1))[:, None]
+            colors[active[missed]] += throughput[missed] * (background_low * (1 - s) + background_high * s)
+
+        hit = ~missed
+        pos, norm, front_face, material_ids, index = pos[hit], norm[hit], front_face[hit], material_ids[hit], index[hit]
+        origins, directions, throughput, active = origins[hit], directions[hit], throughput[hit], active[hit]
+        scatter_pdf = scatter_pdf[hit]
+        if stats is not None and np.any(material_ids < 0):
+            stats.add_hits(None, np.count_nonzero(material_ids < 0))
+
+        # emission of hit objects (weighted if it could have been found by light sampling at the previous hit)
+        emitted = scene.emitted_batch(material_ids, index)
+        weighted = (scatter_pdf > 0) & np.any(emitted != 0, axis=1)
+        if np.any(weighted):
+            light_pdf = scene.lights.pdf_batch(origins[weighted], batch_normalize(directions[weighted]))
+            emitted[weighted] *= mis_weight(scatter_pdf[weighted], light_pdf)[:, None]
+        colors[active] += throughput * emitted
+
+        # spheres without material don't scatter
+        scattered = np.zeros(len(active), dtype=bool)
+        attenuation = np.empty((len(active), 3))
+        new_directions = np.empty((len(active), 3))
+        scatter_pdf = np.zeros(len(active))
+        # lights aren't sampled at the last bounce (see Camera.ray_color)
+        sample = light_sampling and bounce + 1 < camera.max_bounce_depth
+        light = np.zeros((len(active), 3))
+
+        # masked scattering: each material scatters the rays that hit it at once
+        for j, material in enumerate(scene.materials):
+            mask = material_ids == j
+            if not np.any(mask):
+                continue
+            if stats is not None:
+                stats.add_hits(material, np.count_nonzero(mask))
+            scatter_dir, scatter_attenuation, scatter_mask = timed(
+                stats, "scatter", material.scatter_batch, directions[mask], pos[mask], norm[mask], front_face[mask],
+                sampler)
+            new_directions[mask] = scatter_dir
+            attenuation[mask] = scatter_attenuation
+            scattered[mask] = scatter_mask
+
+            pdf = material.scatter_pdf_batch(norm[mask], scatter_dir) if sample else None
+            if pdf is not None:
+                scatter_pdf[mask] = pdf
+                light[mask] = throughput[mask] * timed(stats, "light", sample_lights, camera, scene, pos[mask],
+                                                       norm[mask], material, sampler, stats)
+
+        # the colors gathered up to this depth don't include the sampled light (see Camera.ray_color)
+        if camera.depth_sweep is not None and bounce + 1 in camera.depth_sweep:
+            layers.append(colors.copy())
+        colors[active] += light
+
+        origins, directions = pos[scattered], new_directions[scattered]
+        throughput = throughput[scattered] * attenuation[scattered]
+        active, scatter_pdf = active[scattered], scatter_pdf[scattered]
+
+        # russian roulette (see Camera.ray_color)
+        if camera.russian_roulette_depth is not None and bounce + 1 >= camera.russian_roulette_depth:
+            survival = np.minimum(np.max(throughput, axis=1), 1)
+            survived = sampler.uniforms(len(active)) < survival
+            origins, directions, active = origins[survived], directions[survived], active[survived]
+            throughput = throughput[survived] / survival[survived, None]
+            scatter_pdf = scatter_pdf[survived]
+    if camera.depth_sweep is None:
+        return colors
+    # paths ending before a depth gathered all their light
+    return np.stack(layers + [colors] * (len(camera.depth_sweep) - len(layers)), axis=1)
+
+
+def sample_lights(camera, scene, pos, norm, material, sampler, stats=None):
+    # batched version of Camera.sample_light for (N, 3) positions and normals of hits with material,
+    # returns light arriving at each position as (N, 3) array
+    light = np.zeros((len(pos), 3))
+    directions, valid = scene.lights.sample_batch(pos, sampler)
+    valid &= batch_dot(directions, norm) > 0
+    pos, norm, directions = pos[valid], norm[valid], directions[valid]
+
+    # shadow rays: light of the first objects hit arrives
+    if stats is not None:
+        stats.shadow_rays += len(pos)
+    _, _, _, _, material_ids, index = scene.hit_batch(pos, directions, camera.t_min, camera.t_max, stats)
+    emitted = scene.emitted_batch(material_ids, index)
+    light_pdf = scene.lights.pdf_batch(pos, directions)
+    weight = np.zeros(len(pos))
+    found = light_pdf > 0
+    weight[found] = (mis_weight(light_pdf[found], material.scatter_pdf_batch(norm[found], directions[found]))
+                     / light_pdf[found])
+    light[valid] = material.evaluate_batch(norm, directions) * emitted * weight[:, None]
+    return light
+
+
+def render_tile(camera, scene, tile, sampler, batch_size=BATCH_SIZE, stats=None):
+    # returns summed up colors of all samples for the pixels of the tile as (height, width, 3) array
+    # ((height, width, layers, 3) with camera.depth_sweep) and number of samples of each pixel as (height, width) array
+    ys, xs = np.mgrid[tile.y_end - 1:tile.y_start - 1:-1, tile.x_start:tile.x_end]
+    xs, ys = xs.ravel(), ys.ravel()
+    layers = 1 if camera.depth_sweep is None else len(camera.depth_sweep)
+    colors = np.zeros((len(xs), layers, 3))
+    samples = np.zeros(len(xs), dtype=int)
+    # sums of luminance and squared luminance of samples for adaptive sampling
+    luminance_sum = np.zeros(len(xs))
+    luminance_sq_sum = np.zeros(len(xs))
+
+    # non-adaptive rendering takes all samples of all pixels in one round,
+    # adaptive rendering adds min_samples samples to the pixels not converged yet in each round
+    # (camera samples are drawn at once, so samples of later rounds keep the distribution of the sampler)
+    step = camera.min_samples if camera.adaptive else camera.samples_per_pixel
+    camera_samples = sampler.pixel_samples(len(xs), camera.samples_per_pixel)
+    rays = camera.primary_rays(tile)
+    active = np.arange(len(xs))
+    while len(active) > 0:
+        first = samples[active[0]]
+        count = min(step, camera.samples_per_pixel - first)
+        # pixels traced together in a batch
+        pixels = max(1, batch_size // count)
+        for start in range(0, len(active), pixels):
+            batch = active[start:start + pixels]
+            batch_samples = camera_samples[batch, first:first + count].reshape(-1, CAMERA_DIMENSIONS)
+            origins, directions = timed(stats, "get_ray", rays.batch, np.repeat(xs[batch], count),
+                                        np.repeat(ys[batch], count), batch_samples)
+            sample_colors = trace(camera, scene, origins, directions, sampler, stats).reshape(len(batch), count,
+                                                                                             layers, 3)
+            colors[batch] += sample_colors.sum(axis=1)
+            # adaptive sampling looks at the light of all bounces
+            luminance = camera.luminance(sample_colors[:, :, -1])
+            luminance_sum[batch] += luminance.sum(axis=1)
+            luminance_sq_sum[batch] += (luminance * luminance).sum(axis=1)
+        samples[active] += count
+
+        active = active[samples[active] < camera.samples_per_pixel]
+        if camera.adaptive:
+            active = active[~camera.converged(luminance_sum[active], luminance_sq_sum[active], samples[active])]
+
+    # pixels were traced from the top row, arrays are indexed from the bottom row
+    colors = colors.reshape(tile.height, tile.width, layers, 3)[::-1]
+    return colors if camera.depth_sweep is not None else colors[:, :, 0], samples.reshape(tile.height, tile.width)[::-1]
+
+
+def auxiliary_tile(camera, scene, tile, sampler, samples_per_pixel):
+    # returns features of the first hits of samples_per_pixel camera rays per pixel of the tile (see
+    # base.denoise.AuxiliaryBuffers) as mean albedo (height, width, 3), normal (height, width, 3) and
+    # depth (height, width) arrays
+    ys, xs = np.mgrid[tile.y_end - 1:tile.y_start - 1:-1, tile.x_start:tile.x_end]
+    camera_samples = sampler.pixel_samples(xs.size, samples_per_pixel).reshape(-1, CAMERA_DIMENSIONS)
+    origins, directions = camera.primary_rays(tile).batch(np.repeat(xs.ravel(), samples_per_pixel),
+                                                          np.repeat(ys.ravel(), samples_per_pixel), camera_samples)
+    t, _, norm, _, material_ids, index = scene.hit_batch(origins, directions, camera.t_min, camera.t_max)
+    hit = index >= 0
+
+    # missed rays see the background, spheres without material and emissive ones their (emitted) color,
+    # transmissive materials have no albedo and are white
+    albedo = np.ones((len(index), 3))
+    unit_y = batch_normalize(directions[~hit])[:, 1]
+    s = (.5 * (unit_y + 1))[:, None]
+    albedo[~hit] = camera.background_gradient[0].to_array() * (1 - s) + camera.background_gradient[1].to_array() * s
+    plain = hit & (material_ids < 0)
+    albedo[plain] = scene.colors[index[plain]]
+    for j, material in enumerate(scene.materials):
+        mask = material_ids == j
+        if hasattr(material, "albedo"):
+            albedo[mask] = material.albedo.to_array()
+        elif np.any(material.emitted().to_array() != 0):
+            albedo[mask] = material.emitted().to_array()
+    albedo = np.clip(albedo, 0, 1)
+    depth = np.where(hit, t, 0) * np.linalg.norm(directions, axis=1)
+
+    def pixel_mean(values):
+        return values.reshape(tile.height, tile.width, samples_per_pixel, -1).mean(axis=2)[::-1]
+
+    # depth is averaged over the rays hitting something
+    hits = pixel_mean(hit[:, None].astype(float))[..., 0]
+    depth = pixel_mean(depth[:, None])[..., 0] / np.maximum(hits, 1 / samples_per_pixel)
+    return pixel_mean(albedo), pixel_mean(norm), depth
@@ -0,0 +1,52 @@
+import time
+
+import numpy as np
+
+from scenes import scene9, scene10
+
+# image width of the workloads (scene9 and scene10 are rendered at 1920)
+WIDTH = 128
+# maximal samples per pixel
+SAMPLES_PER_PIXEL = 64
+
+
+def render(camera, scene, adaptive):
+    # renders with fixed or adaptive sampling and returns image, traced rays and time
+    camera.set_image_width(WIDTH)
+    camera.samples_per_pixel = SAMPLES_PER_PIXEL
+    camera.min_samples = min(camera.min_samples, SAMPLES_PER_PIXEL)
+    camera.adaptive = adaptive
+
+    # counts rays of all bounces passed to the scene
+    rays = [0]
+    hit_batch = scene.hit_batch
+
+    def counting_hit_batch(origins, directions, t_min, t_max, stats=None):
+        rays[0] += len(origins)
+        return hit_batch(origins, directions, t_min, t_max, stats)
+
+    scene.hit_batch = counting_hit_batch
+    start = time.perf_counter()
+    image = camera.render(scene, workers=1, seed=1, progress=False)
+    elapsed = time.perf_counter() - start
+    del scene.hit_batch
+    return image, rays[0], elapsed
+
+
+def main():
+    for name, module in [("scene9", scene9), ("scene10", scene10)]:
+        camera = module.cam0
+        camera.render_mode = "wavefront"
+        fixed, fixed_rays, fixed_time = render(camera, module.scene, False)
+        adaptive, adaptive_rays, adaptive_time = render(camera, module.scene, True)
+
+        difference = np.abs(adaptive.image_list - fixed.image_list)
+        print(f"{name} {WIDTH}x{camera.image_height}, threshold {camera.noise_threshold}:")
+        print(f"  fixed:    {fixed.samples.sum():>9} camera rays {fixed_rays:>10} rays {fixed_time:.2f}s")
+        print(f"  adaptive: {adaptive.samples.sum():>9} camera rays {adaptive_rays:>10} rays {adaptive_time:.2f}s "
+              f"({adaptive_rays / fixed_rays:.1%} of rays, {adaptive.samples.mean():.1f} samples per pixel)")
+        print(f"  mean/max pixel difference to fixed sampling: {difference.mean():.2f}/{difference.max()}")
+
+
+if __name__ == "__main__":
+    main()
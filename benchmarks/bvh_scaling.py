@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+
+from base.geometries import Ray, Vector
+from base.objects import Scene, Sphere
+
+# scene sizes (number of random spheres) and number of random rays traced per size
+SIZES = [20, 100, 1000, 10000, 100000]
+RAYS = 1000
+# linear search over all objects is only timed up to this size (it would take minutes above)
+MAX_LINEAR_SIZE = 10000
+
+
+def random_scene(n, rng):
+    # spheres in a cube growing with n, so density (and hits per ray) stays about the same
+    size = 10 * n ** (1 / 3)
+    scene = Scene("bvh")
+    for center, radius in zip(rng.uniform(-size, size, (n, 3)), rng.uniform(.5, 1.5, n)):
+        scene.add_render_object(Sphere(Vector(*center), radius))
+    return scene, size
+
+
+def linear_hit(scene, ray, t_min, t_max):
+    # former Scene.hit testing every render object
+    result = None
+    for obj in scene.render_objects:
+        result_obj = obj.hit(ray, t_min, t_max)
+        if result_obj is not None:
+            if result is None or result_obj[0] < result[0]:
+                result = result_obj
+    return result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'spheres':>8} {'build [s]':>10} {'bvh [us/ray]':>13} {'linear [us/ray]':>16}")
+    for n in SIZES:
+        scene, size = random_scene(n, rng)
+        rays = [Ray(Vector(*o), Vector(*d))
+                for o, d in zip(rng.uniform(-size, size, (RAYS, 3)), rng.normal(size=(RAYS, 3)))]
+
+        start = time.perf_counter()
+        scene.build()
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for ray in rays:
+            scene.hit(ray, .001, float("inf"))
+        bvh_time = (time.perf_counter() - start) / RAYS * 1e6
+
+        linear_time = float("nan")
+        if n <= MAX_LINEAR_SIZE:
+            start = time.perf_counter()
+            for ray in rays:
+                linear_hit(scene, ray, .001, float("inf"))
+            linear_time = (time.perf_counter() - start) / RAYS * 1e6
+        print(f"{n:>8} {build_time:>10.3f} {bvh_time:>13.1f} {linear_time:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
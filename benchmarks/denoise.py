@@ -0,0 +1,55 @@
+import copy
+import time
+
+import numpy as np
+
+from base import jit, tiles
+from base.denoise import denoise
+from scenes import scene7, scene8, scene9, scene10
+
+# image width of the workload, samples per pixel of the denoised and noisy renders and of the reference
+WIDTH = 160
+DENOISED_SAMPLES = (8, 16)
+NOISY_SAMPLES = 64
+REFERENCE_SAMPLES = 256
+
+
+def error(colors, reference):
+    # rmse of gamma corrected colors (as displayed, clipped to 0 to 1)
+    return float(np.sqrt(np.mean((np.sqrt(np.clip(colors, 0, 1)) - np.sqrt(np.clip(reference, 0, 1))) ** 2)))
+
+
+def render(camera, scene, samples_per_pixel, seed):
+    # returns framebuffer and seconds of a render with samples_per_pixel (all CPUs)
+    camera.samples_per_pixel = samples_per_pixel
+    camera.min_samples = min(camera.min_samples, samples_per_pixel)
+    start = time.perf_counter()
+    framebuffer = tiles.render(camera, scene, None, seed, False).framebuffer
+    return framebuffer, time.perf_counter() - start
+
+
+def main():
+    # denoised renders with few samples compared with a noisy render with many samples, errors against a
+    # reference with even more samples (the reference has some noise left, errors below its noise can't be seen)
+    mode = "jit" if jit.AVAILABLE else "wavefront"
+    print(f"{WIDTH} pixels width, {mode} renders, rmse against {REFERENCE_SAMPLES} samples per pixel:")
+    print(f"{'scene':>8} {'samples':>8} {'render [s]':>11} {'denoise [s]':>12} {'noisy':>7} {'denoised':>9}")
+    for name, scene in [("scene7", scene7.scene), ("scene8", scene8.scene), ("scene9", scene9.scene),
+                        ("scene10", scene10.scene)]:
+        camera = copy.copy(scene.cameras[-1])
+        camera.set_image_width(WIDTH)
+        camera.render_mode = mode
+        reference, _ = render(camera, scene, REFERENCE_SAMPLES, 0)
+        reference = reference.mean()
+
+        for samples_per_pixel in DENOISED_SAMPLES + (NOISY_SAMPLES,):
+            framebuffer, seconds = render(camera, scene, samples_per_pixel, 1)
+            start = time.perf_counter()
+            denoised = denoise(framebuffer, tiles.auxiliary_buffers(camera, scene))
+            denoise_seconds = time.perf_counter() - start
+            print(f"{name:>8} {samples_per_pixel:>8} {seconds:>11.2f} {denoise_seconds:>12.2f} "
+                  f"{error(framebuffer.mean(), reference):>7.4f} {error(denoised.mean(), reference):>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import copy
+import time
+
+from base import jit, tiles
+from base.geometries import Vector
+from base.objects import Plane, Sphere
+from base.stats import RenderStats
+from scenes import scene7, scene9, scene10
+
+# image width and samples per pixel of the workload, times are the best of REPEAT renders
+WIDTH = 160
+SAMPLES_PER_PIXEL = 8
+REPEAT = 3
+
+
+def ground_sphere(scene):
+    # returns copy of scene with its ground plane replaced by the sphere of radius 1000 the scenes used before
+    scene = copy.copy(scene)
+    scene.render_objects = [Sphere(Vector(0, -1005, -2), 1000, color=obj.color, material=obj.material)
+                            if type(obj) is Plane else obj for obj in scene.render_objects]
+    scene.bvh = None
+    return scene
+
+
+def main():
+    # a huge ground sphere has a bounding box overlapping the whole scene, so nearly every ray visits it in the
+    # hierarchy, planes are tested once per ray up front and their hit limits the traversal
+    modes = ("wavefront", "jit") if jit.AVAILABLE else ("wavefront",)
+    print(f"{WIDTH} pixels width, {SAMPLES_PER_PIXEL} samples per pixel:")
+    print(f"{'scene':>8} {'mode':>10} {'ground':>7} {'tests per ray':>14} {'time [s]':>9}")
+    for name, module in [("scene7", scene7), ("scene9", scene9), ("scene10", scene10)]:
+        for ground, scene in [("sphere", ground_sphere(module.scene)), ("plane", module.scene)]:
+            camera = copy.copy(scene.cameras[-1])
+            camera.set_image_width(WIDTH)
+            camera.samples_per_pixel = SAMPLES_PER_PIXEL
+            for mode in modes:
+                camera.render_mode = mode
+                # the first jit render compiles the kernels (cached on disk for later runs)
+                if mode == "jit":
+                    tiles.render(camera, scene, 1, 0, False)
+                seconds = []
+                for _ in range(REPEAT):
+                    start = time.perf_counter()
+                    tiles.render(camera, scene, 1, 0, False)
+                    seconds.append(time.perf_counter() - start)
+                stats = RenderStats()
+                tiles.render(camera, scene, 1, 0, False, stats=stats)
+                rays = sum(stats.rays)
+                print(f"{name:>8} {mode:>10} {ground:>7} {stats.intersection_tests / rays:>14.2f} {min(seconds):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
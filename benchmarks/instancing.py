@@ -0,0 +1,83 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+from base import jit, tiles
+from base.geometries import Vector, rotation, scaling, translation
+from base.materials import DiffuseMaterial
+from base.objects import Camera, Instance, Plane, Scene, TriangleMesh
+from benchmarks.mesh_loading import sphere_mesh
+
+# numbers of placed meshes, copies are only placed up to COPIES (each copy holds its own triangles and hierarchy)
+COUNTS = (1, 10, 100, 1000, 10000)
+COPIES = 100
+# rows of the sphere mesh (4 * ROWS * ROWS triangles), image width and samples per pixel of the renders
+ROWS = 50
+WIDTH = 64
+SAMPLES_PER_PIXEL = 4
+
+
+def placements(count):
+    # returns matrices placing count meshes as flattened, rotated spheres on a grid in front of the camera
+    rng = np.random.default_rng(0)
+    side = int(np.ceil(np.sqrt(count)))
+    size = 20 / side
+    matrices = []
+    for k in range(count):
+        x, z = (k % side + .5) * size - 10, -(k // side + .5) * size - 5
+        matrices.append(translation(Vector(x, -4, z)) @ rotation(Vector(*rng.normal(size=3)), rng.uniform(0, 360))
+                        @ scaling(Vector(.4, .25, .25) * size))
+    return matrices
+
+
+def build_scene(count, instances):
+    # returns built scene of count instances of one mesh or of count meshes with transformed copies of the vertices
+    vertices, faces = sphere_mesh(ROWS)
+    material = DiffuseMaterial(Vector(.8, .3, .3))
+    scene = Scene("instancing")
+    scene.add_render_object(Plane(Vector(0, -5, 0), Vector(0, 1, 0), material=DiffuseMaterial(Vector(.5, .5, .5))))
+    mesh = TriangleMesh(vertices, faces, material=material)
+    for matrix in placements(count):
+        if instances:
+            scene.add_render_object(Instance(mesh, matrix))
+        else:
+            scene.add_render_object(TriangleMesh(vertices @ matrix[:3, :3].T + matrix[:3, 3], faces,
+                                                 material=material))
+    scene.build()
+    return scene
+
+
+def main():
+    # memory (peak of Python and NumPy allocations) and build time of the scenes and render time of one camera,
+    # memory of instances stays nearly flat as only their matrices are added, copies grow with their triangles
+    mode = "jit" if jit.AVAILABLE else "wavefront"
+    camera = Camera(16 / 9, WIDTH, 1, lookfrom=Vector(0, 6, 8), lookat=Vector(0, -4, -15), fov=90,
+                    samples_per_pixel=SAMPLES_PER_PIXEL, max_bounce_depth=8, render_mode=mode)
+    print(f"{4 * ROWS * ROWS} triangles per mesh, {WIDTH} pixels width, {SAMPLES_PER_PIXEL} samples per pixel, "
+          f"{mode} renders:")
+    print(f"{'meshes':>7} {'placed as':>10} {'memory [mb]':>12} {'build [s]':>10} {'render [s]':>11}")
+    if mode == "jit":
+        # compiles the kernels (cached on disk for later runs)
+        tiles.render(camera, build_scene(1, True), 1, 0, False)
+    for count in COUNTS:
+        for instances in (False, True):
+            if not instances and count > COPIES:
+                continue
+            # tracing allocations slows down the build, it's timed on its own
+            tracemalloc.start()
+            build_scene(count, instances)
+            memory = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+            start = time.perf_counter()
+            scene = build_scene(count, instances)
+            build = time.perf_counter() - start
+            start = time.perf_counter()
+            tiles.render(camera, scene, 1, 0, False)
+            render = time.perf_counter() - start
+            print(f"{count:>7} {'instances' if instances else 'copies':>10} {memory:>12.1f} {build:>10.2f} "
+                  f"{render:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
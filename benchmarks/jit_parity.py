@@ -0,0 +1,51 @@
+import copy
+import time
+
+import numpy as np
+
+from base import jit, tiles
+from scenes import scene7, scene9, scene10
+
+# image width and samples per pixel of the compared renders, the reference has REFERENCE_SAMPLES per pixel
+WIDTH = 64
+SAMPLES_PER_PIXEL = 64
+REFERENCE_SAMPLES = 512
+
+
+def render(camera, scene, mode, samples_per_pixel, seed):
+    # returns linear mean colors and seconds of a render of camera in mode
+    camera.render_mode = mode
+    camera.samples_per_pixel = samples_per_pixel
+    start = time.perf_counter()
+    image = tiles.render(camera, scene, 1, seed, False)
+    return image.framebuffer.mean(), time.perf_counter() - start
+
+
+def rmse(colors, reference):
+    return float(np.sqrt(np.mean((colors - reference) ** 2)))
+
+
+def main():
+    # jit and wavefront draw different random numbers, so their images only agree statistically: both should have
+    # the same error compared to a reference with many samples
+    if not jit.AVAILABLE:
+        print("Numba is not installed, render_mode=\"jit\" falls back to wavefront")
+    print(f"{WIDTH} pixels width, {SAMPLES_PER_PIXEL} samples per pixel, "
+          f"rmse against wavefront with {REFERENCE_SAMPLES} samples per pixel:")
+    print(f"{'scene':>8} {'mode':>10} {'time [s]':>9} {'rmse':>8} {'mean color':>26}")
+    for name, scene in [("scene7", scene7.scene), ("scene9", scene9.scene), ("scene10", scene10.scene)]:
+        camera = copy.copy(scene.cameras[-1])
+        camera.set_image_width(WIDTH)
+        if not jit.supported(camera, scene):
+            print(f"{name:>8} not supported by jit, falls back to wavefront")
+        reference, _ = render(camera, scene, "wavefront", REFERENCE_SAMPLES, 0)
+        # the first jit render compiles the kernels (cached on disk for later runs)
+        render(camera, scene, "jit", 1, 1)
+        for mode in ("wavefront", "jit"):
+            colors, seconds = render(camera, scene, mode, SAMPLES_PER_PIXEL, 1)
+            mean = np.array2string(colors.mean(axis=(0, 1)), precision=4)
+            print(f"{name:>8} {mode:>10} {seconds:>9.2f} {rmse(colors, reference):>8.4f} {mean:>26}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+
+from base import tiles
+from base.rendering import Framebuffer
+from scenes.scene10 import cam0, scene
+
+# image width of the workload (scene10 is rendered at 1920)
+WIDTH = 64
+# samples per pixel of the reference image (rendered with light sampling)
+REFERENCE_SAMPLES = 1024
+SAMPLES = (4, 16, 64)
+
+
+def render(camera, samples_per_pixel, light_sampling, seed):
+    # returns mean color of each pixel (linear, before gamma correction) and time
+    camera.samples_per_pixel = samples_per_pixel
+    camera.light_sampling = light_sampling
+    framebuffer = Framebuffer(camera.image_width, camera.image_height)
+    start = time.perf_counter()
+    tiles.accumulate(camera, scene, framebuffer, seed=seed, progress=False)
+    return framebuffer.mean(), time.perf_counter() - start
+
+
+def main():
+    cam0.set_image_width(WIDTH)
+    cam0.render_mode = "wavefront"
+    reference, elapsed = render(cam0, REFERENCE_SAMPLES, True, 0)
+    print(f"scene10 {cam0.image_width}x{cam0.image_height}, reference {REFERENCE_SAMPLES} samples per pixel "
+          f"{elapsed:.1f}s, mean {reference.mean():.4f}")
+
+    for samples_per_pixel in SAMPLES:
+        results = {}
+        for light_sampling in (False, True):
+            colors, elapsed = render(cam0, samples_per_pixel, light_sampling, samples_per_pixel)
+            rmse = np.sqrt(np.mean((colors - reference) ** 2))
+            results[light_sampling] = rmse, elapsed
+            print(f"{samples_per_pixel:>4} spp, light sampling {str(light_sampling):>5}: {elapsed:6.2f}s, "
+                  f"mean {colors.mean():.4f}, rmse {rmse:.4f}")
+        # noise falls with the square root of samples, so equal noise needs (rmse ratio)^2 times the samples
+        (rmse_path, time_path), (rmse_light, time_light) = results[False], results[True]
+        print(f"      equal noise: {time_path * (rmse_path / rmse_light) ** 2:.2f}s without light sampling, "
+              f"{time_light:.2f}s with light sampling")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from base.meshfile import load_mesh, write_obj, write_ply
+from base.stats import RenderStats
+
+# rows of the sphere meshes (2 * rows * rows * 2 triangles), number of random rays shot at each mesh
+ROWS = (50, 158, 500)
+RAYS = 100000
+
+
+def sphere_mesh(rows):
+    # returns vertices and triangles of a unit sphere of rows latitude and 2 * rows longitude segments
+    theta, phi = np.meshgrid(np.linspace(0, np.pi, rows + 1), np.linspace(0, 2 * np.pi, 2 * rows + 1)[:-1],
+                             indexing="ij")
+    vertices = np.stack([np.sin(theta) * np.cos(phi), np.cos(theta), np.sin(theta) * np.sin(phi)], axis=-1)
+    i, j = np.meshgrid(np.arange(rows), np.arange(2 * rows), indexing="ij")
+    a, b = i * 2 * rows + j, i * 2 * rows + (j + 1) % (2 * rows)
+    c, d = a + 2 * rows, b + 2 * rows
+    faces = np.concatenate([np.stack([a, c, b], axis=-1).reshape(-1, 3), np.stack([b, c, d], axis=-1).reshape(-1, 3)])
+    return vertices.reshape(-1, 3), faces
+
+
+def main():
+    # loads sphere meshes of growing size from .obj and .ply files, builds their hierarchies and shoots random rays
+    # at them, triangle tests per ray grow about logarithmically with the number of triangles
+    rng = np.random.default_rng(0)
+    origins = rng.normal(size=(RAYS, 3))
+    origins *= 5 / np.linalg.norm(origins, axis=1, keepdims=True)
+    # directions to random points within the sphere
+    directions = rng.uniform(-.5, .5, size=(RAYS, 3)) - origins
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+
+    print(f"{RAYS} rays, wavefront tests:")
+    print(f"{'triangles':>10} {'obj [s]':>8} {'ply [s]':>8} {'build [s]':>10} {'hits [s]':>9} {'tests per ray':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in ROWS:
+            vertices, faces = sphere_mesh(rows)
+            seconds = {}
+            for extension, write in ((".obj", write_obj), (".ply", write_ply)):
+                path = os.path.join(directory, f"sphere{rows}{extension}")
+                write(path, vertices, faces)
+                start = time.perf_counter()
+                mesh = load_mesh(path)
+                seconds[extension] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            mesh.build()
+            build = time.perf_counter() - start
+
+            stats = RenderStats()
+            t_best = np.full(RAYS, np.inf)
+            start = time.perf_counter()
+            hits = mesh.hit_batch(origins, directions, 1e-3, t_best, np.full(RAYS, -1), stats)
+            hit = time.perf_counter() - start
+            assert hits.all()
+            print(f"{len(mesh):>10} {seconds['.obj']:>8.2f} {seconds['.ply']:>8.2f} {build:>10.2f} {hit:>9.2f} "
+                  f"{stats.intersection_tests / RAYS:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
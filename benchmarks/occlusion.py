@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+
+from base.geometries import Ray, Vector
+from benchmarks.bvh_scaling import random_scene
+
+# scene sizes (number of random spheres) and number of shadow segments tested per size
+SIZES = [100, 1000, 10000, 100000]
+SEGMENTS = 10000
+# scalar queries are timed for the first segments only
+SCALAR_SEGMENTS = 2000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'spheres':>8} {'occluded':>9} {'hit [us/ray]':>13} {'occluded [us/ray]':>18} "
+          f"{'hit_batch [us/ray]':>19} {'occluded_batch [us/ray]':>24}")
+    for n in SIZES:
+        scene, size = random_scene(n, rng)
+        scene.build()
+        # segments between random points of the scene, the direction spans the whole segment (t_max = 1)
+        origins = rng.uniform(-size, size, (SEGMENTS, 3))
+        directions = rng.uniform(-size, size, (SEGMENTS, 3)) - origins
+        rays = [Ray(Vector(*o), Vector(*d)) for o, d in zip(origins[:SCALAR_SEGMENTS].tolist(),
+                                                            directions[:SCALAR_SEGMENTS].tolist())]
+
+        start = time.perf_counter()
+        hits = [scene.hit(ray, .001, 1) is not None for ray in rays]
+        hit_time = (time.perf_counter() - start) / SCALAR_SEGMENTS * 1e6
+
+        start = time.perf_counter()
+        occluded = [scene.occluded(ray, .001, 1) for ray in rays]
+        occluded_time = (time.perf_counter() - start) / SCALAR_SEGMENTS * 1e6
+
+        start = time.perf_counter()
+        hits_batch = scene.hit_batch(origins, directions, .001, 1)[5] >= 0
+        hit_batch_time = (time.perf_counter() - start) / SEGMENTS * 1e6
+
+        start = time.perf_counter()
+        occluded_batch = scene.occluded_batch(origins, directions, .001, 1)
+        occluded_batch_time = (time.perf_counter() - start) / SEGMENTS * 1e6
+
+        if hits != occluded or not np.array_equal(hits_batch, occluded_batch):
+            raise AssertionError("occlusion queries differ from closest hits")
+        print(f"{n:>8} {occluded_batch.mean():>9.1%} {hit_time:>13.1f} {occluded_time:>18.1f} "
+              f"{hit_batch_time:>19.2f} {occluded_batch_time:>24.2f}")
+
+
+if __name__ == "__main__":
+    main()
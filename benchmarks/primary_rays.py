@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+
+from base.sampling import Sampler
+from base.tiles import split_tiles
+from scenes import scene9, scene10
+
+# image width and samples per pixel of the workload (camera rays only, nothing is traced)
+WIDTH = 320
+SAMPLES_PER_PIXEL = 4
+
+
+def scalar_rays(camera, tiles, get_ray):
+    # generates all camera rays of the image one by one with get_ray(rays of the tile, x, y, sampler)
+    # and returns primary rays per second
+    sampler = Sampler(0)
+    start = time.perf_counter()
+    for tile in tiles:
+        rays = camera.primary_rays(tile)
+        for y in range(tile.y_start, tile.y_end):
+            for x in range(tile.x_start, tile.x_end):
+                sampler.start_pixel(camera.samples_per_pixel)
+                for _ in range(camera.samples_per_pixel):
+                    get_ray(rays, x, y, sampler)
+    return camera.image_width * camera.image_height * camera.samples_per_pixel / (time.perf_counter() - start)
+
+
+def batch_rays(camera, tiles, get_rays):
+    # generates camera rays tile by tile with get_rays(rays of the tile, xs, ys, camera samples)
+    # and returns primary rays per second
+    sampler = Sampler(0)
+    start = time.perf_counter()
+    for tile in tiles:
+        rays = camera.primary_rays(tile)
+        ys, xs = np.mgrid[tile.y_end - 1:tile.y_start - 1:-1, tile.x_start:tile.x_end]
+        camera_samples = sampler.pixel_samples(tile.width * tile.height, camera.samples_per_pixel).reshape(-1, 4)
+        get_rays(rays, np.repeat(xs.ravel(), camera.samples_per_pixel), np.repeat(ys.ravel(), camera.samples_per_pixel),
+                 camera_samples)
+    return camera.image_width * camera.image_height * camera.samples_per_pixel / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{WIDTH} pixels width, {SAMPLES_PER_PIXEL} samples per pixel, primary rays per second:")
+    print(f"{'camera':>18} {'get_ray':>10} {'PrimaryRays.ray':>16} {'get_rays':>10} {'PrimaryRays.batch':>18}")
+    for name, camera in [("scene9 (pinhole)", scene9.cam0), ("scene10 (lens)", scene10.cam0)]:
+        camera.set_image_width(WIDTH)
+        camera.samples_per_pixel = SAMPLES_PER_PIXEL
+        tiles = split_tiles(camera.image_width, camera.image_height)
+
+        get_ray = scalar_rays(camera, tiles, lambda rays, x, y, sampler: camera.get_ray(x, y, True, sampler))
+        ray = scalar_rays(camera, tiles, lambda rays, x, y, sampler: rays.ray(x, y, sampler))
+        get_rays = batch_rays(camera, tiles, lambda rays, xs, ys, samples: camera.get_rays(xs, ys, True, None, samples))
+        batch = batch_rays(camera, tiles, lambda rays, xs, ys, samples: rays.batch(xs, ys, samples))
+        print(f"{name:>18} {get_ray:>10.0f} {ray:>16.0f} {get_rays:>10.0f} {batch:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
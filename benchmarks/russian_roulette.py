@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+
+from base.geometries import Vector
+from scenes.scene9 import cam0, scene
+
+# image width of the workload (scene9 is rendered at 1920)
+WIDTH = 64
+SAMPLES_PER_PIXEL = 16
+
+
+def recursive_ray_color(camera, ray, scene, depth, sampler):
+    # Camera.ray_color before it became iterative (reference without russian roulette)
+    if depth <= 0:
+        return Vector.null()
+
+    result = scene.hit(ray, camera.t_min, camera.t_max)
+    if result is not None:
+        _, pos, norm, front_face, color, material = result
+        if material is not None:
+            scatter_result = material.scatter(ray, pos, norm, front_face, sampler)
+            emitted_result = material.emitted()
+            if scatter_result is not None:
+                scattered_ray, attenuation = scatter_result
+                emitted_result += recursive_ray_color(camera, scattered_ray, scene, depth - 1, sampler).mul(attenuation)
+            return emitted_result
+        return color
+
+    unit_dir = ray.direction.normalize()
+    t = .5 * (unit_dir.y + 1)
+    return camera.background_gradient[0] * (1 - t) + camera.background_gradient[1] * t
+
+
+def render(camera, ray_color, seed):
+    # returns mean colors of all pixels as (height, width, 3) float array and time
+    sampler = camera.create_sampler(seed)
+    colors = np.zeros((camera.image_height, camera.image_width, 3))
+    start = time.perf_counter()
+    for y in range(camera.image_height):
+        for x in range(camera.image_width):
+            sampler.start_pixel(camera.samples_per_pixel)
+            for _ in range(camera.samples_per_pixel):
+                ray = camera.get_ray(x, y, True, sampler)
+                colors[y, x] += ray_color(ray, scene, camera.max_bounce_depth, sampler).to_array()
+    return colors / camera.samples_per_pixel, time.perf_counter() - start
+
+
+def main():
+    cam0.set_image_width(WIDTH)
+    cam0.samples_per_pixel = SAMPLES_PER_PIXEL
+    scene.build()
+    print(f"scene9 {cam0.image_width}x{cam0.image_height}, {SAMPLES_PER_PIXEL} samples per pixel, "
+          f"max bounce depth {cam0.max_bounce_depth}")
+
+    reference, elapsed = render(cam0, lambda *args: recursive_ray_color(cam0, *args), 1)
+    print(f"      recursive: {elapsed:.2f}s")
+
+    # same random numbers are used without russian roulette, so only rounding differs
+    cam0.russian_roulette_depth = None
+    iterative, elapsed = render(cam0, cam0.ray_color, 1)
+    print(f"      iterative: {elapsed:.2f}s, max difference to recursive {np.abs(iterative - reference).max():.2e}")
+
+    # russian roulette changes the random numbers, compare means over the image and per pixel errors
+    # against the recursive noise (difference of two independent recursive renders)
+    second_reference, _ = render(cam0, lambda *args: recursive_ray_color(cam0, *args), 2)
+    for depth in (3, 5):
+        cam0.russian_roulette_depth = depth
+        roulette, elapsed = render(cam0, cam0.ray_color, 2)
+        print(f"roulette from {depth}: {elapsed:.2f}s, image mean {roulette.mean():.4f} "
+              f"(recursive {reference.mean():.4f}, {second_reference.mean():.4f}), "
+              f"rms difference {np.sqrt(np.mean((roulette - reference) ** 2)):.4f} "
+              f"(recursive {np.sqrt(np.mean((second_reference - reference) ** 2)):.4f})")
+
+
+if __name__ == "__main__":
+    main()
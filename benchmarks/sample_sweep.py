@@ -0,0 +1,42 @@
+import time
+
+from base import tiles
+from scenes import scene4, scene7
+
+# image width and maximal samples per pixel of the workloads (the scenes are rendered 1920 wide, scene4 with 1, 2, 4,
+# 8 and 16 samples per pixel, scene7 with bounce depths 1, 2, 4, 8 and 16 at 64 samples per pixel)
+WIDTH = 128
+SAMPLES_PER_PIXEL = 16
+REPEAT = 2
+
+
+def main():
+    # renders the cameras of the scenes one by one and as one sweep (samples and paths of the cameras with fewer
+    # samples or bounces are shared with the others)
+    print(f"{WIDTH} pixels width, wavefront renders:")
+    print(f"{'scene':>8} {'samples per pixel':>20} {'bounce depths':>20} {'separate [s]':>13} {'sweep [s]':>10}")
+    for name, scene in [("scene4", scene4.scene), ("scene7", scene7.scene)]:
+        for cam in scene.cameras:
+            cam.set_image_width(WIDTH)
+            cam.samples_per_pixel = min(cam.samples_per_pixel, SAMPLES_PER_PIXEL)
+            cam.render_mode = "wavefront"
+        scene.build()
+        separate, sweep = [], []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            for i, cam in enumerate(scene.cameras):
+                cam.render(scene, seed=i, progress=False)
+            separate.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            for group in scene.sweep_groups():
+                for _ in tiles.render_sweep([scene.cameras[i] for i in group], scene, seed=0, progress=False):
+                    pass
+            sweep.append(time.perf_counter() - start)
+        samples = ",".join(str(cam.samples_per_pixel) for cam in scene.cameras)
+        depths = ",".join(str(cam.max_bounce_depth) for cam in scene.cameras)
+        print(f"{name:>8} {samples:>20} {depths:>20} {min(separate):>13.2f} {min(sweep):>10.2f} "
+              f"({min(separate) / min(sweep):.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
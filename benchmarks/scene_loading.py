@@ -0,0 +1,52 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from base.geometries import Vector
+from base.materials import DiffuseMaterial, SpecularMaterial
+from base.objects import Camera, Scene
+from base.scenefile import load_scene, save_scene
+
+# number of random spheres of the generated scene
+SPHERES = 1000000
+# scene files written as JSON as well (JSON of 1M spheres is about 100mb)
+FORMATS = (".npz", ".json")
+
+
+def random_scene(n, rng):
+    # spheres in a cube growing with n (like benchmarks.bvh_scaling) with a few shared materials
+    size = 10 * n ** (1 / 3)
+    scene = Scene("spheres")
+    materials = [DiffuseMaterial(Vector(*rng.uniform(0, 1, 3))) for _ in range(8)]
+    materials.append(SpecularMaterial(Vector(1, 1, 1), .1))
+    scene.add_spheres(rng.uniform(-size, size, (n, 3)), rng.uniform(.5, 1.5, n), materials,
+                      rng.integers(0, len(materials), n))
+    scene.add_cam(Camera(16 / 9, 192, 1, lookfrom=Vector(0, 0, size * 1.5), lookat=Vector(0, 0, 0)))
+    return scene
+
+
+def main():
+    scene = random_scene(SPHERES, np.random.default_rng(0))
+    # compiled once, so saving only measures writing
+    scene.build()
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in FORMATS:
+            path = os.path.join(directory, "scene" + extension)
+            start = time.perf_counter()
+            save_scene(scene, path)
+            save_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = load_scene(path)
+            load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded.build()
+            build_time = time.perf_counter() - start
+            print(f"{SPHERES} spheres {extension:>5} ({os.path.getsize(path) / 1e6:.0f}mb): save {save_time:.2f}s, "
+                  f"load {load_time:.2f}s, build (bounding volume hierarchy) {build_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
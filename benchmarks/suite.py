@@ -0,0 +1,125 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from base.stats import RenderStats
+
+# scene modules of the suite (scene1 only writes an image of static color, it has no Scene)
+SCENES = [f"scene{i}" for i in range(2, 11)]
+BACKENDS = ("scalar", "wavefront", "jit")
+# image width and maximal samples per pixel of all cameras (the scenes are rendered 1920 wide with up to 64)
+WIDTH = 64
+SAMPLES_PER_PIXEL = 4
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# timed renders per workload, the best is taken (small workloads vary by 20% between single runs)
+REPEAT = 3
+# loss of rays per second compared to the baseline that counts as regression (timings of a busy machine vary a lot)
+TOLERANCE = .2
+
+
+def peak_memory():
+    # returns peak resident memory of this process in mb (None without the resource module, e.g. on Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def run(scene_name, backend, width, samples_per_pixel, repeat):
+    # renders all cameras of a scene module (imported without rendering) and returns rays, best time of repeat
+    # renders and peak memory, the first render counts the rays and warms up (e.g. builds the hierarchy)
+    module = importlib.import_module(f"scenes.{scene_name}")
+    scene = module.scene
+    for cam in scene.cameras:
+        cam.set_image_width(width)
+        cam.samples_per_pixel = min(cam.samples_per_pixel, samples_per_pixel)
+        cam.min_samples = min(cam.min_samples, cam.samples_per_pixel)
+        cam.render_mode = backend
+
+    stats = RenderStats()
+    for i, cam in enumerate(scene.cameras):
+        cam.render(scene, seed=i, progress=False, stats=stats)
+    rays = sum(stats.rays) + stats.shadow_rays
+
+    # timed renders without statistics (same seeds, so they trace the same rays)
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i, cam in enumerate(scene.cameras):
+            cam.render(scene, seed=i, progress=False)
+        seconds.append(time.perf_counter() - start)
+    return {"cameras": len(scene.cameras), "rays": rays, "seconds": min(seconds),
+            "rays_per_second": rays / min(seconds), "peak_memory_mb": peak_memory()}
+
+
+def compare(result, baseline, tolerance):
+    # returns comparison of a result with its baseline as text and if it is a regression
+    if baseline is None:
+        return "-", False
+    speedup = result["rays_per_second"] / baseline["rays_per_second"]
+    # rays only differ if rendering changed (same seeds)
+    note = "" if result["rays"] == baseline["rays"] else f", rays changed from {baseline['rays']}"
+    regression = speedup < 1 - tolerance
+    return f"{speedup:.2f}x{' REGRESSION' if regression else ''}{note}", regression
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the scenes at reduced size and compare with a baseline")
+    parser.add_argument("--scenes", nargs="+", default=SCENES, choices=SCENES)
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--width", type=int, default=WIDTH, help="image width of all cameras")
+    parser.add_argument("--samples", type=int, default=SAMPLES_PER_PIXEL, help="maximal samples per pixel")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed renders per workload (best is taken)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="save results as baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="relative slowdown reported as regression")
+    args = parser.parse_args()
+
+    settings = {"width": args.width, "samples_per_pixel": args.samples}
+    baseline = {}
+    if not os.path.exists(args.baseline) and not args.save_baseline:
+        # the baseline belongs to the machine, the first run has to save it
+        print(f"no baseline {args.baseline}, not compared (run with --save-baseline first)")
+    elif not args.save_baseline:
+        with open(args.baseline) as f:
+            data = json.load(f)
+        if data["settings"] == settings:
+            baseline = data["results"]
+        else:
+            print(f"baseline {args.baseline} was measured with {data['settings']}, not compared")
+
+    results = {}
+    regressions = []
+    print(f"{'workload':>18} {'rays':>9} {'time [s]':>9} {'rays/s':>9} {'memory [mb]':>12} baseline")
+    for scene_name in args.scenes:
+        for backend in args.backends:
+            # every workload runs in a new process, so peak memory and caches belong to it alone
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(run, scene_name, backend, args.width, args.samples, args.repeat).result()
+            key = f"{scene_name}/{backend}"
+            results[key] = result
+            comparison, regression = compare(result, baseline.get(key), args.tolerance)
+            if regression:
+                regressions.append(key)
+            memory = f"{result['peak_memory_mb']:.0f}" if result["peak_memory_mb"] is not None else "-"
+            print(f"{key:>18} {result['rays']:>9} {result['seconds']:>9.2f} {result['rays_per_second']:>9.0f} "
+                  f"{memory:>12} {comparison}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+        print(f"saved baseline {args.baseline}")
+    if regressions:
+        print(f"regressions (rays per second more than {args.tolerance:.0%} below baseline): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import sys
+import time
+
+import numpy as np
+
+from base.geometries import Vector
+from base.objects import Sphere
+from scenes.scene3 import main_camera, scene
+
+# image width of the scene3 workload (scene3 itself is rendered at 1920)
+WIDTH = 192
+
+
+class LegacyVector:
+    # Vector before it got __slots__ and in-place operations (only operations used by the workload)
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __add__(self, v):
+        return LegacyVector(self.x + v.x, self.y + v.y, self.z + v.z)
+
+    def __sub__(self, v):
+        return LegacyVector(self.x - v.x, self.y - v.y, self.z - v.z)
+
+    def __mul__(self, l):
+        if type(l) is LegacyVector:
+            return self.x * l.x + self.y * l.y + self.z * l.z
+        else:
+            return LegacyVector(self.x * l, self.y * l, self.z * l)
+
+    def __truediv__(self, l):
+        return LegacyVector(self.x * 1/l, self.y * 1/l, self.z * 1/l)
+
+    def length(self):
+        return np.sqrt(self.x ** 2 + self.y ** 2 + self.z ** 2)
+
+    def normalize(self):
+        return self.__truediv__(self.length())
+
+
+def workload_legacy(width, height, corner, horizontal, vertical, origin, spheres):
+    # per pixel work of scene3 (primary ray, hits of all spheres, shading by normal) with allocating operators
+    color = LegacyVector(0, 0, 0)
+    for y in range(height):
+        for x in range(width):
+            direction = corner + horizontal * x / (width - 1) + vertical * y / (height - 1) - origin
+            for center, radius in spheres:
+                pointer = origin - center
+                a = direction * direction
+                half_b = pointer * direction
+                discriminant = half_b ** 2 - a * (pointer * pointer - radius ** 2)
+                if discriminant >= 0:
+                    t = (-half_b - np.sqrt(discriminant)) / a
+                    norm = (origin + direction * t - center) / radius
+                    color = color + norm * .5
+            color = color + direction.normalize()
+    return color
+
+
+def workload_slotted(width, height, corner, horizontal, vertical, origin, spheres):
+    # same work with the slotted Vector and its in-place operations
+    color = Vector(0, 0, 0)
+    for y in range(height):
+        for x in range(width):
+            direction = corner - origin
+            direction.mul_add(horizontal, x / (width - 1))
+            direction.mul_add(vertical, y / (height - 1))
+            for center, radius in spheres:
+                pointer = origin - center
+                a = direction * direction
+                half_b = pointer * direction
+                discriminant = half_b * half_b - a * (pointer * pointer - radius * radius)
+                if discriminant >= 0:
+                    t = (-half_b - discriminant ** .5) / a
+                    norm = origin - center
+                    norm.mul_add(direction, t)
+                    color.mul_add(norm, .5 / radius)
+            color += direction.normalize()
+    return color
+
+
+def main():
+    height = int(WIDTH // main_camera.aspect_ratio)
+    for name, vector, workload in [("legacy", LegacyVector, workload_legacy),
+                                   ("slotted", Vector, workload_slotted)]:
+        def convert(v):
+            return vector(v.x, v.y, v.z)
+
+        spheres = [(convert(obj.position), obj.radius) for obj in scene.render_objects if type(obj) is Sphere]
+        start = time.perf_counter()
+        workload(WIDTH, height, convert(main_camera.lower_left_corner), convert(main_camera.horizontal),
+                 convert(main_camera.vertical), convert(main_camera.position), spheres)
+        elapsed = time.perf_counter() - start
+
+        v = vector(1., 2., 3.)
+        size = sys.getsizeof(v) + (sys.getsizeof(v.__dict__) if hasattr(v, "__dict__") else 0)
+        print(f"{name:>8}: scene3 workload {WIDTH}x{height} {elapsed:.3f}s, {size} bytes per vector")
+
+    # complete scalar render of scene3 with the current Vector
+    start = time.perf_counter()
+    main_camera.image_width, main_camera.image_height = WIDTH, height
+    main_camera.render(scene, progress=False)
+    print(f"  render: scene3 {WIDTH}x{height} {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,4 +6,7 @@ scene = Scene("../images/image2")
 main_camera = Camera(16 / 9, 1920, 1)
 
 scene.add_cam(main_camera)
-scene.render()
+
+# rendering only if module is started (scene can be imported without rendering)
+if __name__ == "__main__":
+    scene.render()
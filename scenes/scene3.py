@@ -1,5 +1,5 @@
 from base.geometries import Vector
-from base.objects import Scene, Camera, Sphere
+from base.objects import Scene, Camera, Plane, Sphere
 
 scene = Scene("../images/image3")
 # camera
@@ -11,7 +11,7 @@ s1 = Sphere(Vector(-8, -2, -10), 3, color=Vector(0, 1, 0))
 s2 = Sphere(Vector(4, -3, -8), 2, color=Vector(0, 0, 1))
 s3 = Sphere(Vector(10, 0, -14), 5, color=Vector(0, 1, 1))
 
-s4 = Sphere(Vector(0, -1005, -2), 1000, color=Vector(.9, .9, .9))
+s4 = Plane(Vector(0, -5, -2), Vector(0, 1, 0), color=Vector(.9, .9, .9))
 
 scene.add_render_object(s0)
 scene.add_render_object(s1)
@@ -20,4 +20,7 @@ scene.add_render_object(s3)
 scene.add_render_object(s4)
 
 scene.add_cam(main_camera)
-scene.render()
+
+# rendering only if module is started (scene can be imported without rendering)
+if __name__ == "__main__":
+    scene.render()
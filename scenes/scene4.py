@@ -1,5 +1,5 @@
 from base.geometries import Vector
-from base.objects import Scene, Camera, Sphere
+from base.objects import Scene, Camera, Plane, Sphere
 
 scene = Scene("../images/image4")
 # camera
@@ -15,7 +15,7 @@ s1 = Sphere(Vector(-8, -2, -10), 3, color=Vector(0, 1, 0))
 s2 = Sphere(Vector(4, -3, -8), 2, color=Vector(0, 0, 1))
 s3 = Sphere(Vector(10, 0, -14), 5, color=Vector(0, 1, 1))
 
-s4 = Sphere(Vector(0, -1005, -2), 1000, color=Vector(.9, .9, .9))
+s4 = Plane(Vector(0, -5, -2), Vector(0, 1, 0), color=Vector(.9, .9, .9))
 
 scene.add_render_object(s0)
 scene.add_render_object(s1)
@@ -29,4 +29,6 @@ scene.add_cam(cam2)
 scene.add_cam(cam3)
 scene.add_cam(cam4)
 
-scene.render()
+# rendering only if module is started (scene can be imported without rendering)
+if __name__ == "__main__":
+    scene.render()
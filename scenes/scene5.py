@@ -1,6 +1,6 @@
 from base.geometries import Vector
 from base.materials import DiffuseMaterial
-from base.objects import Scene, Camera, Sphere
+from base.objects import Scene, Camera, Plane, Sphere
 
 scene = Scene("../images/image5")
 # camera
@@ -16,7 +16,7 @@ s1 = Sphere(Vector(-8, -2, -10), 3, material=DiffuseMaterial(Vector(0, 1, 0)))
 s2 = Sphere(Vector(4, -3, -8), 2, material=DiffuseMaterial(Vector(0, 0, 1)))
 s3 = Sphere(Vector(10, 0, -14), 5, material=DiffuseMaterial(Vector(0, 1, 1)))
 
-s4 = Sphere(Vector(0, -1005, -2), 1000, material=DiffuseMaterial(Vector(.9, .9, .9)))
+s4 = Plane(Vector(0, -5, -2), Vector(0, 1, 0), material=DiffuseMaterial(Vector(.9, .9, .9)))
 
 scene.add_render_object(s0)
 scene.add_render_object(s1)
@@ -30,4 +30,6 @@ scene.add_cam(cam2)
 scene.add_cam(cam3)
 scene.add_cam(cam4)
 
-scene.render()
+# rendering only if module is started (scene can be imported without rendering)
+if __name__ == "__main__":
+    scene.render()
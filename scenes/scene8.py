@@ -1,6 +1,6 @@
 from base.geometries import Vector
 from base.materials import DiffuseMaterial, SpecularMaterial, TransmissiveMaterial, EmissiveMaterial
-from base.objects import Scene, Camera, Sphere
+from base.objects import Scene, Camera, Plane, Sphere
 
 scene = Scene("../images/image8")
 # camera
@@ -13,7 +13,7 @@ s1 = Sphere(Vector(-8, -2, -10), 3, material=DiffuseMaterial(Vector(0, 1, 0)))
 s2 = Sphere(Vector(4, -3, -8), 2, material=DiffuseMaterial(Vector(0, 0, 1)))
 s3 = Sphere(Vector(10, 0, -14), 5, material=DiffuseMaterial(Vector(0, 1, 1)))
 
-s4 = Sphere(Vector(0, -1005, -2), 1000, material=DiffuseMaterial(Vector(.9, .9, .9)))
+s4 = Plane(Vector(0, -5, -2), Vector(0, 1, 0), material=DiffuseMaterial(Vector(.9, .9, .9)))
 
 s5 = Sphere(Vector(-5.5, -4, -5.5), 1, material=SpecularMaterial(Vector(1, .84, 0), 0))
 s6 = Sphere(Vector(-3, -3, -7.8), 2, material=SpecularMaterial(Vector(.85, .85, .85), 0))
@@ -47,4 +47,6 @@ scene.add_render_object(s13)
 
 scene.add_cam(cam0)
 
-scene.render()
+# rendering only if module is started (scene can be imported without rendering)
+if __name__ == "__main__":
+    scene.render()